@@ -5,29 +5,47 @@ Optimized Article Generator for Cloudflare Workers + GitHub Integration
 Enhanced for deployment compatibility and serverless execution
 """
 
+import io
 import os
-import re
-import time
 import json
-import random
+import time
 import datetime
-import requests
-import markdown
 import asyncio
-import aiohttp
-import aiofiles
 from pathlib import Path
-import xml.etree.ElementTree as ET
-import frontmatter
-import yaml
 from slugify import slugify
-from langdetect import detect
-import google.generativeai as genai
-from urllib.parse import quote_plus
+from urllib.parse import urlparse
 import logging
-from typing import List, Dict, Optional, Tuple
+import contextlib
+from typing import Callable, List, Dict, Optional, Tuple, TYPE_CHECKING
+from dataclasses import asdict
 from asyncio_throttle.throttler import Throttler
 import base64
+from keyword_scheduler import KeywordScheduler, parse_keyword_line
+from telemetry import StageRecorder, mask_key
+from metrics import METRICS, configure_from_environment as configure_metrics
+from llm_backends import LLMBackend, LLMResponse, build_backends, backend_specs_from_environment
+from cassette import Cassette, fingerprint, encode_body, decode_body
+from profiling import Profiler, RunProfile
+from article_record import ArticleRecord
+from fair_scheduler import FairScheduler
+from adaptive_limiter import AdaptiveLimiter
+from hedging import HedgePolicy
+from single_flight import SingleFlight
+from circuit_breaker import CircuitBreaker, CircuitOpenError, is_failure_status
+from deadline import Deadline, StageEstimates
+from model_router import ModelRouter, CONFIG_FILE, read_config_file
+from quality import (split_sections, section_problems, outline_problems, gate_settings, strip_fences,
+                     assess_article, ARTICLE_CHECKS)
+from packed_prompts import PackedCache, parse_packed
+from context_cache import ContextCache, SharedContext
+
+# Heavy dependencies (aiohttp, frontmatter, google.generativeai) are imported on
+# first use so a cold lambda_handler start stays within COLD_START_BUDGET_MS
+if TYPE_CHECKING:
+    import aiohttp
+
+# Import-time budget for this module, checked by test_generator.test_import_time
+COLD_START_BUDGET_MS = 300
 
 # Set up logging for serverless environment
 logging.basicConfig(
@@ -37,6 +55,102 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Continuation of article content cut off at max_output_tokens
+CONTINUATION_TAIL_CHARS = 1500
+CONTINUATION_PROMPT = """
+            Continue the article titled "{title}" for the keyword "{keyword}".
+            The previous response stopped at the output limit. The article so far ends with:
+            
+            {tail}
+            
+            Continue directly after this text, starting with the next paragraph.
+            Do not repeat earlier text or restart the article.
+            Sections still to write: {remaining}
+            Keep the same markdown formatting and finish with the conclusion.
+            """
+
+
+# Rewrite of one drafted section that failed the local quality checks
+REFINE_PROMPT = """
+            Rewrite one section of the article titled "{title}" for the keyword "{keyword}".
+            
+            Current draft of the section:
+            
+            {section}
+            
+            Problems to fix: {problems}
+            Points to cover: {points}
+            
+            Return only this section in markdown, starting with the line "## {heading}".
+            Write at least {min_words} words, finish every sentence and do not add other sections.
+            """
+
+# Titles, and optionally outlines, for several keywords in one request
+PACKED_PROMPT = """
+        Plan SEO articles for each of these keywords: {keywords}
+        
+        For every keyword create an SEO-optimized, engaging title.
+        Title requirements: Under 60 characters, includes keyword, professional, click-worthy.{outline_request}
+        
+        Return JSON with one entry per keyword, using the keyword exactly as given:
+        {{"articles": [{{"keyword": "keyword", "title": "title"{outline_field}}}]}}
+        
+        Return only valid JSON.
+        """
+PACKED_OUTLINE_REQUEST = """
+        Also create an outline for each title with "keyword_analysis" (search_intent, target_audience,
+        main_topics), "structure" (introduction, 4-6 sections with heading, content_points and
+        needs_image, conclusion) and "seo" (meta_description, keywords, estimated_length)."""
+
+
+def continuation_base(content: str) -> str:
+    """Drop a trailing paragraph that was cut mid-way, so the continuation restarts it whole"""
+    cut = content.rfind('\n\n')
+    if cut <= len(content) // 2:
+        return content
+    base = content[:cut].rstrip()
+    # A heading whose body was cut would count as written; drop it so the section is restarted
+    while True:
+        cut = base.rfind('\n\n')
+        last = base[cut + 2:] if cut >= 0 else base
+        if cut <= 0 or not last.startswith('#') or '\n' in last:
+            return base
+        base = base[:cut].rstrip()
+
+
+def missing_sections(outline: Dict, content: str) -> List[str]:
+    """Outline section headings that do not appear in the content yet"""
+    sections = outline.get('structure', {}).get('sections', [])
+    lowered = content.lower()
+    return [section['heading'] for section in sections
+            if section.get('heading') and section['heading'].lower() not in lowered]
+
+
+def place_missing_sections(sections: List[Tuple[str, str]], outline: Dict, missing: List[str]) -> List[int]:
+    """Insert empty sections for missing outline headings in outline order; returns their indexes"""
+    order = [section['heading'] for section in outline.get('structure', {}).get('sections', [])
+             if section.get('heading')]
+    placed = []
+    for heading in missing:
+        earlier = [name.lower() for name in order[:order.index(heading)]]
+        # After the last drafted section of an earlier outline heading, else after the untitled opening
+        index = next((i + 1 for i in range(len(sections) - 1, -1, -1)
+                      if sections[i][0] and any(name in sections[i][0].lower() for name in earlier)), None)
+        if index is None:
+            index = 1 if sections and not sections[0][0] else 0
+        sections.insert(index, (heading, ''))
+        placed = [i + 1 if i >= index else i for i in placed] + [index]
+    return placed
+
+
+def section_points(outline: Dict, heading: str) -> List[str]:
+    """Outline content points for the section with this heading"""
+    for section in outline.get('structure', {}).get('sections', []):
+        if section.get('heading', '').lower() == heading.lower():
+            return section.get('content_points', [])
+    return []
+
+
 class CloudflareOptimizedArticleGenerator:
     """
     Optimized for Cloudflare Workers deployment with GitHub integration
@@ -47,22 +161,127 @@ class CloudflareOptimizedArticleGenerator:
         self.config = config_data or {}
         self.api_keys = []
         self.pixel_apis = []
-        self.articles_data = []
+        self.articles_data: List[ArticleRecord] = []
         self.used_keywords = set()
         self.current_api_index = 0
         self.daily_requests = 0
         self.max_daily_requests = 50
         
-        # Rate limiters optimized for serverless
+        # Rate limiters optimized for serverless; concurrency adapts per upstream (see below)
         self.gemini_throttler = Throttler(rate_limit=8, period=60)
-        self.image_throttler = Throttler(rate_limit=3, period=60)
+        
+        # Per-stage spans, optionally streamed as JSON lines
+        self.telemetry = StageRecorder(os.environ.get('STAGE_LOG_PATH'))
+        
+        # Process-wide Prometheus metrics (METRICS_PORT / METRICS_TEXTFILE)
+        self.metrics = METRICS
+        self.telemetry.listeners.append(self.metrics.observe_span)
+        configure_metrics()
+        
+        # Observed stage durations decide what still fits before a run deadline
+        self.stage_estimates = StageEstimates(self.config.get('stage_seconds'))
+        self.telemetry.listeners.append(self.stage_estimates.observe_span)
+        self.checkpoint_dir = Path(os.environ.get('CHECKPOINT_DIR', '/tmp/article_checkpoints'))
+        
+        # Opt-in cProfile/tracemalloc reports per run and stage (PROFILE_DIR)
+        self.profiler = None
+        profiler = Profiler.from_environment()
+        if profiler:
+            self.enable_profiling(profiler)
         
         # GitHub integration settings
         self.github_token = os.environ.get('GITHUB_TOKEN')
         self.github_repo = os.environ.get('GITHUB_REPO')  # format: username/repo
         self.github_branch = os.environ.get('GITHUB_BRANCH', 'main')
         
+        # Upstream endpoints, overridable for local stand-ins and benchmarks
+        self.github_api_url = os.environ.get('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+        self.unsplash_api_url = os.environ.get('UNSPLASH_API_URL', 'https://api.unsplash.com').rstrip('/')
+        self.gemini_endpoint = os.environ.get('GEMINI_API_ENDPOINT')
+        
         self.load_from_environment()
+        
+        # Model per stage from CONFIG.txt, BLOG_CONFIG "models" and "model_cascade"
+        self.models = ModelRouter.from_config(self.config)
+        
+        # Local checks before publishing (BLOG_CONFIG "quality_gate", false disables)
+        force_english = read_config_file(CONFIG_FILE).get('FORCE_ENGLISH_OUTPUT', 'true').lower() == 'true'
+        self.quality_gate = gate_settings(self.config.get('quality_gate'), force_english)
+        # Keywords whose article the gate blocked in this process; the scheduler backs them off
+        self.quality_rejected = set()
+        
+        # Titles/outlines for upcoming keywords from packed calls (BLOG_CONFIG "packed_prompts")
+        packed_settings = self.config.get('packed_prompts')
+        if not packed_settings:
+            self.packed_settings = None
+        elif isinstance(packed_settings, dict):
+            self.packed_settings = packed_settings
+        else:
+            self.packed_settings = {}
+        packed_file = os.environ.get('PACKED_CACHE_FILE', str(Path(__file__).parent / 'packed_prompts.json'))
+        self.packed_cache = PackedCache(
+            Path(packed_file) if packed_file and self.packed_settings is not None else None,
+            max_age_days=float((self.packed_settings or {}).get('max_age_days', 7))
+        )
+        
+        # Circuit breakers per upstream and per Gemini key (BLOG_CONFIG "circuit_breakers")
+        self.breaker_settings = self.config.get('circuit_breakers', {})
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        
+        # Gemini cached contents for the brief an article's calls share (BLOG_CONFIG "context_cache")
+        self.context_cache = ContextCache.from_config(self.config.get('context_cache'))
+        
+        # LLM backends in preference order (LLM_BACKENDS), Gemini by default
+        self.llm_backends = build_backends(
+            backend_specs_from_environment(),
+            key_provider=self.rotate_api_key,
+            gemini_endpoint=self.gemini_endpoint,
+            gemini_throttler=self.gemini_throttler,
+            key_breaker=self.key_breaker,
+            context_cache=self.context_cache
+        )
+        
+        # AIMD concurrency limits per upstream (BLOG_CONFIG "adaptive_limits")
+        limit_settings = self.config.get('adaptive_limits', {})
+        for backend in self.llm_backends:
+            if backend.kind in limit_settings:
+                backend.limiter = AdaptiveLimiter.from_settings(
+                    backend.name, limit_settings[backend.kind],
+                    initial=backend.concurrency, maximum=backend.concurrency * 4
+                )
+        self.http_limiters = {
+            service: AdaptiveLimiter.from_settings(service, limit_settings.get(service), initial=2, maximum=8)
+            for service in ('unsplash', 'github')
+        }
+        
+        # Fair ordering of LLM calls across concurrent articles (BLOG_CONFIG "llm_scheduler", false disables)
+        scheduler_settings = self.config.get('llm_scheduler', {})
+        self.llm_scheduler: Optional[FairScheduler] = None
+        if scheduler_settings is not False:
+            scheduler_settings = scheduler_settings if isinstance(scheduler_settings, dict) else {}
+            self.llm_scheduler = FairScheduler(
+                capacity=int(scheduler_settings.get('capacity', 0)) or self.llm_capacity,
+                quantum=float(scheduler_settings.get('quantum', 4)),
+                costs=scheduler_settings.get('costs')
+            )
+        
+        # Identical in-flight LLM prompts and HTTP requests share one call
+        self.single_flight = SingleFlight()
+        
+        # Optional hedging of title/outline calls past their p90 (BLOG_CONFIG "hedging")
+        self.hedging = HedgePolicy.from_config(self.config.get('hedging'))
+        
+        # Shared HTTP session and optional record/replay cassette (CASSETTE_MODE)
+        self._http_session: Optional['aiohttp.ClientSession'] = None
+        self.cassette = Cassette.from_environment()
+        
+        # Priority keyword queue persisted across runs
+        queue_file = os.environ.get('KEYWORD_QUEUE_FILE', str(Path(__file__).parent / 'keyword_queue.json'))
+        self.keyword_scheduler = KeywordScheduler(
+            state_path=Path(queue_file) if queue_file else None,
+            aging_rate=float(self.config.get('keyword_aging_rate', 0.25)),
+            backoff_rounds=int(self.config.get('keyword_backoff_rounds', 4))
+        )
     
     def load_from_environment(self):
         """Load all configuration from environment variables"""
@@ -101,7 +320,7 @@ class CloudflareOptimizedArticleGenerator:
             articles_json = os.environ.get('ARTICLES_DATA', '{}')
             try:
                 articles_data = json.loads(articles_json)
-                self.articles_data = articles_data.get('articles', [])
+                self.articles_data = [ArticleRecord.from_dict(a) for a in articles_data.get('articles', [])]
                 self.used_keywords = set(articles_data.get('used_keywords', []))
                 self.daily_requests = articles_data.get('daily_requests', 0)
             except json.JSONDecodeError:
@@ -112,21 +331,21 @@ class CloudflareOptimizedArticleGenerator:
         except Exception as e:
             logger.error(f"Error loading environment configuration: {e}")
     
-    def get_keywords_from_env(self) -> List[str]:
-        """Load keywords from keyword.txt file or environment variable"""
+    def get_keyword_weights(self) -> Dict[str, float]:
+        """Load keywords with priorities from keyword.txt file or environment variable"""
         # Try to load from keyword.txt file first
         keyword_file = Path(__file__).parent / 'keyword.txt'
         if keyword_file.exists():
             try:
                 with open(keyword_file, 'r', encoding='utf-8') as f:
                     content = f.read().strip()
-                keywords = [
-                    keyword.strip() for keyword in content.splitlines()
-                    if keyword.strip() and not keyword.startswith('#')
-                ]
-                if keywords:
-                    logger.info(f"Loaded {len(keywords)} keywords from keyword.txt")
-                    return keywords
+                weights = dict(
+                    parse_keyword_line(line) for line in content.splitlines()
+                    if line.strip() and not line.startswith('#')
+                )
+                if weights:
+                    logger.info(f"Loaded {len(weights)} keywords from keyword.txt")
+                    return weights
             except Exception as e:
                 logger.error(f"Error reading keyword.txt: {e}")
         
@@ -136,70 +355,316 @@ class CloudflareOptimizedArticleGenerator:
             try:
                 # Support both JSON array and newline-separated format
                 if keywords_data.startswith('['):
-                    return json.loads(keywords_data)
+                    lines = json.loads(keywords_data)
                 else:
-                    return [k.strip() for k in keywords_data.split('\n') if k.strip()]
+                    lines = keywords_data.split('\n')
             except json.JSONDecodeError:
-                return keywords_data.split(',')
+                lines = keywords_data.split(',')
+            return dict(parse_keyword_line(line) for line in lines if line.strip())
         
         logger.warning("No keywords found in keyword.txt or BLOG_KEYWORDS environment")
-        return []
+        return {}
+    
+    def get_keywords_from_env(self) -> List[str]:
+        """Load keywords from keyword.txt file or environment variable"""
+        return list(self.get_keyword_weights())
     
     def get_next_keyword(self) -> Optional[str]:
-        """Get next unused keyword from environment"""
-        keywords = self.get_keywords_from_env()
-        available_keywords = [k for k in keywords if k not in self.used_keywords]
+        """Get highest-priority unused keyword from the scheduler"""
+        self.keyword_scheduler.sync(self.get_keyword_weights())
+        keyword = self.keyword_scheduler.pop(exclude=self.used_keywords)
         
-        if not available_keywords:
+        if keyword is None and len(self.keyword_scheduler):
             self.used_keywords = set()  # Reset if all used
-            available_keywords = keywords
+            keyword = self.keyword_scheduler.pop()
         
-        return random.choice(available_keywords) if available_keywords else None
+        return keyword
+    
+    def get_next_keywords(self, count: int) -> List[str]:
+        """Get up to `count` keywords in priority order for a batch run"""
+        self.keyword_scheduler.sync(self.get_keyword_weights())
+        keywords = self.keyword_scheduler.next_batch(count, exclude=self.used_keywords)
+        
+        if len(keywords) < count and len(self.keyword_scheduler):
+            self.used_keywords = set()  # Reset if all used
+            keywords += self.keyword_scheduler.next_batch(count - len(keywords))
+        
+        return keywords
     
     async def rotate_api_key(self) -> str:
         """Safely rotate API keys"""
         if not self.api_keys:
             raise Exception("No API keys available in environment")
         
-        key = self.api_keys[self.current_api_index % len(self.api_keys)]
-        self.current_api_index += 1
-        return key
+        # Skip keys whose circuit is open
+        for _ in range(len(self.api_keys)):
+            key = self.api_keys[self.current_api_index % len(self.api_keys)]
+            self.current_api_index += 1
+            if self.key_breaker(key).allow():
+                return key
+        raise CircuitOpenError("Every Gemini key's circuit is open")
+    
+    def breaker(self, name: str) -> CircuitBreaker:
+        """Circuit breaker for an upstream, created on first use"""
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            breaker = self.breakers[name] = CircuitBreaker(name, **self.breaker_settings)
+        return breaker
+    
+    def key_breaker(self, api_key: str) -> CircuitBreaker:
+        return self.breaker(f"gemini:{mask_key(api_key)}")
+    
+    def llm_capacity(self) -> int:
+        """Calls the LLM backends currently accept at once"""
+        return sum(backend.limiter.limit for backend in self.llm_backends)
+    
+    def adaptive_limits(self) -> Dict[str, Dict]:
+        """Current AIMD limits per upstream, also exported as metrics"""
+        limiters = [backend.limiter for backend in self.llm_backends] + list(self.http_limiters.values())
+        limits = {}
+        for limiter in limiters:
+            limits[limiter.name] = limiter.stats()
+            self.metrics.adaptive_limit.set(limiter.limit, limiter=limiter.name)
+        return limits
+    
+    def breaker_states(self) -> Dict[str, Dict]:
+        """Circuit breaker state per upstream and Gemini key"""
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+    
+    def select_backends(self) -> List[LLMBackend]:
+        """Backends to try for the next call: least loaded first, the rest as failover"""
+        return sorted(self.llm_backends, key=lambda backend: backend.load)
+    
+    def set_llm_flow(self, keyword: str):
+        """Schedule the current task's LLM calls as one article, weighted by keyword priority"""
+        FairScheduler.set_flow(keyword, self.keyword_scheduler.priorities.get(keyword, 1.0))
+    
+    async def generate_with_gemini(self, prompt: str, model_name: str = 'gemini-1.5-flash',
+                                   hedge: Optional[str] = None, context: Optional[SharedContext] = None) -> str:
+        """Generate content through the configured LLM backends, failing over between them"""
+        response = await self.generate_response(prompt, model_name, hedge, context)
+        return response.text if response else ""
+    
+    async def generate_response(self, prompt: str, model_name: str = 'gemini-1.5-flash',
+                                hedge: Optional[str] = None,
+                                context: Optional[SharedContext] = None) -> Optional[LLMResponse]:
+        """Like generate_with_gemini, but returns the whole response (finish reason, tokens)"""
+        prompt_hash = fingerprint(context.inline(prompt) if context else prompt)
+        
+        async def exchange() -> Tuple[Optional[LLMResponse], int]:
+            if not self.cassette:
+                return await self._generate_live(prompt, model_name, hedge, context)
+            async def live() -> Dict:
+                response, counted = await self._generate_live(prompt, model_name, hedge, context)
+                if response is None:
+                    return {'response': None, 'counted': False}
+                return {'response': dict(asdict(response), key=mask_key(response.key)), 'counted': counted}
+            recorded = await self.cassette.exchange(
+                'llm', {'model': model_name, 'prompt': prompt_hash}, live, summary=model_name
+            )
+            return (LLMResponse(**recorded['response']) if recorded['response'] else None), recorded['counted']
+        
+        def orphaned(result: Tuple[Optional[LLMResponse], int]):
+            # Completed after every caller was cancelled: the quota it spent still counts
+            response, counted = result
+            self.daily_requests += int(counted)
+            if response is not None:
+                self.observe_llm_metrics(response)
+        
+        # Identical prompts already in flight share that call; it is cancelled once nobody awaits it
+        (response, counted), shared = await self.single_flight.do(('llm', model_name, prompt_hash), exchange,
+                                                                  on_orphaned=orphaned)
+        if response is None:
+            return None
+        if shared:
+            self.telemetry.annotate(ok=True, coalesced=True, backend=response.backend, model=response.model)
+            return response
+        self.daily_requests += int(counted)
+        self.record_llm_response(response)
+        return response
+    
+    async def _generate_live(self, prompt: str, model_name: str, hedge: Optional[str] = None,
+                             context: Optional[SharedContext] = None) -> Tuple[Optional[LLMResponse], int]:
+        """Generate, hedging `hedge`-class calls; returns the response and requests that used daily quota"""
+        if hedge is None or self.hedging is None:
+            return await self._generate_attempts(prompt, model_name, context)
+        
+        started = time.perf_counter()
+        delay = self.hedging.delay(hedge)
+        # Backends each call was dispatched to; calls still queued have sent nothing yet
+        dispatched: Dict[asyncio.Future, List[LLMBackend]] = {}
+        
+        def attempt() -> asyncio.Future:
+            sent: List[LLMBackend] = []
+            call = asyncio.ensure_future(self._generate_attempts(prompt, model_name, context, sent.append))
+            dispatched[call] = sent
+            return call
+        
+        primary = attempt()
+        pending = {primary}
+        if delay is not None and (len(self.api_keys) > 1 or len(self.llm_backends) > 1):
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and self.hedging.take():
+                # Key rotation sends the duplicate on the next key (or the next backend)
+                pending.add(attempt())
+                self.telemetry.annotate(hedged=True, hedge_after=round(delay, 3))
+        
+        response, counted = None, 0
+        try:
+            while pending and response is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for call in done:
+                    call_response, used = call.result()
+                    counted += used
+                    if call_response is not None and response is None:
+                        response = call_response
+                        if call is not primary:
+                            self.hedging.wins += 1
+        finally:
+            for call in pending:
+                call.cancel()
+        
+        if response is None:
+            return None, counted
+        # A losing call that was already sent still spends quota; one cancelled while queued does not
+        counted += sum(1 for call in pending if dispatched[call] and dispatched[call][-1].counts_daily_quota)
+        self.hedging.observe(hedge, time.perf_counter() - started)
+        return response, counted
+    
+    async def _generate_attempts(self, prompt: str, model_name: str, context: Optional[SharedContext] = None,
+                                 on_dispatch: Optional[Callable[[LLMBackend], None]] = None
+                                 ) -> Tuple[Optional[LLMResponse], bool]:
+        """Try backends round by round; returns the response and whether it used daily quota"""
+        attempts = int(self.config.get('max_retries', 2))
+        for attempt in range(attempts):
+            backends = self.select_backends()
+            open_circuits = 0
+            for backend in backends:
+                try:
+                    if self.llm_scheduler is None:
+                        response = await backend.generate(prompt, model_name, context=context,
+                                                          on_dispatch=on_dispatch)
+                    else:
+                        queued = time.perf_counter()
+                        async with self.llm_scheduler.slot(model_name):
+                            self.telemetry.add('scheduler_wait', round(time.perf_counter() - queued, 3))
+                            response = await backend.generate(prompt, model_name, context=context,
+                                                              on_dispatch=on_dispatch)
+                except CircuitOpenError as e:
+                    logger.warning(f"Skipping {backend.name} backend: {e}")
+                    self.telemetry.annotate(ok=False, error=str(e))
+                    open_circuits += 1
+                    continue
+                except Exception as e:
+                    logger.error(f"Error with {backend.name} backend: {e}")
+                    self.telemetry.add('retries')
+                    self.telemetry.annotate(ok=False, error=str(e)[:200])
+                    continue
+                return response, backend.counts_daily_quota
+            
+            # Fail fast when every backend is short-circuited, and don't sleep after the last round
+            if open_circuits == len(backends) or attempt + 1 == attempts:
+                break
+            await asyncio.sleep(1)
+        return None, False
+    
+    def record_llm_response(self, response: LLMResponse):
+        """Attach an LLM response to the current span and the process metrics"""
+        key = mask_key(response.key)
+        self.telemetry.add('bytes', len(response.text.encode('utf-8')))
+        self.telemetry.annotate(
+            ok=True,
+            backend=response.backend,
+            model=response.model,
+            key=key,
+            finish_reason=response.finish_reason,
+            throttle_wait=round(response.wait_seconds, 3)
+        )
+        # Summed, since a stage may make several calls (continuations, rewrites)
+        for field in ('prompt_tokens', 'output_tokens', 'total_tokens', 'cached_tokens'):
+            self.telemetry.add(field, getattr(response, field) or 0)
+        self.observe_llm_metrics(response)
+    
+    def observe_llm_metrics(self, response: LLMResponse):
+        """Count an LLM response's latency and tokens in the process metrics"""
+        key = mask_key(response.key)
+        self.metrics.throttle_wait.observe(response.wait_seconds, throttler=response.backend)
+        self.metrics.llm_latency.observe(response.latency_seconds, model=response.model, key=key)
+        self.metrics.llm_tokens.inc(response.prompt_tokens or 0, model=response.model, direction='input')
+        self.metrics.llm_tokens.inc(response.output_tokens or 0, model=response.model, direction='output')
+        self.metrics.llm_tokens.inc(response.cached_tokens or 0, model=response.model, direction='cached')
     
-    async def generate_with_gemini(self, prompt: str, model_name: str = 'gemini-1.5-flash') -> str:
-        """Generate content with Gemini API using optimized rate limiting"""
-        async with self.gemini_throttler:
+    def get_http_session(self) -> 'aiohttp.ClientSession':
+        """Shared session so upstream connections are reused across calls"""
+        import aiohttp
+        
+        loop = asyncio.get_running_loop()
+        if self._http_session is None or self._http_session.closed or self._http_session._loop is not loop:
+            self._http_session = aiohttp.ClientSession()
+        return self._http_session
+    
+    async def http_request(self, service: str, method: str, url: str, headers: Optional[Dict] = None,
+                           params: Optional[Dict] = None, json_body: Optional[Dict] = None,
+                           timeout: float = 30) -> Dict:
+        """Perform one upstream HTTP call and return its status and body"""
+        async def fetch() -> Dict:
+            import aiohttp
+            
+            session = self.get_http_session()
+            async with session.request(
+                method, url, headers=headers, params=params, json=json_body,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                return {'status': response.status, 'body': await response.read()}
+        
+        async def limited() -> Dict:
+            limiter = self.http_limiters.get(service)
+            if limiter is None:
+                return await fetch()
+            async with limiter.slot(method) as call:
+                result = await fetch()
+                call.status = result['status']
+                return result
+        
+        async def live() -> Dict:
+            # An open circuit fails at once instead of waiting out the timeout
+            breaker = self.breaker(service)
+            breaker.check()
             try:
-                api_key = await self.rotate_api_key()
-                genai.configure(api_key=api_key)
-                
-                model = genai.GenerativeModel(model_name)
-                
-                safety_settings = [
-                    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"}
-                ]
-                
-                generation_config = genai.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.8,
-                    max_output_tokens=4000,
-                )
-                
-                response = model.generate_content(
-                    prompt,
-                    safety_settings=safety_settings,
-                    generation_config=generation_config
+                result = await limited()
+            except Exception:
+                breaker.record_failure()
+                raise
+            if is_failure_status(result['status']):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            return result
+        
+        async def exchange() -> Dict:
+            if not self.cassette:
+                result = await live()
+            else:
+                # Hosts and headers are left out: recordings replay against any endpoint without secrets
+                request = {'method': method, 'path': urlparse(url).path, 'params': params,
+                           'body': fingerprint(json_body)}
+                async def recorded_live() -> Dict:
+                    result = await live()
+                    return {'status': result['status'], 'body': encode_body(result['body'])}
+                recorded = await self.cassette.exchange(
+                    f"http:{service}", request, recorded_live, summary=f"{method} {url}"
                 )
-                
-                self.daily_requests += 1
-                return response.text.strip() if response.text else ""
-                
-            except Exception as e:
-                logger.error(f"Error with Gemini API: {e}")
-                await asyncio.sleep(1)
-                return ""
+                result = {'status': recorded['status'], 'body': decode_body(recorded['body'])}
+            self.record_http_status(url, result['status'])
+            return result
+        
+        # Identical requests already in flight (same search, image, path and body) share that call;
+        # it is cancelled once nobody awaits it, and exchange() records its status either way
+        key = (service, method, url, fingerprint(params), fingerprint(json_body))
+        result, shared = await self.single_flight.do(key, exchange)
+        if shared:
+            self.telemetry.annotate(coalesced=True)
+        return result
     
     async def search_images_optimized(self, query: str, count: int = 2) -> List[str]:
         """Optimized image search for serverless environment"""
@@ -208,70 +673,144 @@ class CloudflareOptimizedArticleGenerator:
         # Use Unsplash as primary source (most reliable for serverless)
         unsplash_key = os.environ.get('UNSPLASH_ACCESS_KEY')
         if unsplash_key:
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {'Authorization': f'Client-ID {unsplash_key}'}
-                    params = {'query': query, 'per_page': count, 'orientation': 'landscape'}
-                    
-                    async with session.get(
-                        'https://api.unsplash.com/search/photos',
-                        headers=headers,
-                        params=params,
-                        timeout=aiohttp.ClientTimeout(total=10)
-                    ) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            for photo in data.get('results', []):
-                                img_url = photo.get('urls', {}).get('regular')
-                                if img_url:
-                                    images.append(img_url)
-                                    if len(images) >= count:
-                                        break
-            except Exception as e:
-                logger.error(f"Error with Unsplash API: {e}")
+            with self.telemetry.stage('image_search', query=query) as span:
+                try:
+                    response = await self.http_request(
+                        'unsplash', 'GET', f"{self.unsplash_api_url}/search/photos",
+                        headers={'Authorization': f'Client-ID {unsplash_key}'},
+                        params={'query': query, 'per_page': count, 'orientation': 'landscape'},
+                        timeout=10
+                    )
+                    span['status'] = response['status']
+                    if response['status'] == 200:
+                        span['bytes'] = len(response['body'])
+                        data = json.loads(response['body'])
+                        for photo in data.get('results', []):
+                            img_url = photo.get('urls', {}).get('regular')
+                            if img_url:
+                                images.append(img_url)
+                                if len(images) >= count:
+                                    break
+                    else:
+                        span['ok'] = False
+                except Exception as e:
+                    logger.error(f"Error with Unsplash API: {e}")
+                    span.update(ok=False, error=str(e)[:200])
         
         return images[:count]
     
-    async def upload_image_to_github(self, image_url: str, filename: str) -> Optional[str]:
-        """Upload image directly to GitHub repository"""
+    def record_http_status(self, url, status: int):
+        """Count an upstream HTTP response by host and status"""
+        self.metrics.http_responses.inc(host=urlparse(str(url)).hostname or '', status=status)
+    
+    async def download_image(self, image_url: str) -> Optional[bytes]:
+        """Download an image for upload"""
+        try:
+            with self.telemetry.stage('download', url=image_url) as span:
+                response = await self.http_request('image', 'GET', image_url, timeout=15)
+                span['status'] = response['status']
+                if response['status'] != 200:
+                    span['ok'] = False
+                    return None
+                span['bytes'] = len(response['body'])
+                return response['body']
+        except Exception as e:
+            logger.error(f"Error downloading image: {e}")
+            return None
+    
+    async def upload_image_content(self, encoded_image: str, filename: str) -> Optional[str]:
+        """Upload a base64-encoded image to the GitHub repository"""
         if not self.github_token or not self.github_repo:
             logger.warning("GitHub configuration missing")
             return None
         
+        github_path = f"assets/images/{filename}"
+        github_url = f"{self.github_api_url}/repos/{self.github_repo}/contents/{github_path}"
+        
+        headers = {
+            'Authorization': f'token {self.github_token}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+        
         try:
-            # Download image
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url, timeout=aiohttp.ClientTimeout(total=15)) as response:
-                    if response.status == 200:
-                        image_data = await response.read()
-                        
-                        # Upload to GitHub
-                        github_path = f"assets/images/{filename}"
-                        github_url = f"https://api.github.com/repos/{self.github_repo}/contents/{github_path}"
-                        
-                        headers = {
-                            'Authorization': f'token {self.github_token}',
-                            'Accept': 'application/vnd.github.v3+json'
-                        }
-                        
-                        data = {
-                            'message': f'Add image: {filename}',
-                            'content': base64.b64encode(image_data).decode('utf-8'),
-                            'branch': self.github_branch
-                        }
-                        
-                        async with session.put(github_url, headers=headers, json=data) as upload_response:
-                            if upload_response.status in [200, 201]:
-                                logger.info(f"Image uploaded to GitHub: {filename}")
-                                return f"/assets/images/{filename}"
-                            else:
-                                logger.error(f"GitHub upload failed: {upload_response.status}")
-            
+            with self.telemetry.stage('upload', path=github_path) as span:
+                data = {
+                    'message': f'Add image: {filename}',
+                    'content': encoded_image,
+                    'branch': self.github_branch
+                }
+                span['bytes'] = len(encoded_image)
+                
+                upload_response = await self.http_request('github', 'PUT', github_url, headers=headers, json_body=data)
+                span['status'] = upload_response['status']
+                if upload_response['status'] in [200, 201]:
+                    self.metrics.bytes_uploaded.inc(span['bytes'], kind='image')
+                    logger.info(f"Image uploaded to GitHub: {filename}")
+                    return f"/assets/images/{filename}"
+                else:
+                    span['ok'] = False
+                    logger.error(f"GitHub upload failed: {upload_response['status']}")
+        
         except Exception as e:
             logger.error(f"Error uploading image to GitHub: {e}")
         
         return None
     
+    async def upload_image_to_github(self, image_url: str, filename: str) -> Optional[str]:
+        """Upload image directly to GitHub repository"""
+        if not self.github_token or not self.github_repo:
+            logger.warning("GitHub configuration missing")
+            return None
+        
+        image_data = await self.download_image(image_url)
+        if not image_data:
+            return None
+        encoded_image = await self.process_image(image_data)
+        if not encoded_image:
+            return None
+        return await self.upload_image_content(encoded_image, filename)
+    
+    def prepare_image(self, image_data: bytes) -> Optional[str]:
+        """
+        Downscale and recompress a downloaded image, then base64-encode it for upload
+        
+        Images wider than `image_max_width` (BLOG_CONFIG, default 1200) are
+        resized; every image is re-encoded as a progressive JPEG at
+        `image_quality` (default 82) without metadata, and the original is kept
+        when it is already smaller. Returns None for data that is not an image.
+        """
+        from PIL import Image, UnidentifiedImageError
+        
+        max_width = int(self.config.get('image_max_width', 1200))
+        try:
+            with Image.open(io.BytesIO(image_data)) as image:
+                resized = image.width > max_width
+                if resized:
+                    image.thumbnail((max_width, image.height))
+                output = io.BytesIO()
+                image.convert('RGB').save(
+                    output, 'JPEG', quality=int(self.config.get('image_quality', 82)),
+                    optimize=True, progressive=True
+                )
+                original_jpeg = image.format == 'JPEG'
+        except (UnidentifiedImageError, OSError, ValueError) as e:
+            logger.warning(f"Skipping downloaded image that could not be decoded: {e}")
+            return None
+        if resized or not original_jpeg or output.tell() < len(image_data):
+            image_data = output.getvalue()
+        return base64.b64encode(image_data).decode('utf-8')
+    
+    async def process_image(self, image_data: bytes) -> Optional[str]:
+        """`prepare_image` off the event loop, recorded as the image_process stage"""
+        with self.telemetry.stage('image_process') as span:
+            encoded_image = await asyncio.to_thread(self.prepare_image, image_data)
+            if encoded_image is None:
+                span['ok'] = False
+                return None
+            span['bytes'] = len(image_data)
+            span['output_bytes'] = len(encoded_image) * 3 // 4
+            return encoded_image
+    
     async def create_article_outline(self, keyword: str, title: str) -> Dict:
         """Create structured article outline"""
         outline_prompt = f"""
@@ -312,18 +851,39 @@ class CloudflareOptimizedArticleGenerator:
         Return only valid JSON.
         """
         
-        response = await self.generate_with_gemini(outline_prompt, 'gemini-1.5-pro')
+        with self.telemetry.stage('outline', keyword=keyword) as span:
+            model = self.models.draft_model('outline')
+            outline = self.parse_outline(await self.generate_with_gemini(outline_prompt, model, hedge='outline'))
+            if model != self.models.model('outline'):
+                # Cascade: keep the draft outline unless it fails the local checks
+                problems = outline_problems(outline) if outline else ['invalid JSON']
+                if problems:
+                    logger.info(f"Outline draft from {model} escalated: {', '.join(problems)}")
+                    span['escalated'] = True
+                    response = await self.generate_with_gemini(outline_prompt, self.models.model('outline'),
+                                                               hedge='outline')
+                    outline = self.parse_outline(response) or outline
+            if not outline:
+                logger.error("Failed to parse outline JSON")
+                span['ok'] = False
+            return outline
+    
+    @staticmethod
+    def parse_outline(response: str) -> Dict:
+        """Outline dict from the model's JSON, or {} when it does not parse"""
         try:
-            return json.loads(response)
+            outline = json.loads(response)
         except json.JSONDecodeError:
-            logger.error("Failed to parse outline JSON")
             return {}
+        return outline if isinstance(outline, dict) else {}
     
     async def generate_article_content(self, outline: Dict, keyword: str, title: str) -> str:
         """Generate complete article content based on outline"""
+        brief = None
         try:
-            content_prompt = f"""
-            Write a comprehensive article titled "{title}" for the keyword "{keyword}".
+            # Every call for this article starts with the same brief, so it can be cached once
+            brief = SharedContext(f"""
+            Article brief for the keyword "{keyword}", titled "{title}".
             
             Follow this structure: {json.dumps(outline.get('structure', {}), indent=2)}
             Target audience: {outline.get('keyword_analysis', {}).get('target_audience', 'general readers')}
@@ -336,16 +896,173 @@ class CloudflareOptimizedArticleGenerator:
             - Natural keyword integration (3-5 times)
             - Add bullet points and lists where appropriate
             - Include clear H2 and H3 headings
-            
+            """)
+            content_prompt = f"""
+            Write a comprehensive article titled "{title}" for the keyword "{keyword}", following the brief above.
             Write the complete article in markdown format.
             """
             
-            content = await self.generate_with_gemini(content_prompt, 'gemini-1.5-pro')
-            return content.strip() if content else ""
+            with self.telemetry.stage('content', keyword=keyword) as span:
+                model = self.models.draft_model('article')
+                content = await self.write_content(content_prompt, model, outline, keyword, title, span, brief)
+                if content and model != self.models.model('article'):
+                    content = await self.refine_content(content_prompt, content, outline, keyword, title, span,
+                                                        brief)
+                if self.context_cache:
+                    span['context_tokens'] = brief.tokens
+            if content and self.quality_gate is not None:
+                content = await self.enforce_quality(content_prompt, content, outline, keyword, title, brief)
+            return content
             
         except Exception as e:
             logger.error(f"Error generating content: {e}")
             return ""
+        
+        finally:
+            if brief is not None and self.context_cache:
+                await self.release_brief(brief)
+    
+    async def write_content(self, prompt: str, model: str, outline: Dict, keyword: str, title: str,
+                            span: Dict, brief: SharedContext) -> str:
+        """One article draft from `model`, continued while it stops at the output limit"""
+        response = await self.generate_response(prompt, model, context=brief)
+        content = response.text.strip() if response else ""
+        
+        # Resume output cut off at max_output_tokens instead of keeping a truncated article
+        max_continuations = int(self.config.get('max_continuations', 3))
+        continuations = 0
+        while (content and response and response.finish_reason == 'MAX_TOKENS'
+               and continuations < max_continuations):
+            continuations += 1
+            content = continuation_base(content)
+            prompt = CONTINUATION_PROMPT.format(
+                title=title, keyword=keyword, tail=content[-CONTINUATION_TAIL_CHARS:],
+                remaining=', '.join(missing_sections(outline, content)) or 'the conclusion'
+            )
+            response = await self.generate_response(prompt, model, context=self.follow_up_brief(brief, model))
+            if not response or not response.text.strip():
+                break
+            content = f"{content}\n\n{response.text.strip()}"
+        if continuations:
+            span['continuations'] = span.get('continuations', 0) + continuations
+            span['truncated'] = bool(response and response.finish_reason == 'MAX_TOKENS')
+        return content
+    
+    async def refine_content(self, prompt: str, draft: str, outline: Dict, keyword: str, title: str,
+                             span: Dict, brief: SharedContext) -> str:
+        """Cascade: rewrite drafted sections that fail the local checks with the stage models"""
+        settings = self.models.cascade
+        min_words = int(settings['min_section_words'])
+        sections = split_sections(draft)
+        missing = missing_sections(outline, draft)
+        # Outline sections the draft left out are written like failing ones
+        placed = place_missing_sections(sections, outline, missing)
+        failing = {}
+        for index, (heading, text) in enumerate(sections):
+            # The untitled opening is kept as drafted; rewrites are per H2 section
+            problems = section_problems(text, min_words) if heading else []
+            if index in placed:
+                problems.append("missing from the draft")
+            if problems:
+                failing[index] = problems
+        outline_sections = outline.get('structure', {}).get('sections', [])
+        span['draft_words'] = len(draft.split())
+        if not failing:
+            span['refined'] = 0
+            return draft
+        
+        # One full rewrite costs fewer stage-model requests than many section rewrites
+        if len(failing) > int(settings['max_refined']) or len(missing) > len(outline_sections) // 2:
+            logger.info(f"Draft for '{keyword}' escalated: {len(failing)} weak sections, {len(missing)} missing")
+            span['escalated'] = True
+            content = await self.write_content(prompt, self.models.model('article'), outline, keyword, title, span,
+                                               brief)
+            return content or draft
+        
+        span['refined'] = await self.rewrite_sections(sections, failing, outline, keyword, title, min_words, brief)
+        unwritten = [heading for heading, text in sections if not text]
+        if missing:
+            span['filled'] = len(missing) - len(unwritten)
+        if unwritten:
+            logger.warning(f"Article '{keyword}' still lacks sections: {', '.join(unwritten)}")
+            span['missing'] = unwritten
+        return '\n\n'.join(text for _, text in sections if text)
+    
+    async def rewrite_sections(self, sections: List[Tuple[str, str]], failing: Dict[int, List[str]], outline: Dict,
+                               keyword: str, title: str, min_words: int, brief: SharedContext) -> int:
+        """Rewrite failing H2 sections in place, concurrently, filling empty ones; returns how many were replaced"""
+        async def rewrite_one(index: int) -> Optional[str]:
+            heading, text = sections[index]
+            last = index == len(sections) - 1
+            model = self.models.model('conclusion' if last or 'conclusion' in heading.lower() else 'article')
+            rewrite = await self.generate_with_gemini(REFINE_PROMPT.format(
+                title=title, keyword=keyword, section=text or '(not written yet)', heading=heading,
+                min_words=min_words,
+                problems='; '.join(failing[index]),
+                points=', '.join(section_points(outline, heading)) or 'keep the draft\'s points'
+            ), model, context=self.follow_up_brief(brief, model))
+            if not rewrite:
+                return None
+            rewrite = strip_fences(rewrite)
+            if not rewrite.startswith('## '):
+                rewrite = f"## {heading}\n\n{rewrite}"
+            # Keep whichever version has fewer problems
+            return rewrite if len(section_problems(rewrite, min_words)) < len(failing[index]) else None
+        
+        rewrites = await asyncio.gather(*[rewrite_one(index) for index in failing])
+        for index, rewrite in zip(failing, rewrites):
+            if rewrite:
+                sections[index] = (sections[index][0], rewrite)
+        return sum(1 for rewrite in rewrites if rewrite)
+    
+    async def enforce_quality(self, prompt: str, content: str, outline: Dict, keyword: str, title: str,
+                              brief: SharedContext) -> str:
+        """Local quality gate before publishing; regenerates only what fails, "" when it still fails"""
+        gate = self.quality_gate
+        with self.telemetry.stage('quality', keyword=keyword) as span:
+            content = strip_fences(content)
+            try:
+                report = assess_article(content, keyword, gate)
+            except ImportError as e:
+                logger.warning(f"Quality gate skipped, missing dependency: {e}")
+                span['skipped'] = True
+                return content
+            rounds = 0
+            while not report['passed'] and rounds < int(gate['max_rounds']):
+                rounds += 1
+                logger.info(f"Quality gate failed for '{keyword}': {', '.join(report['failed'])}")
+                if any(check in ARTICLE_CHECKS for check in report['failed']):
+                    rewrite = await self.write_content(prompt, self.models.model('article'), outline, keyword,
+                                                       title, span, brief)
+                    content = strip_fences(rewrite) or content
+                elif report['sections']:
+                    sections = split_sections(content)
+                    span['rewritten'] = span.get('rewritten', 0) + await self.rewrite_sections(
+                        sections, report['sections'], outline, keyword, title, int(gate['min_section_words']), brief
+                    )
+                    content = '\n\n'.join(text for _, text in sections)
+                else:
+                    break
+                report = assess_article(content, keyword, gate)
+            span.update(quality_score=report['score'], quality_rounds=rounds, words=report['words'],
+                        h2=report['h2'], keyword_density=report['keyword_density'], language=report['language'])
+            if not report['passed']:
+                span['ok'] = False
+                span['failed_checks'] = report['failed']
+                if gate['block']:
+                    logger.error(f"Not publishing '{keyword}', quality checks failed: {', '.join(report['failed'])}")
+                    self.quality_rejected.add(keyword)
+                    return ""
+                logger.warning(f"Publishing '{keyword}' despite failed quality checks: {', '.join(report['failed'])}")
+        return content
+    
+    def follow_up_brief(self, brief: SharedContext, model: str) -> Optional[SharedContext]:
+        """Continuations and rewrites carry their own context; they add the brief only when it is cached for `model`"""
+        return brief if self.context_cache and brief.cached_for(model) else None
+    
+    async def release_brief(self, brief: SharedContext):
+        """Delete the brief's cached contents once the article is written, instead of paying until the TTL"""
+        await asyncio.gather(*[backend.release_context(brief) for backend in self.llm_backends])
     
     async def save_article_to_github(self, article: Dict) -> bool:
         """Save article directly to GitHub repository"""
@@ -354,6 +1071,8 @@ class CloudflareOptimizedArticleGenerator:
             return False
         
         try:
+            import frontmatter
+            
             # Create filename
             date_str = datetime.datetime.now().strftime('%Y-%m-%d')
             filename = f"{date_str}-{article['slug']}.md"
@@ -367,7 +1086,7 @@ class CloudflareOptimizedArticleGenerator:
             post_content = frontmatter.dumps(post)
             
             # Upload to GitHub
-            github_url = f"https://api.github.com/repos/{self.github_repo}/contents/{github_path}"
+            github_url = f"{self.github_api_url}/repos/{self.github_repo}/contents/{github_path}"
             
             headers = {
                 'Authorization': f'token {self.github_token}',
@@ -380,56 +1099,167 @@ class CloudflareOptimizedArticleGenerator:
                 'branch': self.github_branch
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.put(github_url, headers=headers, json=data) as response:
-                    if response.status in [200, 201]:
-                        logger.info(f"Article saved to GitHub: {filename}")
-                        return True
-                    else:
-                        logger.error(f"GitHub save failed: {response.status}")
-                        error_text = await response.text()
-                        logger.error(f"Error details: {error_text}")
-                        return False
+            with self.telemetry.stage('save', path=github_path) as span:
+                span['bytes'] = len(data['content'])
+                response = await self.http_request('github', 'PUT', github_url, headers=headers, json_body=data)
+                span['status'] = response['status']
+                if response['status'] in [200, 201]:
+                    self.metrics.bytes_uploaded.inc(span['bytes'], kind='article')
+                    article['post_path'] = github_path
+                    try:
+                        article['blob_sha'] = json.loads(response['body']).get('content', {}).get('sha', '')
+                    except (ValueError, AttributeError):
+                        pass
+                    logger.info(f"Article saved to GitHub: {filename}")
+                    return True
+                else:
+                    span['ok'] = False
+                    logger.error(f"GitHub save failed: {response['status']}")
+                    logger.error(f"Error details: {response['body'].decode('utf-8', 'replace')}")
+                    return False
         
         except Exception as e:
             logger.error(f"Error saving to GitHub: {e}")
             return False
     
+    async def generate_article_text(self, keyword: str) -> Optional[Dict]:
+        """Generate title, outline and content: the LLM part of an article"""
+        title_prompt = f"""
+        Create an SEO-optimized, engaging title for "{keyword}".
+        Requirements: Under 60 characters, includes keyword, professional, click-worthy.
+        Return only the title.
+        """
+        
+        with self.telemetry.stage('title', keyword=keyword) as span:
+            packed = await self.packed_entry(keyword)
+            if packed:
+                span['packed'] = True
+                title = packed['title']
+            else:
+                title = await self.generate_with_gemini(title_prompt, self.models.model('title'), hedge='title')
+        if not title:
+            return None
+        
+        logger.info(f"Generated title: {title}")
+        
+        # Create outline unless a packed call already produced a usable one
+        outline = packed.get('outline') if packed else None
+        if not outline or outline_problems(outline):
+            outline = await self.create_article_outline(keyword, title)
+        if not outline:
+            return None
+        
+        # Generate content
+        content = await self.generate_article_content(outline, keyword, title)
+        if not content:
+            return None
+        
+        return {'title': title, 'outline': outline, 'content': content}
+    
+    async def fill_packed(self, keywords: List[str]) -> int:
+        """One packed call for the first `size` keywords without a cached entry; returns entries cached"""
+        outlines = bool(self.packed_settings.get('outlines'))
+        keywords = self.packed_cache.missing(keywords, outlines)[:int(self.packed_settings.get('size', 5))]
+        if not keywords:
+            return 0
+        prompt = PACKED_PROMPT.format(
+            keywords=json.dumps(keywords),
+            outline_request=PACKED_OUTLINE_REQUEST if outlines else '',
+            outline_field=', "outline": {...}' if outlines else ''
+        )
+        model = self.models.draft_model('outline') if outlines else self.models.model('title')
+        response = await self.generate_with_gemini(prompt, model)
+        entries = parse_packed(response, keywords) if response else {}
+        self.packed_cache.put(entries)
+        logger.info(f"Packed call cached {len(entries)}/{len(keywords)} keywords")
+        return len(entries)
+    
+    async def prefetch_packed(self, keywords: List[str]):
+        """Fill the packed cache for a batch's keywords before its articles start"""
+        if self.packed_settings is None:
+            return
+        size = int(self.packed_settings.get('size', 5))
+        outlines = bool(self.packed_settings.get('outlines'))
+        missing = self.packed_cache.missing(keywords, outlines)
+        for start in range(0, len(missing), size):
+            with self.telemetry.stage('packed', keywords=len(missing[start:start + size])):
+                await self.fill_packed(missing[start:start + size])
+    
+    async def packed_entry(self, keyword: str) -> Optional[Dict]:
+        """Cached packed result for `keyword`; a miss packs it with the next queued keywords"""
+        if self.packed_settings is None:
+            return None
+        size = int(self.packed_settings.get('size', 5))
+        for _ in range(2):
+            entry = self.packed_cache.take(keyword)
+            if entry is not None:
+                return entry
+            upcoming = self.keyword_scheduler.peek(size - 1, exclude=self.used_keywords | {keyword})
+            # One refill at a time; a caller whose keyword it did not cover tries once more
+            _, shared = await self.single_flight.do(('packed',), lambda: self.fill_packed([keyword] + upcoming))
+            if not shared:
+                break
+        return self.packed_cache.take(keyword)
+    
+    @staticmethod
+    def featured_image_query(keyword: str, outline: Dict) -> Optional[str]:
+        """Image search query when any outline section asks for an image"""
+        sections_with_images = [s for s in outline.get('structure', {}).get('sections', []) 
+                              if s.get('needs_image', False)]
+        return f"{keyword} interior design" if sections_with_images else None
+    
+    def build_article(self, keyword: str, title: str, outline: Dict, content: str,
+                      featured_image: str = "") -> Dict:
+        """Assemble the article dict with front matter"""
+        article_slug = slugify(title)
+        article_date = datetime.datetime.now()
+        
+        seo_data = outline.get('seo', {})
+        
+        frontmatter_data = {
+            'layout': 'post',
+            'title': title,
+            'description': seo_data.get('meta_description', title),
+            'date': article_date.strftime('%Y-%m-%d %H:%M:%S +0000'),
+            'categories': [self.config.get('category', 'Interior Design')],
+            'tags': seo_data.get('keywords', [keyword]) + keyword.split()[:2],
+            'author': self.config.get('author', 'Admin'),
+            'featured_image': featured_image,
+            'seo': {
+                'title': title,
+                'description': seo_data.get('meta_description', title),
+                'keywords': ', '.join(seo_data.get('keywords', [keyword]))
+            }
+        }
+        
+        article = {
+            'title': title,
+            'slug': article_slug,
+            'keyword': keyword,
+            'content': content,
+            'frontmatter': frontmatter_data,
+            'created_at': article_date.isoformat(),
+            'word_count': len(content.split()),
+            'outline': outline
+        }
+        
+        logger.info(f"Article generated successfully: {title} ({article['word_count']} words)")
+        return article
+    
     async def generate_complete_article(self, keyword: str) -> Optional[Dict]:
         """Generate a complete article optimized for serverless execution"""
         try:
             logger.info(f"Starting article generation for: {keyword}")
             
-            # Generate title
-            title_prompt = f"""
-            Create an SEO-optimized, engaging title for "{keyword}".
-            Requirements: Under 60 characters, includes keyword, professional, click-worthy.
-            Return only the title.
-            """
-            
-            title = await self.generate_with_gemini(title_prompt)
-            if not title:
-                return None
-            
-            logger.info(f"Generated title: {title}")
-            
-            # Create outline
-            outline = await self.create_article_outline(keyword, title)
-            if not outline:
-                return None
-            
-            # Generate content
-            content = await self.generate_article_content(outline, keyword, title)
-            if not content:
+            text = await self.generate_article_text(keyword)
+            if not text:
                 return None
             
             # Handle images
             featured_image = ""
-            sections_with_images = [s for s in outline.get('structure', {}).get('sections', []) 
-                                  if s.get('needs_image', False)]
+            image_query = self.featured_image_query(keyword, text['outline'])
             
-            if sections_with_images:
-                image_query = f"{keyword} interior design"
+            if image_query and self.fits('image_search', 'download', 'image_process', 'upload', 'save'):
                 image_urls = await self.search_images_optimized(image_query, 1)
                 
                 if image_urls:
@@ -438,55 +1268,114 @@ class CloudflareOptimizedArticleGenerator:
                     if uploaded_path:
                         featured_image = uploaded_path
             
-            # Create article data
-            article_slug = slugify(title)
-            article_date = datetime.datetime.now()
-            
-            seo_data = outline.get('seo', {})
-            
-            frontmatter_data = {
-                'layout': 'post',
-                'title': title,
-                'description': seo_data.get('meta_description', title),
-                'date': article_date.strftime('%Y-%m-%d %H:%M:%S +0000'),
-                'categories': [self.config.get('category', 'Interior Design')],
-                'tags': seo_data.get('keywords', [keyword]) + keyword.split()[:2],
-                'author': self.config.get('author', 'Admin'),
-                'featured_image': featured_image,
-                'seo': {
-                    'title': title,
-                    'description': seo_data.get('meta_description', title),
-                    'keywords': ', '.join(seo_data.get('keywords', [keyword]))
-                }
-            }
-            
-            article = {
-                'title': title,
-                'slug': article_slug,
-                'keyword': keyword,
-                'content': content,
-                'frontmatter': frontmatter_data,
-                'created_at': article_date.isoformat(),
-                'word_count': len(content.split()),
-                'outline': outline
-            }
-            
-            logger.info(f"Article generated successfully: {title} ({article['word_count']} words)")
-            return article
+            return self.build_article(keyword, text['title'], text['outline'], text['content'], featured_image)
             
         except Exception as e:
             logger.error(f"Error in article generation: {e}")
             return None
     
+    def fits(self, *stages: str) -> bool:
+        """Whether the current run's deadline leaves time for `stages`"""
+        deadline = Deadline.current()
+        return deadline is None or deadline.allows(self.stage_estimates.needed(*stages))
+    
+    def _checkpoint_path(self, keyword: str) -> Path:
+        return self.checkpoint_dir / f"{slugify(keyword)}.json"
+    
+    def checkpoint_article(self, article: Dict) -> bool:
+        """Keep an article that could not be published in time for the next run"""
+        path = self._checkpoint_path(article['keyword'])
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(article, ensure_ascii=False), encoding='utf-8')
+            tmp_path.replace(path)
+            logger.info(f"Checkpointed article for next run: {article['title']}")
+            return True
+        except OSError as e:
+            logger.error(f"Could not checkpoint article: {e}")
+            return False
+    
+    def load_checkpoint(self, keyword: str) -> Optional[Dict]:
+        """A checkpointed article for `keyword`, if an earlier run left one"""
+        path = self._checkpoint_path(keyword)
+        try:
+            if path.exists():
+                return json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    
+    def discard_checkpoint(self, keyword: str):
+        try:
+            self._checkpoint_path(keyword).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not remove checkpoint: {e}")
+    
+    async def generate_before_deadline(self, keyword: str) -> Optional[Dict]:
+        """A checkpointed article or a fresh one; raises TimeoutError when the deadline passes first"""
+        article = self.load_checkpoint(keyword)
+        if article is not None:
+            logger.info(f"Resuming checkpointed article: {article['title']}")
+            return article
+        if not self.fits('title', 'outline', 'content', 'save'):
+            raise TimeoutError("Not enough time left to generate an article")
+        deadline = Deadline.current()
+        self.set_llm_flow(keyword)
+        # Generation is cancelled at the deadline; publishing is admitted separately and never cut short
+        async with deadline.scope() if deadline else contextlib.nullcontext():
+            return await self.generate_complete_article(keyword)
+    
+    async def publish_before_deadline(self, article: Dict) -> Optional[bool]:
+        """Save the article if there is time, else checkpoint it; None means checkpointed"""
+        if not self.fits('save'):
+            self.checkpoint_article(article)
+            return None
+        saved = await self.save_article_to_github(article)
+        if saved:
+            self.discard_checkpoint(article['keyword'])
+        return saved
+    
+    def record_article(self, article: Dict) -> ArticleRecord:
+        """Track a saved article as a compact record; the body lives in the saved post"""
+        record = ArticleRecord.from_article(article)
+        self.articles_data.append(record)
+        self.used_keywords.add(article['keyword'])
+        return record
+    
+    def enable_profiling(self, profiler):
+        """Profile every following run; accepts a Profiler, an output directory or None to stop"""
+        if profiler is not None and not isinstance(profiler, Profiler):
+            profiler = Profiler(profiler)
+        self.profiler = profiler
+        self.telemetry.profiler = profiler
+    
+    async def close_connections(self):
+        """Close pooled connections; they are reopened on next use"""
+        for backend in self.llm_backends:
+            await backend.close()
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+    
+    async def close(self):
+        """Release connections and flush a recording cassette"""
+        await self.close_connections()
+        if self.cassette:
+            self.cassette.save()
+    
+    def count_articles_today(self) -> int:
+        """Articles saved since midnight"""
+        today = datetime.date.today().isoformat()
+        return sum(1 for a in self.articles_data if a.created_at.startswith(today))
+    
     def check_daily_limits(self) -> bool:
         """Check if generation is within daily limits"""
-        today = datetime.date.today().isoformat()
-        today_articles = [a for a in self.articles_data if a.get('created_at', '').startswith(today)]
+        today_articles = self.count_articles_today()
         
         max_daily = self.config.get('max_daily_articles', 2)
         
-        if len(today_articles) >= max_daily:
-            logger.info(f"Daily article limit reached: {len(today_articles)}/{max_daily}")
+        if today_articles >= max_daily:
+            logger.info(f"Daily article limit reached: {today_articles}/{max_daily}")
             return False
         
         if self.daily_requests >= self.max_daily_requests:
@@ -495,7 +1384,7 @@ class CloudflareOptimizedArticleGenerator:
         
         return True
     
-    async def run(self) -> Dict:
+    async def run(self, keyword: Optional[str] = None, deadline: Optional[Deadline] = None) -> Dict:
         """Main execution method optimized for serverless"""
         result = {
             'success': False,
@@ -506,6 +1395,10 @@ class CloudflareOptimizedArticleGenerator:
                 'articles_today': 0
             }
         }
+        spans = self.telemetry.begin_run()
+        profile = self.profiler.begin_run() if self.profiler else None
+        if deadline is not None:
+            deadline.activate()
         
         try:
             logger.info("Starting CloudflareOptimizedArticleGenerator")
@@ -519,32 +1412,37 @@ class CloudflareOptimizedArticleGenerator:
                 return result
             
             # Get keyword
-            keyword = self.get_next_keyword()
+            keyword = keyword or self.get_next_keyword()
             if not keyword:
                 result['message'] = "No keywords available"
                 return result
             
-            # Generate article
-            article = await self.generate_complete_article(keyword)
+            # Generate article (or resume a checkpointed one) within the run deadline
+            try:
+                article = await self.generate_before_deadline(keyword)
+            except TimeoutError:
+                result['message'] = "Deadline reached before the article was generated"
+                return result
             if not article:
-                result['message'] = "Failed to generate article"
+                if keyword in self.quality_rejected:
+                    result['message'] = "Article failed the quality gate"
+                else:
+                    result['message'] = "Failed to generate article"
                 return result
             
-            # Save to GitHub
-            if await self.save_article_to_github(article):
+            # Save to GitHub, or checkpoint for the next run when the save no longer fits
+            saved = await self.publish_before_deadline(article)
+            if saved is None:
+                result['message'] = "Deadline reached; article checkpointed for the next run"
+            elif saved:
                 # Update tracking data
-                self.articles_data.append(article)
-                self.used_keywords.add(keyword)
+                record = self.record_article(article)
                 
                 result['success'] = True
                 result['message'] = f"Successfully created: {article['title']}"
-                result['article'] = {
-                    'title': article['title'],
-                    'slug': article['slug'],
-                    'keyword': keyword,
-                    'word_count': article['word_count']
-                }
+                result['article'] = record.to_dict()
                 result['stats']['api_calls'] = self.daily_requests
+                self.metrics.article_saved()
                 
                 logger.info(f"✅ Article generation completed: {article['title']}")
             else:
@@ -554,14 +1452,188 @@ class CloudflareOptimizedArticleGenerator:
             logger.error(f"Error in main execution: {e}")
             result['message'] = f"Execution error: {str(e)}"
         
+        finally:
+            if keyword:
+                rejected = keyword in self.quality_rejected
+                self.quality_rejected.discard(keyword)
+                self.keyword_scheduler.complete(keyword, success=result['success'], rejected=rejected)
+                result['stats']['rejected'] = rejected
+            self._collect_stats(result['stats'], spans, profile, slugify(keyword or 'run')[:60])
+        
         return result
+    
+    def _collect_stats(self, stats: Dict, spans: List[Dict], profile: Optional[RunProfile] = None,
+                       profile_name: str = 'run'):
+        """Finish a run's stats: stage spans, profile reports, limiter/breaker/cache state and the metrics file"""
+        if profile is not None:
+            stats['profile'] = self.profiler.end_run(profile, profile_name)
+        stats['api_calls'] = self.daily_requests
+        stats['stages'] = spans
+        stats['stage_summary'] = StageRecorder.summarize(spans)
+        stats['limits'] = self.adaptive_limits()
+        stats['coalesced'] = self.single_flight.shared
+        stats['breakers'] = self.breaker_states()
+        if self.hedging:
+            stats['hedging'] = self.hedging.stats()
+        if self.context_cache:
+            stats['context_cache'] = self.context_cache.stats()
+        if self.packed_settings is not None:
+            stats['packed_hits'] = self.packed_cache.hits
+        if os.environ.get('METRICS_TEXTFILE'):
+            self.metrics.write_textfile(os.environ['METRICS_TEXTFILE'])
+    
+    async def run_batch(self, count: Optional[int] = None, keywords: Optional[List[str]] = None,
+                        deadline: Optional[Deadline] = None) -> Dict:
+        """Generate several articles, feeding keywords in priority order"""
+        count = count or len(keywords or []) or int(self.config.get('articles_per_run', 1))
+        result = {
+            'success': False,
+            'message': '',
+            'articles': [],
+            'stats': {
+                'api_calls': self.daily_requests,
+                'articles_today': 0,
+                'rejected': []
+            }
+        }
+        
+        if not self.api_keys:
+            result['message'] = "No API keys available"
+            return result
+        
+        keywords = keywords or self.get_next_keywords(count)
+        if not keywords:
+            result['message'] = "No keywords available"
+            return result
+        
+        spans = []
+        profile = None
+        if deadline is not None:
+            deadline.activate()
+        try:
+            await self.prefetch_packed(keywords)
+            pipeline_settings = self.config.get('pipeline')
+            if pipeline_settings:
+                # Stages run as separate worker pools joined by bounded queues, profiled as one run
+                from pipeline import ArticlePipeline
+                pipeline = ArticlePipeline(self, pipeline_settings if isinstance(pipeline_settings, dict) else None)
+                profile = self.profiler.begin_run() if self.profiler else None
+                run_results = await pipeline.run(keywords)
+                for run_result in run_results:
+                    spans.extend(run_result['stats']['stages'])
+                    if run_result['article']:
+                        result['articles'].append(run_result['article'])
+                    if run_result['stats']['rejected']:
+                        result['stats']['rejected'].append(run_result['keyword'])
+                result['stats']['queue_peaks'] = pipeline.queue_peaks
+            else:
+                for index, keyword in enumerate(keywords):
+                    if not self.fits('title', 'outline', 'content', 'save'):
+                        logger.info("Run deadline reached, stopping batch")
+                        for unused in keywords[index:]:
+                            self.keyword_scheduler.release(unused)
+                        break
+                    run_result = await self.run(keyword)
+                    spans.extend(run_result['stats']['stages'])
+                    if run_result['article']:
+                        result['articles'].append(run_result['article'])
+                    if run_result['stats'].get('rejected'):
+                        result['stats']['rejected'].append(keyword)
+                    if run_result['message'] == "Daily limits reached":
+                        for unused in keywords[index + 1:]:
+                            self.keyword_scheduler.release(unused)
+                        break
+            
+            result['success'] = bool(result['articles'])
+            result['message'] = f"Created {len(result['articles'])}/{len(keywords)} articles"
+        finally:
+            self._collect_stats(result['stats'], spans, profile, 'pipeline')
+        return result
+
+
+# Environment that shapes a generator; a change rebuilds the warm instance
+GENERATOR_ENV_VARS = (
+    'GEMINI_API_KEYS', 'PIXEL_API_CONFIG', 'BLOG_CONFIG', 'LLM_BACKENDS', 'GEMINI_API_ENDPOINT',
+    'GITHUB_TOKEN', 'GITHUB_REPO', 'GITHUB_BRANCH', 'GITHUB_API_URL', 'UNSPLASH_API_URL',
+    'KEYWORD_QUEUE_FILE', 'STAGE_LOG_PATH', 'CASSETTE_MODE', 'CASSETTE_PATH', 'CASSETTE_SPEED',
+    'PROFILE_DIR', 'PROFILE_TOP', 'CHECKPOINT_DIR', 'PACKED_CACHE_FILE'
+)
+
+_warm = {'generator': None, 'config': None, 'state': None, 'day': None, 'loop': None}
+
+
+def generator_config_fingerprint() -> Tuple:
+    """Everything __init__ reads, including backend key variables, apikey.txt and CONFIG.txt"""
+    names = list(GENERATOR_ENV_VARS)
+    names += [spec['api_key_env'] for spec in backend_specs_from_environment() if spec.get('api_key_env')]
+    api_file = Path(__file__).parent / 'apikey.txt'
+    api_file_mtime = api_file.stat().st_mtime if api_file.exists() else None
+    config_file_mtime = CONFIG_FILE.stat().st_mtime if CONFIG_FILE.exists() else None
+    return tuple(os.environ.get(name) for name in names) + (api_file_mtime, config_file_mtime)
+
+
+async def get_warm_generator() -> CloudflareOptimizedArticleGenerator:
+    """Reuse one generator per warm container, rebuilding it when its config changes"""
+    config = generator_config_fingerprint()
+    generator = _warm['generator']
+    
+    if generator is None or _warm['config'] != config:
+        if generator is not None:
+            logger.info("Configuration changed, rebuilding warm generator")
+            try:
+                await generator.close()
+            except Exception as e:
+                logger.warning(f"Error closing previous generator: {e}")
+        generator = CloudflareOptimizedArticleGenerator()
+        _warm.update(generator=generator, config=config,
+                     state=os.environ.get('ARTICLES_DATA'), day=datetime.date.today())
+        return generator
+    
+    # Fresh usage state from the caller replaces what this instance remembers
+    if os.environ.get('ARTICLES_DATA') != _warm['state']:
+        generator.load_from_environment()
+        _warm['state'] = os.environ.get('ARTICLES_DATA')
+    elif _warm['day'] != datetime.date.today():
+        generator.daily_requests = 0
+    _warm['day'] = datetime.date.today()
+    logger.info("Reusing warm generator")
+    return generator
 
 
 # Serverless entry point
 async def lambda_handler(event=None, context=None):
     """AWS Lambda / Cloudflare Workers compatible handler"""
-    generator = CloudflareOptimizedArticleGenerator()
-    result = await generator.run()
+    event = event or {}
+    
+    # With a job queue configured, triggers only enqueue; workers generate
+    if os.environ.get('JOB_QUEUE_DB'):
+        from job_queue import JobQueue
+        payload = {'keyword': event['keyword']} if event.get('keyword') else {}
+        source = event.get('source') or os.environ.get('TRIGGER_SOURCE', 'lambda')
+        job_id = JobQueue().enqueue(source, payload)
+        return {
+            'statusCode': 202,
+            'body': json.dumps({'success': True, 'message': 'Job enqueued', 'job_id': job_id}),
+            'headers': {
+                'Content-Type': 'application/json'
+            }
+        }
+    
+    # Warm containers keep the generator: key rotation, throttlers, caches and pooled connections
+    generator = await get_warm_generator()
+    if event.get('profile'):
+        previous_profiler = generator.profiler
+        generator.enable_profiling(event.get('profile_dir') or os.environ.get('PROFILE_DIR') or '/tmp/profiles')
+    try:
+        result = await generator.run(deadline=Deadline.from_invocation(event, context, generator.config))
+    finally:
+        if event.get('profile'):
+            generator.enable_profiling(previous_profiler)
+        if generator.cassette:
+            generator.cassette.save()
+        # Pools are bound to this loop; only handler()'s persistent loop can keep them open
+        if asyncio.get_running_loop() is not _warm['loop']:
+            await generator.close_connections()
     
     return {
         'statusCode': 200 if result['success'] else 500,
@@ -571,11 +1643,34 @@ async def lambda_handler(event=None, context=None):
         }
     }
 
+def handler(event=None, context=None):
+    """Synchronous entry point; one event loop per container keeps pooled connections usable"""
+    loop = _warm.get('loop')
+    if loop is None or loop.is_closed():
+        loop = _warm['loop'] = asyncio.new_event_loop()
+    return loop.run_until_complete(lambda_handler(event, context))
+
 # Standard execution
-async def main():
+async def main(profile_dir: Optional[str] = None):
     """Standard async main for direct execution"""
     generator = CloudflareOptimizedArticleGenerator()
-    result = await generator.run()
+    if profile_dir:
+        generator.enable_profiling(profile_dir)
+    deadline = Deadline.from_invocation(config=generator.config)
+    if os.environ.get('JOB_QUEUE_DB'):
+        # Triggers enqueue their jobs; this run then drains the queue, retrying jobs earlier runs left
+        from job_queue import enqueue_and_drain
+        topic = os.environ.get('CUSTOM_TOPIC', '').strip()
+        result = await enqueue_and_drain(
+            generator, os.environ.get('TRIGGER_SOURCE', 'manual'), {'keyword': topic} if topic else {},
+            count=int(generator.config.get('articles_per_run', 1)),
+            workers=int(generator.config.get('queue_workers', 1)), deadline=deadline
+        )
+    elif int(generator.config.get('articles_per_run', 1)) > 1:
+        result = await generator.run_batch(deadline=deadline)
+    else:
+        result = await generator.run(deadline=deadline)
+    await generator.close()
     
     print(json.dumps(result, indent=2))
     
@@ -588,5 +1683,9 @@ async def main():
 
 if __name__ == "__main__":
     import sys
-    exit_code = asyncio.run(main())
+    import argparse
+    parser = argparse.ArgumentParser(description='Generate articles')
+    parser.add_argument('--profile', metavar='DIR', help='Write cProfile and tracemalloc reports to DIR')
+    args = parser.parse_args()
+    exit_code = asyncio.run(main(args.profile))
     sys.exit(exit_code)
\ No newline at end of file
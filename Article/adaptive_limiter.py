@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AIMD concurrency limits for upstream services
+Raise the limit additively while calls succeed, cut it multiplicatively on 429/503, timeouts or latency spikes
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean the upstream wants less traffic
+OVERLOAD_STATUSES = (429, 503)
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status carried by an exception (LLMBackendError.status, google.api_core `code`)"""
+    for attribute in ('status', 'code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+class _Call:
+    __slots__ = ('label', 'started', 'status')
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.monotonic()
+        self.status: Optional[int] = None
+
+    def restart(self):
+        """Measure latency from now, e.g. after waiting on a rate limiter"""
+        self.started = time.monotonic()
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency window for one upstream, adjusted like TCP congestion control
+
+    Every successful call grows the limit by `increase / limit`, i.e. by
+    `increase` per window of calls. An overload status, a timeout or a call
+    slower than `latency_factor` times the usual latency for its label cuts
+    the limit by `decrease`; calls already in flight at the last cut do not
+    cut it again.
+    """
+
+    def __init__(self, name: str, initial: int = 4, minimum: int = 1, maximum: int = 16,
+                 increase: float = 1.0, decrease: float = 0.5, latency_factor: float = 3.0):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = float('-inf')
+        self._baseline: Dict[str, float] = {}
+        self._samples: Dict[str, int] = {}
+        self._waiters: deque = deque()
+
+    @classmethod
+    def from_settings(cls, name: str, settings: Optional[Dict], **defaults) -> 'AdaptiveLimiter':
+        """Build from a BLOG_CONFIG "adaptive_limits" entry over the given defaults"""
+        return cls(name, **{**defaults, **(settings or {})})
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def stats(self) -> Dict:
+        return {'limit': self.limit, 'in_flight': self.in_flight, 'decreases': self.decreases}
+
+    def slot(self, label: str = '') -> '_Slot':
+        """`async with limiter.slot(label) as call:`; set `call.status` for non-raising responses"""
+        return _Slot(self, label)
+
+    async def _acquire(self):
+        if self.in_flight >= self.limit or self._waiters:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()
+                elif future in self._waiters:
+                    self._waiters.remove(future)
+                raise
+        else:
+            self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def _complete(self, call: _Call, error: Optional[BaseException]):
+        latency = time.monotonic() - call.started
+        status = call.status if call.status is not None else (error_status(error) if error else None)
+        if status in OVERLOAD_STATUSES:
+            self._cut(call, f"status {status}")
+        elif isinstance(error, TimeoutError):
+            self._cut(call, "timeout")
+        elif error is None and (status is None or status < 500):
+            if self._is_spike(call.label, latency):
+                self._cut(call, f"latency {latency:.2f}s")
+            else:
+                self._limit = min(self.maximum, self._limit + self.increase / self._limit)
+        self._release()
+
+    def _is_spike(self, label: str, latency: float) -> bool:
+        baseline = self._baseline.get(label)
+        samples = self._samples.get(label, 0)
+        self._samples[label] = samples + 1
+        self._baseline[label] = latency if baseline is None else baseline * 0.8 + latency * 0.2
+        return baseline is not None and samples >= 5 and latency > baseline * self.latency_factor
+
+    def _cut(self, call: _Call, reason: str):
+        if call.started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self._limit = max(self.minimum, self._limit * self.decrease)
+        self.decreases += 1
+        logger.info(f"{self.name} limit cut to {self.limit} ({reason})")
+
+
+class _Slot:
+    __slots__ = ('limiter', 'label', 'call')
+
+    def __init__(self, limiter: AdaptiveLimiter, label: str):
+        self.limiter = limiter
+        self.label = label
+        self.call: Optional[_Call] = None
+
+    async def __aenter__(self) -> _Call:
+        await self.limiter._acquire()
+        self.call = _Call(self.label)
+        return self.call
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if isinstance(exc, asyncio.CancelledError):
+            self.limiter._release()
+        else:
+            self.limiter._complete(self.call, exc)
+        return False
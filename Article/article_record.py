@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact history records for generated articles
+The article body lives in its _posts file; history keeps only what limits and dedup need
+"""
+
+import hashlib
+from dataclasses import dataclass, asdict
+from typing import Dict
+from slugify import slugify
+
+
+def record_slug(data: Dict) -> str:
+    """The entry's slug, or one derived from its post filename, title or keyword"""
+    filename = data.get('filename', '')
+    return (data.get('slug') or filename[11:].removesuffix('.md')
+            or slugify(data.get('title') or data.get('keyword') or ''))
+
+
+@dataclass(slots=True)
+class ArticleRecord:
+    """One generated article without its content, outline or front matter"""
+    slug: str
+    keyword: str = ''
+    title: str = ''
+    created_at: str = ''
+    word_count: int = 0
+    post_path: str = ''
+    image_path: str = ''
+    content_sha256: str = ''
+    blob_sha: str = ''
+
+    @classmethod
+    def from_article(cls, article: Dict) -> 'ArticleRecord':
+        """Summarise a freshly generated (and saved) article dict"""
+        return cls(
+            slug=record_slug(article),
+            keyword=article.get('keyword', ''),
+            title=article.get('title', ''),
+            created_at=article.get('created_at', ''),
+            word_count=article.get('word_count', 0),
+            post_path=article.get('post_path', ''),
+            image_path=article.get('frontmatter', {}).get('featured_image', ''),
+            content_sha256=hashlib.sha256(article.get('content', '').encode('utf-8')).hexdigest(),
+            blob_sha=article.get('blob_sha', '')
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ArticleRecord':
+        """Load from ARTICLES_DATA, including legacy full-article and worker-built entries"""
+        if 'content' in data or 'outline' in data:
+            return cls.from_article(data)
+        filename = data.get('filename', '')
+        return cls(
+            slug=record_slug(data),
+            keyword=data.get('keyword', ''),
+            title=data.get('title', ''),
+            created_at=data.get('created_at', ''),
+            word_count=data.get('word_count', 0),
+            post_path=data.get('post_path') or (f"_posts/{filename}" if filename else ''),
+            image_path=data.get('image_path', ''),
+            content_sha256=data.get('content_sha256', ''),
+            blob_sha=data.get('blob_sha', '')
+        )
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline throughput benchmark for CloudflareOptimizedArticleGenerator
+Runs the generator against local aiohttp stand-ins for Gemini, Unsplash and GitHub
+
+Example:
+    python benchmark.py --articles 20 --concurrency 4 --no-throttle \\
+        --gemini latency=0.8,jitter=0.5,tail=0.05,error_rate=0.02 \\
+        --github latency=0.2,rate_limit=30
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import logging
+import resource
+import multiprocessing
+from dataclasses import dataclass, fields
+from typing import List, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of one stand-in service"""
+    latency: float = 0.05      # base response time in seconds
+    jitter: float = 0.2        # +/- fraction applied to latency
+    tail: float = 0.0          # probability of a 10x slow response
+    error_rate: float = 0.0    # probability of a 503
+    rate_limit: int = 0        # requests per rate_period before 429 (0 = unlimited)
+    rate_period: float = 60.0
+    image_kb: int = 150        # approximate size of served 1600px JPEGs (Unsplash only)
+    max_words: int = 0         # LLM replies are cut here with MAX_TOKENS (0 = never)
+    thin: float = 0.0          # probability that a flash model writes an article section too short
+    prefill: float = 0.0       # extra seconds per 1000 uncached prompt tokens (LLM only)
+    cache_min_tokens: int = 0  # smaller Gemini cached contents are rejected with 400
+    stuffed: float = 0.0       # probability that an article section repeats the keyword over and over
+    fenced: float = 0.0        # probability that an article comes wrapped in a ```markdown fence
+
+    @classmethod
+    def parse(cls, spec: str) -> 'MockConfig':
+        """Build from `key=value,key=value`"""
+        config = cls()
+        types = {f.name: f.type for f in fields(cls)}
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            key, _, value = item.partition('=')
+            if key not in types:
+                raise ValueError(f"Unknown mock setting: {key}")
+            setattr(config, key, (int if types[key] in (int, 'int') else float)(value))
+        return config
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def _mock_body(keyword: str, length: int, rng: random.Random) -> str:
+    vocabulary = keyword.split() + ['design', 'space', 'light', 'texture', 'layout', 'budget',
+                                    'materials', 'colour', 'storage', 'comfort', 'style', 'plan']
+    return ' '.join(rng.choice(vocabulary) for _ in range(length)).capitalize() + '.'
+
+
+def _mock_markdown(keyword: str, words: int = 1300, thin: float = 0.0,
+                   headings: Optional[List[str]] = None, stuffed: float = 0.0, fenced: float = 0.0) -> str:
+    rng = random.Random(keyword)
+    sections = []
+    per_section = words // 6
+    # The outline's section headings, then a conclusion
+    for heading in (headings or [f"{keyword} {i}" for i in range(5)]) + ['Conclusion']:
+        length = 20 if rng.random() < thin else per_section
+        body = _mock_body(keyword, length, rng)
+        if stuffed and rng.random() < stuffed:
+            body = f"{body} " + ' '.join([f"Best {keyword}."] * 40)
+        sections.append(f"## {heading.title()}\n\n{body}\n\n- Tip about {keyword}\n")
+    article = f"# {keyword.title()}\n\n" + '\n'.join(sections)
+    return f"```markdown\n{article}\n```" if fenced and rng.random() < fenced else article
+
+
+def _mock_outline(keyword: str) -> str:
+    return json.dumps({
+        'keyword_analysis': {'search_intent': 'informational', 'target_audience': 'homeowners',
+                             'main_topics': [keyword]},
+        'structure': {
+            'introduction': {'hook': 'hook', 'overview': 'overview', 'value': 'value'},
+            'sections': [{'heading': f"{keyword} {i}", 'content_points': ['a', 'b'],
+                          'needs_image': i == 0} for i in range(5)],
+            'conclusion': {'summary': 'summary', 'action': 'action'}
+        },
+        'seo': {'meta_description': f"Guide to {keyword}", 'keywords': [keyword], 'estimated_length': 1500}
+    })
+
+
+def _mock_reply(prompt: str, thin: float = 0.0, stuffed: float = 0.0, fenced: float = 0.0) -> str:
+    """Title, outline JSON, article markdown, a section rewrite or a packed plan depending on the prompt"""
+    packed = re.search(r'for each of these keywords: (\[.*?\])', prompt)
+    if packed:
+        outlines = '"outline"' in prompt
+        return json.dumps({'articles': [
+            dict({'keyword': keyword, 'title': f"{keyword.title()}: A Practical Guide"},
+                 **({'outline': json.loads(_mock_outline(keyword))} if outlines else {}))
+            for keyword in json.loads(packed.group(1))
+        ]})
+    match = re.search(r'(?:keyword|targeting|for) "([^"]+)"', prompt)
+    keyword = match.group(1) if match else 'home design'
+    if 'Return JSON format' in prompt:
+        return _mock_outline(keyword)
+    if 'Continue the article' in prompt:
+        remaining = re.search(r'Sections still to write: (.+)', prompt)
+        headings = remaining.group(1).split(', ') if remaining else ['Conclusion']
+        rng = random.Random(prompt)
+        return '\n\n'.join(f"## {heading.title()}\n\n{_mock_body(keyword, 150, rng)}" for heading in headings)
+    if 'Rewrite one section' in prompt:
+        heading = re.search(r'starting with the line "## ([^"]+)"', prompt)
+        body = _mock_body(keyword, 200, random.Random(prompt))
+        return f"## {heading.group(1) if heading else 'Section'}\n\n{body}\n\n- Tip about {keyword}"
+    if 'Write a comprehensive article' in prompt:
+        return _mock_markdown(keyword, thin=thin, headings=re.findall(r'"heading": "([^"]+)"', prompt),
+                              stuffed=stuffed, fenced=fenced)
+    return f"{keyword.title()}: A Practical Guide"
+
+
+def _truncate(text: str, max_words: int) -> Tuple[str, str]:
+    """Cut a reply at `max_words` the way an output token limit would"""
+    words = text.split(' ')
+    if not max_words or len(words) <= max_words:
+        return text, 'STOP'
+    return ' '.join(words[:max_words]), 'MAX_TOKENS'
+
+
+def mock_photo(image_kb: int, width: int = 1600, height: int = 1067) -> bytes:
+    """A decodable JPEG of about `image_kb`, wider than the generator's default resize limit"""
+    import io
+    from PIL import Image
+
+    image = Image.effect_noise((width, height), 8).convert('RGB')
+    best = b''
+    for quality in range(5, 100, 5):
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=quality)
+        if not best or abs(output.tell() - image_kb * 1024) < abs(len(best) - image_kb * 1024):
+            best = output.getvalue()
+    return best
+
+
+def build_mock_app(service: str, config: MockConfig, seed: int = 0):
+    """aiohttp application standing in for one upstream service"""
+    from aiohttp import web
+
+    rng = random.Random(seed)
+    window: List[float] = []
+    stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'bytes_in': 0, 'bytes_out': 0}
+    store: Dict[str, str] = {}
+    caches: Dict[str, str] = {}
+    photo = mock_photo(config.image_kb) if service == 'unsplash' else b''
+
+    @web.middleware
+    async def behaviour(request, handler):
+        if request.path == '/__stats':
+            return web.json_response(stats)
+        stats['requests'] += 1
+        stats['bytes_in'] += request.content_length or 0
+        now = time.monotonic()
+        if config.rate_limit:
+            while window and window[0] <= now - config.rate_period:
+                window.pop(0)
+            if len(window) >= config.rate_limit:
+                stats['throttled'] += 1
+                return web.json_response({'error': {'code': 429, 'message': 'Rate limit exceeded'}}, status=429)
+            window.append(now)
+        delay = config.latency * (1 + rng.uniform(-config.jitter, config.jitter))
+        if rng.random() < config.tail:
+            delay *= 10
+        await asyncio.sleep(max(0.0, delay))
+        if rng.random() < config.error_rate:
+            stats['errors'] += 1
+            return web.json_response({'error': {'code': 503, 'message': 'Unavailable'}}, status=503)
+        response = await handler(request)
+        stats['bytes_out'] += response.content_length or 0
+        return response
+
+    def _contents_text(body: Dict) -> str:
+        return ''.join(part.get('text', '') for content in body.get('contents', [])
+                       for part in content.get('parts', []))
+
+    def _count_tokens(prompt_tokens: int, cached_tokens: int = 0):
+        stats['prompt_tokens'] = stats.get('prompt_tokens', 0) + prompt_tokens
+        stats['cached_tokens'] = stats.get('cached_tokens', 0) + cached_tokens
+
+    async def gemini_generate(request):
+        body = await request.json()
+        model = request.match_info['model']
+        models = stats.setdefault('models', {})
+        models[model] = models.get(model, 0) + 1
+        prompt = _contents_text(body)
+        cached = ''
+        if body.get('cachedContent'):
+            if body['cachedContent'] not in caches:
+                return web.json_response({'error': {'code': 404, 'message': 'Cached content not found'}},
+                                         status=404)
+            cached = caches[body['cachedContent']]
+        _count_tokens(len(cached + prompt) // 4, len(cached) // 4)
+        await asyncio.sleep(config.prefill * len(prompt) / 4000)
+        thin = config.thin if 'flash' in model else 0.0
+        text, finish_reason = _truncate(_mock_reply(cached + prompt, thin, config.stuffed, config.fenced),
+                                          config.max_words)
+        return web.json_response({
+            'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'},
+                            'finishReason': finish_reason, 'index': 0}],
+            'usageMetadata': {'promptTokenCount': len(cached + prompt) // 4,
+                              'cachedContentTokenCount': len(cached) // 4,
+                              'candidatesTokenCount': len(text) // 4,
+                              'totalTokenCount': (len(cached + prompt) + len(text)) // 4}
+        })
+
+    async def gemini_create_cache(request):
+        body = await request.json()
+        text = _contents_text(body)
+        if len(text) // 4 < config.cache_min_tokens:
+            return web.json_response({'error': {'code': 400, 'message': 'Cached content is too small'}},
+                                     status=400)
+        name = f"cachedContents/{hashlib.md5(text.encode()).hexdigest()[:12]}"
+        caches[name] = text
+        stats['cache_creates'] = stats.get('cache_creates', 0) + 1
+        now = time.time()
+        ttl = float(str(body.get('ttl', '3600s')).rstrip('s'))
+        stamp = lambda seconds: time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(seconds))
+        return web.json_response({
+            'name': name, 'model': body.get('model'), 'displayName': body.get('displayName', ''),
+            'createTime': stamp(now), 'updateTime': stamp(now), 'expireTime': stamp(now + ttl),
+            'usageMetadata': {'totalTokenCount': len(text) // 4}
+        })
+
+    async def gemini_delete_cache(request):
+        name = f"cachedContents/{request.match_info['name']}"
+        if caches.pop(name, None) is None:
+            return web.json_response({'error': {'code': 404, 'message': 'Cached content not found'}}, status=404)
+        stats['cache_deletes'] = stats.get('cache_deletes', 0) + 1
+        return web.json_response({})
+
+    async def openai_chat(request):
+        body = await request.json()
+        prompt = ''.join(message.get('content', '') for message in body.get('messages', []))
+        _count_tokens(len(prompt) // 4)
+        await asyncio.sleep(config.prefill * len(prompt) / 4000)
+        text, finish_reason = _truncate(_mock_reply(prompt), config.max_words)
+        return web.json_response({
+            'id': 'chatcmpl-benchmark',
+            'model': body.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                         'finish_reason': 'length' if finish_reason == 'MAX_TOKENS' else 'stop'}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(text) // 4,
+                      'total_tokens': (len(prompt) + len(text)) // 4}
+        })
+
+    async def unsplash_search(request):
+        count = int(request.query.get('per_page', 1))
+        base = f"{request.scheme}://{request.host}"
+        query_hash = hashlib.md5(request.query.get('query', '').encode()).hexdigest()[:8]
+        return web.json_response({'results': [
+            {'id': f"{query_hash}{i}", 'urls': {'regular': f"{base}/photos/{query_hash}{i}.jpg"}}
+            for i in range(count)
+        ]})
+
+    async def unsplash_photo(request):
+        return web.Response(body=photo, content_type='image/jpeg')
+
+    def _sha(data: str) -> str:
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    async def github_get_contents(request):
+        path = request.match_info['path']
+        if path not in store:
+            return web.json_response({'message': 'Not Found'}, status=404)
+        return web.json_response({'path': path, 'sha': _sha(store[path]), 'content': store[path]})
+
+    async def github_put_contents(request):
+        path = request.match_info['path']
+        body = await request.json()
+        status = 200 if path in store else 201
+        store[path] = body.get('content', '')
+        return web.json_response({'content': {'path': path, 'sha': _sha(store[path])},
+                                  'commit': {'sha': _sha(path + store[path])}}, status=status)
+
+    async def github_create(request):
+        body = await request.text()
+        return web.json_response({'sha': _sha(body)}, status=201)
+
+    async def github_get_ref(request):
+        return web.json_response({'ref': f"refs/heads/{request.match_info['branch']}",
+                                  'object': {'sha': _sha(request.match_info['branch']), 'type': 'commit'}})
+
+    async def github_update_ref(request):
+        body = await request.json()
+        return web.json_response({'object': {'sha': body.get('sha', ''), 'type': 'commit'}})
+
+    app = web.Application(middlewares=[behaviour], client_max_size=64 * 1024 * 1024)
+    if service == 'gemini':
+        app.router.add_post('/{version}/models/{model}:generateContent', gemini_generate)
+        app.router.add_post('/{version}/cachedContents', gemini_create_cache)
+        app.router.add_delete('/{version}/cachedContents/{name}', gemini_delete_cache)
+    elif service == 'openai':
+        app.router.add_post('/v1/chat/completions', openai_chat)
+    elif service == 'unsplash':
+        app.router.add_get('/search/photos', unsplash_search)
+        app.router.add_get('/photos/{name}', unsplash_photo)
+    elif service == 'github':
+        repo = '/repos/{owner}/{repo}'
+        app.router.add_get(repo + '/contents/{path:.+}', github_get_contents)
+        app.router.add_put(repo + '/contents/{path:.+}', github_put_contents)
+        for kind in ('blobs', 'trees', 'commits'):
+            app.router.add_post(f"{repo}/git/{kind}", github_create)
+        app.router.add_get(repo + '/git/ref/heads/{branch:.+}', github_get_ref)
+        app.router.add_patch(repo + '/git/refs/heads/{branch:.+}', github_update_ref)
+    return app
+
+
+def _serve_mocks(configs: Dict[str, MockConfig], ports, ready):
+    """Mock server process: one listener per service"""
+    from aiohttp import web
+
+    async def start():
+        for index, (service, config) in enumerate(configs.items()):
+            runner = web.AppRunner(build_mock_app(service, config, seed=index))
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            ports[service] = runner.addresses[0][1]
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(start())
+
+
+class MockServers:
+    """Runs the stand-ins in a separate process so they don't skew RSS or CPU"""
+
+    def __init__(self, configs: Dict[str, MockConfig]):
+        self.configs = configs
+        self.urls: Dict[str, str] = {}
+        self._process = None
+
+    def __enter__(self) -> 'MockServers':
+        context = multiprocessing.get_context('spawn')
+        manager = context.Manager()
+        ports = manager.dict()
+        ready = manager.Event()
+        self._manager = manager
+        self._process = context.Process(target=_serve_mocks, args=(self.configs, ports, ready), daemon=True)
+        self._process.start()
+        if not ready.wait(30):
+            raise RuntimeError("Mock servers failed to start")
+        self.urls = {service: f"http://127.0.0.1:{port}" for service, port in ports.items()}
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join(5)
+        self._manager.shutdown()
+
+    def environment(self) -> Dict[str, str]:
+        """Environment that points the generator at the stand-ins"""
+        backends = []
+        if 'gemini' in self.urls:
+            backends.append({'type': 'gemini'})
+        if 'openai' in self.urls:
+            backends.append({'type': 'openai', 'base_url': f"{self.urls['openai']}/v1",
+                             'model': 'benchmark-local', 'concurrency': 8, 'rate_limit': 10 ** 6, 'period': 1})
+        return {
+            'LLM_BACKENDS': json.dumps(backends),
+            'GEMINI_API_ENDPOINT': self.urls.get('gemini', ''),
+            'UNSPLASH_API_URL': self.urls['unsplash'],
+            'UNSPLASH_ACCESS_KEY': 'benchmark',
+            'GITHUB_API_URL': self.urls['github'],
+            'GITHUB_TOKEN': 'benchmark',
+            'GITHUB_REPO': 'benchmark/blog',
+            'KEYWORD_QUEUE_FILE': '',
+            'PACKED_CACHE_FILE': '',
+            'ARTICLES_DATA': '{}',
+        }
+
+    async def stats(self) -> Dict[str, Dict]:
+        import aiohttp
+
+        result = {}
+        async with aiohttp.ClientSession() as session:
+            for service, url in self.urls.items():
+                async with session.get(f"{url}/__stats") as response:
+                    result[service] = await response.json()
+        return result
+
+
+REPLAY_ENVIRONMENT = {
+    'UNSPLASH_API_URL': 'http://unsplash.replay.invalid',
+    'UNSPLASH_ACCESS_KEY': 'replay',
+    'GITHUB_API_URL': 'http://github.replay.invalid',
+    'GITHUB_TOKEN': 'replay',
+    'GITHUB_REPO': 'benchmark/blog',
+    'KEYWORD_QUEUE_FILE': '',
+    'PACKED_CACHE_FILE': '',
+    'ARTICLES_DATA': '{}',
+}
+
+
+async def run_benchmark(servers: Optional[MockServers], articles: int, concurrency: int, keys: int,
+                        throttle: bool, pipeline: Optional[Dict] = None, fair: bool = True,
+                        hedging: Optional[Dict] = None, topics: Optional[int] = None,
+                        cascade: Optional[Dict] = None, packed: Optional[Dict] = None,
+                        context_cache: Optional[Dict] = None) -> Dict:
+    """Generate `articles` articles with up to `concurrency` in flight"""
+    # Without servers every exchange must come from a replayed cassette
+    os.environ.update(servers.environment() if servers else REPLAY_ENVIRONMENT)
+    os.environ['GEMINI_API_KEYS'] = ','.join(f"bench-key-{i:02d}" for i in range(keys))
+    from asyncio_throttle.throttler import Throttler
+    from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+    generator = CloudflareOptimizedArticleGenerator({
+        'max_daily_articles': articles + 1, 'llm_scheduler': {} if fair else False,
+        'hedging': hedging, 'model_cascade': cascade, 'packed_prompts': packed,
+        'context_cache': context_cache
+    })
+    generator.max_daily_requests = 10 ** 9
+    if not throttle:
+        generator.gemini_throttler = Throttler(rate_limit=10 ** 6, period=1)
+        for backend in generator.llm_backends:
+            backend.throttler = generator.gemini_throttler
+
+    # Fewer topics than articles repeats keywords, so identical requests overlap
+    keywords = [f"benchmark topic {i % (topics or articles)}" for i in range(articles)]
+    semaphore = asyncio.Semaphore(concurrency)
+    completed: List[float] = []
+
+    async def one(keyword: str) -> Dict:
+        async with semaphore:
+            result = await generator.run(keyword)
+        if result['success']:
+            completed.append(time.perf_counter() - started)
+        return result
+
+    started = time.perf_counter()
+    # As run_batch does, plan the whole batch with packed calls up front
+    await generator.prefetch_packed(keywords)
+    if pipeline is not None:
+        from pipeline import ArticlePipeline
+        runner = ArticlePipeline(generator, pipeline)
+        results = await runner.run(keywords)
+    else:
+        results = await asyncio.gather(*[one(keyword) for keyword in keywords])
+    elapsed = time.perf_counter() - started
+    limits = generator.adaptive_limits()
+    await generator.close()
+
+    spans = [span for result in results for span in result['stats'].get('stages', [])]
+    stage_latency: Dict[str, List[float]] = {}
+    for span in spans:
+        stage_latency.setdefault(span['stage'], []).append(span['wall_ms'])
+    succeeded = sum(1 for result in results if result['success'])
+
+    return {
+        'articles': articles,
+        'succeeded': succeeded,
+        'concurrency': concurrency,
+        'pipeline': runner.settings if pipeline is not None else None,
+        'queue_peaks': runner.queue_peaks if pipeline is not None else None,
+        'api_keys': keys,
+        'throttled_client': throttle,
+        'wall_seconds': round(elapsed, 3),
+        'articles_per_minute': round(succeeded / elapsed * 60, 2) if elapsed else 0.0,
+        'fair_scheduler': fair,
+        'completed_s': {
+            'first': round(completed[0], 2),
+            'p50': round(percentile(completed, 50), 2),
+            'last': round(completed[-1], 2)
+        } if completed else None,
+        'stages_ms': {
+            stage: {
+                'count': len(values),
+                'p50': round(percentile(values, 50), 2),
+                'p95': round(percentile(values, 95), 2),
+                'p99': round(percentile(values, 99), 2),
+                'max': round(max(values), 2)
+            }
+            for stage, values in sorted(stage_latency.items())
+        },
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'failures': sorted({result['message'] for result in results if not result['success']}),
+        'limits': limits,
+        'hedging': generator.hedging.stats() if generator.hedging else None,
+        'coalesced': generator.single_flight.shared,
+        'models': generator.models.models,
+        'cascade': {
+            'escalated': sum(1 for span in spans if span.get('escalated')),
+            'refined_sections': sum(span.get('refined', 0) for span in spans)
+        } if cascade else None,
+        'packed_hits': generator.packed_cache.hits if packed else None,
+        'context_cache': generator.context_cache.stats() if generator.context_cache else None,
+        'quality_gate': {
+            'checked': sum(1 for span in spans if span['stage'] == 'quality'),
+            'failed': sum(1 for span in spans if span['stage'] == 'quality' and not span['ok']),
+            'rounds': sum(span.get('quality_rounds', 0) for span in spans),
+            'rewritten_sections': sum(span.get('rewritten', 0) for span in spans)
+        },
+        'cassette': os.environ.get('CASSETTE_MODE') or None,
+        'upstream': await servers.stats() if servers else {}
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Offline article generator benchmark')
+    parser.add_argument('--articles', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--keys', type=int, default=3, help='Fake Gemini API keys to rotate')
+    parser.add_argument('--no-throttle', action='store_true', help='Lift the client-side Gemini throttler')
+    parser.add_argument('--llm', choices=['gemini', 'openai', 'both'], default='gemini',
+                        help='LLM backends to run against')
+    parser.add_argument('--gemini', default='latency=0.5', help='Mock settings, e.g. latency=0.5,error_rate=0.02')
+    parser.add_argument('--openai', default='latency=0.3', help='Mock OpenAI-compatible server settings')
+    parser.add_argument('--unsplash', default='latency=0.1')
+    parser.add_argument('--github', default='latency=0.15')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument('--record', metavar='PATH', help='Record every upstream exchange to a cassette')
+    cassette.add_argument('--replay', metavar='PATH', help='Replay a cassette instead of starting mocks')
+    parser.add_argument('--pipeline', nargs='?', const='', metavar='SETTINGS',
+                        help='Use the staged pipeline, e.g. llm=4,images=2,processing=1,publish=2,queue_size=4')
+    parser.add_argument('--replay-speed', type=float, default=1.0, help='Scale replayed latencies')
+    parser.add_argument('--no-fair', action='store_true', help='Disable the fair LLM scheduler')
+    parser.add_argument('--topics', type=int, help='Distinct keywords to cycle through (default: one per article)')
+    parser.add_argument('--hedge', nargs='?', const='', metavar='SETTINGS',
+                        help='Hedge title/outline calls, e.g. budget=0.2,percentile=90,min_samples=10')
+    parser.add_argument('--packed', nargs='?', const='', metavar='SETTINGS',
+                        help='Plan titles in packed calls, e.g. size=8,outlines=1')
+    parser.add_argument('--context-cache', nargs='?', const='', metavar='SETTINGS',
+                        help='Cache the shared article brief, e.g. min_tokens=0,ttl_seconds=300')
+    parser.add_argument('--cascade', nargs='?', const='', metavar='SETTINGS',
+                        help='Draft with flash and refine weak parts, e.g. min_section_words=120,max_refined=3')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    configs = {}
+    if args.llm in ('gemini', 'both'):
+        configs['gemini'] = MockConfig.parse(args.gemini)
+    if args.llm in ('openai', 'both'):
+        configs['openai'] = MockConfig.parse(args.openai)
+    configs['unsplash'] = MockConfig.parse(args.unsplash)
+    configs['github'] = MockConfig.parse(args.github)
+    pipeline = None
+    if args.pipeline is not None:
+        pipeline = {key: int(value) for key, _, value in
+                    (item.partition('=') for item in args.pipeline.split(',') if item)}
+    hedging = None
+    if args.hedge is not None:
+        hedging = {key: float(value) for key, _, value in
+                   (item.partition('=') for item in args.hedge.split(',') if item)} or True
+    cascade = None
+    if args.cascade is not None:
+        cascade = {key: int(value) if value.isdigit() else value for key, _, value in
+                   (item.partition('=') for item in args.cascade.split(',') if item)} or True
+    context_cache = None
+    if args.context_cache is not None:
+        context_cache = {key: float(value) for key, _, value in
+                         (item.partition('=') for item in args.context_cache.split(',') if item)} or True
+    packed = None
+    if args.packed is not None:
+        packed = {key: int(value) for key, _, value in
+                  (item.partition('=') for item in args.packed.split(',') if item)} or True
+    if args.record or args.replay:
+        os.environ.update({
+            'CASSETTE_MODE': 'record' if args.record else 'replay',
+            'CASSETTE_PATH': args.record or args.replay,
+            'CASSETTE_SPEED': str(args.replay_speed)
+        })
+    if args.replay:
+        report = asyncio.run(run_benchmark(
+            None, args.articles, args.concurrency, args.keys, not args.no_throttle, pipeline,
+            not args.no_fair, hedging, args.topics, cascade, packed, context_cache
+        ))
+    else:
+        with MockServers(configs) as servers:
+            report = asyncio.run(run_benchmark(
+                servers, args.articles, args.concurrency, args.keys, not args.no_throttle, pipeline,
+                not args.no_fair, hedging, args.topics, cascade, packed, context_cache
+            ))
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    return 0 if report['succeeded'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
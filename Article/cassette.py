@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Record/replay cassettes for deterministic performance runs
+Captures LLM and HTTP exchanges with their latencies; secrets are never stored
+"""
+
+import io
+import os
+import gzip
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from functools import lru_cache
+from collections import defaultdict, deque
+from typing import Dict, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Binary bodies above this size are stored as size + hash and synthesised on replay
+INLINE_BINARY_LIMIT = 4096
+
+
+def fingerprint(value) -> str:
+    """Stable short hash of any JSON-serialisable value"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:24]
+
+
+def _image_size(body: bytes) -> Optional[Tuple[int, int]]:
+    """Pixel dimensions when `body` is an image Pillow can read"""
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(body)) as image:
+            return image.size
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=16)
+def _synthetic_image(size: int, width: int, height: int, seed: str) -> bytes:
+    """Deterministic JPEG with the recorded dimensions, padded to the recorded size"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    small = (max(1, width // 16), max(1, height // 16))
+    image = Image.frombytes('RGB', small, rng.randbytes(small[0] * small[1] * 3)).resize((width, height))
+    for quality in range(90, 0, -10):
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=quality)
+        if output.tell() <= size:
+            break
+    # Decoders stop at the end-of-image marker, so the padding is never read
+    return output.getvalue() + bytes(max(0, size - output.tell()))
+
+
+def encode_body(body: bytes) -> Dict:
+    """Store text verbatim and large binaries as a compact placeholder"""
+    try:
+        return {'text': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        pass
+    if len(body) <= INLINE_BINARY_LIMIT:
+        return {'hex': body.hex()}
+    stored = {'size': len(body), 'sha256': hashlib.sha256(body).hexdigest()}
+    dimensions = _image_size(body)
+    if dimensions:
+        stored['image'] = list(dimensions)
+    return stored
+
+
+def decode_body(stored: Dict) -> bytes:
+    if 'text' in stored:
+        return stored['text'].encode('utf-8')
+    if 'hex' in stored:
+        return bytes.fromhex(stored['hex'])
+    if 'image' in stored:
+        # Images are resized and recompressed after download, so replay needs a real one
+        return _synthetic_image(stored['size'], *stored['image'], stored['sha256'])
+    return random.Random(stored['sha256']).randbytes(stored['size'])
+
+
+class CassetteMiss(Exception):
+    """Replay found no recording for a request"""
+
+
+class ReplayedError(Exception):
+    """An exception that was raised while recording, raised again on replay"""
+
+
+class Cassette:
+    """
+    Records exchanges to a gzipped JSON file or replays them
+
+    Replay first matches the exact request fingerprint, then falls back to
+    the next unused recording of the same kind (requests that embed dates or
+    other run-specific data), and sleeps for the originally observed latency
+    scaled by `speed`.
+    """
+
+    def __init__(self, path: str, mode: str = 'replay', speed: float = 1.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.speed = speed
+        self.entries = []
+        self._by_key: Dict[str, deque] = defaultdict(deque)
+        self._by_kind: Dict[str, deque] = defaultdict(deque)
+        self._used = set()
+        if mode == 'replay':
+            self._load()
+
+    @classmethod
+    def from_environment(cls) -> Optional['Cassette']:
+        """CASSETTE_MODE=record|replay with CASSETTE_PATH and optional CASSETTE_SPEED"""
+        mode = os.environ.get('CASSETTE_MODE', '').lower()
+        if not mode:
+            return None
+        return cls(
+            os.environ.get('CASSETTE_PATH', 'run.cassette.json.gz'),
+            mode,
+            float(os.environ.get('CASSETTE_SPEED', '1'))
+        )
+
+    def _load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        self.entries = data.get('entries', [])
+        for index, entry in enumerate(self.entries):
+            self._by_key[entry['key']].append(index)
+            self._by_kind[entry['kind']].append(index)
+        logger.info(f"Replaying {len(self.entries)} exchanges from {self.path}")
+
+    def save(self):
+        """Write recorded exchanges (record mode only)"""
+        if self.mode != 'record':
+            return
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump({'version': 1, 'created_at': time.time(), 'entries': self.entries}, f,
+                      separators=(',', ':'))
+        tmp_path.replace(self.path)
+        logger.info(f"Recorded {len(self.entries)} exchanges to {self.path}")
+
+    def _next(self, queue: deque) -> Optional[int]:
+        while queue:
+            index = queue.popleft()
+            if index not in self._used:
+                self._used.add(index)
+                return index
+        return None
+
+    async def exchange(self, kind: str, request: Dict, live: Callable[[], Awaitable[Dict]],
+                       summary: str = '') -> Dict:
+        """Run or replay one exchange; `request` must not contain secrets"""
+        key = fingerprint([kind, request])
+        if self.mode == 'replay':
+            index = self._next(self._by_key[key])
+            if index is None:
+                index = self._next(self._by_kind[kind])
+            if index is None:
+                raise CassetteMiss(f"No recording left for {kind} {summary}")
+            entry = self.entries[index]
+            await asyncio.sleep(entry['latency'] * self.speed)
+            if 'error' in entry:
+                raise ReplayedError(entry['error'])
+            return entry['response']
+
+        started = time.perf_counter()
+        entry = {'kind': kind, 'key': key, 'summary': summary}
+        try:
+            entry['response'] = await live()
+            return entry['response']
+        except Exception as e:
+            entry['error'] = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            entry['latency'] = round(time.perf_counter() - started, 4)
+            self.entries.append(entry)
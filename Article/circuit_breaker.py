@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Circuit breakers per upstream provider (and per Gemini key)
+Open after consecutive failures, fail fast while open, then let single probes through
+"""
+
+import time
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+
+def is_failure_status(status: Optional[int]) -> bool:
+    """Statuses that count against an upstream: throttling and server errors"""
+    return status is not None and (status == 429 or status >= 500)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures
+
+    While open, `allow()` refuses calls until `reset_timeout` seconds have
+    passed; then the breaker is half-open and admits one probe at a time. A
+    successful probe closes it, a failed one reopens it. A probe that never
+    reports back stops blocking others after another `reset_timeout`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state this claims the probe"""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+            self._probe_started = None
+        if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+            return False
+        self._probe_started = now
+        return True
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go out"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self.state = CLOSED
+        self.failures = 0
+        self._probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            self._probe_started = None
+            self.trips += 1
+            logger.warning(f"{self.name} circuit opened after {self.failures} consecutive failures")
+
+    def stats(self) -> Dict:
+        return {'state': self.state, 'failures': self.failures, 'trips': self.trips}
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared article context and Gemini context caching
+The brief and outline an article's calls share can be uploaded once and referenced by later calls
+"""
+
+import time
+import hashlib
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Smallest cached content each model family accepts, in tokens; unknown models get the largest
+MIN_CACHE_TOKENS = {
+    'gemini-1.5': 32768,
+    'gemini-2.0': 4096,
+    'gemini-2.5-pro': 4096,
+    'gemini-2.5-flash': 1024
+}
+
+
+class SharedContext:
+    """
+    Text that every LLM call for one article starts with
+
+    Backends without context caching send it inline ahead of the prompt.
+    A caching backend records the cached content it created for this
+    context in `cached`, so the article's later calls reuse it. Once the
+    article is done the context is released and the cached contents deleted.
+    """
+
+    def __init__(self, text: str):
+        self.text = text.strip()
+        self.digest = hashlib.sha256(self.text.encode('utf-8')).hexdigest()[:16]
+        self.uses = 0
+        # (backend, model) pairs that already tried to cache this context
+        self.attempted: Set[Tuple[str, str]] = set()
+        # (backend, model) -> (api key that owns the cache, cached content name, monotonic expiry)
+        self.cached: Dict[Tuple[str, str], Tuple[str, str, float]] = {}
+        self.released = False
+
+    @property
+    def tokens(self) -> int:
+        """Rough token count, four characters per token"""
+        return len(self.text) // 4
+
+    def inline(self, prompt: str) -> str:
+        return f"{self.text}\n\n{prompt.strip()}"
+
+    def cached_for(self, model: str) -> bool:
+        """Whether some backend holds an unexpired cached copy for `model`"""
+        now = time.monotonic()
+        return any(cached_model == model and entry[2] > now
+                   for (_, cached_model), entry in self.cached.items())
+
+
+class ContextCache:
+    """
+    When a backend should upload a shared context instead of resending it
+
+    The upload starts on a context's `min_uses`-th call and runs alongside
+    it, so only later calls reference the cache. Contexts below `min_tokens`
+    (by default the smallest the model accepts, see MIN_CACHE_TOKENS) are
+    always sent inline, as they are for a model that once rejected cache
+    creation with a 400; `too_small` counts them so an inert cache shows up
+    in the run stats.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, min_tokens: Optional[int] = None, min_uses: int = 1):
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.min_uses = min_uses
+        self.unsupported: Set[str] = set()
+        self.created = 0
+        self.deleted = 0
+        self.hits = 0
+        self.inline = 0
+        self.too_small = 0
+
+    @classmethod
+    def from_config(cls, settings) -> Optional['ContextCache']:
+        """BLOG_CONFIG "context_cache": true for defaults or a dict of settings; off when absent"""
+        if not settings:
+            return None
+        return cls(**settings) if isinstance(settings, dict) else cls()
+
+    def minimum(self, model: str) -> int:
+        if self.min_tokens is not None:
+            return self.min_tokens
+        for prefix, tokens in MIN_CACHE_TOKENS.items():
+            if model.startswith(prefix):
+                return tokens
+        return max(MIN_CACHE_TOKENS.values())
+
+    def wants(self, context: SharedContext, model: str) -> bool:
+        if context.uses < self.min_uses or model in self.unsupported:
+            return False
+        if context.tokens < self.minimum(model):
+            if not self.too_small:
+                logger.info(f"Context of {context.tokens} tokens is below the {self.minimum(model)}-token "
+                            f"cache minimum for {model}; sending it inline")
+            self.too_small += 1
+            return False
+        return True
+
+    def stats(self) -> Dict:
+        return {'created': self.created, 'deleted': self.deleted, 'hits': self.hits,
+                'inline': self.inline, 'too_small': self.too_small}
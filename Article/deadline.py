@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run deadlines for serverless time budgets
+A deadline from the event, the Lambda context or config follows the run through every stage
+"""
+
+import time
+import asyncio
+import logging
+import contextvars
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Typical stage durations in seconds until real ones have been observed
+DEFAULT_STAGE_SECONDS = {
+    'title': 10.0,
+    'outline': 20.0,
+    'content': 60.0,
+    'image_search': 3.0,
+    'download': 5.0,
+    'image_process': 1.0,
+    'upload': 5.0,
+    'save': 5.0
+}
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar('run_deadline', default=None)
+
+
+class Deadline:
+    """Absolute end of a run's time budget on the monotonic clock"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.at = time.monotonic() + seconds
+
+    @classmethod
+    def from_invocation(cls, event: Optional[Dict] = None, context=None,
+                        config: Optional[Dict] = None) -> Optional['Deadline']:
+        """Event `deadline_seconds`, then Lambda's remaining time, then `run_timeout_seconds`, less a margin"""
+        event = event or {}
+        config = config or {}
+        if event.get('deadline_seconds'):
+            seconds = float(event['deadline_seconds'])
+        elif hasattr(context, 'get_remaining_time_in_millis'):
+            seconds = context.get_remaining_time_in_millis() / 1000
+        elif config.get('run_timeout_seconds'):
+            seconds = float(config['run_timeout_seconds'])
+        else:
+            return None
+        # Leave room to checkpoint, save state and return before the platform kills the process
+        margin = float(config.get('deadline_margin_seconds', 5))
+        return cls(max(0.0, seconds - margin))
+
+    @staticmethod
+    def current() -> Optional['Deadline']:
+        return _current_deadline.get()
+
+    def activate(self):
+        """Make this the deadline of the current task and the tasks it starts"""
+        _current_deadline.set(self)
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+    def scope(self) -> asyncio.Timeout:
+        """`async with deadline.scope():` cancels the block when the deadline passes"""
+        loop = asyncio.get_running_loop()
+        return asyncio.timeout_at(loop.time() + self.remaining())
+
+
+class StageEstimates:
+    """Smoothed stage durations from finished spans, used to decide what still fits"""
+
+    def __init__(self, defaults: Optional[Dict[str, float]] = None):
+        self.seconds = dict(DEFAULT_STAGE_SECONDS, **(defaults or {}))
+        self._observed = set()
+
+    def observe_span(self, span: Dict):
+        """Span listener; only successful stages say how long a stage takes"""
+        if not span.get('ok', True):
+            return
+        stage = span['stage']
+        seconds = span['wall_ms'] / 1000
+        if stage not in self._observed:
+            # The first real measurement replaces the default
+            self._observed.add(stage)
+            self.seconds[stage] = seconds
+        else:
+            self.seconds[stage] = self.seconds[stage] * 0.7 + seconds * 0.3
+
+    def needed(self, *stages: str) -> float:
+        return sum(self.seconds.get(stage, 0.0) for stage in stages)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Deficit-round-robin scheduling of LLM calls across concurrent articles
+Interleaves requests per article and serves short flash calls ahead of long pro calls
+"""
+
+import asyncio
+import logging
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple, Union, Callable
+
+logger = logging.getLogger(__name__)
+
+# Relative cost of one call by model family; flash calls are short (titles)
+DEFAULT_COSTS = {'flash': 1.0, 'pro': 4.0}
+
+_current_flow: contextvars.ContextVar = contextvars.ContextVar('llm_flow', default=('', 1.0))
+
+
+class _Waiter:
+    __slots__ = ('future', 'cost', 'urgent')
+
+    def __init__(self, future: asyncio.Future, cost: float, urgent: bool):
+        self.future = future
+        self.cost = cost
+        self.urgent = urgent
+
+
+class FairScheduler:
+    """
+    Grants at most `capacity` concurrent LLM calls, choosing the next one fairly
+
+    Every article is a flow. Flows whose next request is a flash call are
+    served first, round robin; otherwise deficit round robin charges each
+    call its model cost against a per-round quantum scaled by the flow's
+    weight, so an article with many long section calls cannot starve others.
+    """
+
+    def __init__(self, capacity: Union[int, Callable[[], int]], quantum: float = 4.0,
+                 costs: Optional[Dict[str, float]] = None):
+        self._capacity = capacity
+        self.quantum = quantum
+        self.costs = {**DEFAULT_COSTS, **(costs or {})}
+        self.in_use = 0
+        self._flows: Dict[str, deque] = {}
+        self._weights: Dict[str, float] = {}
+        self._deficit: Dict[str, float] = {}
+        self._ring: deque = deque()
+
+    @staticmethod
+    def set_flow(name: str, weight: float = 1.0):
+        """Attribute LLM calls made from the current task to `name`"""
+        _current_flow.set((name, max(weight, 0.1)))
+
+    def cost(self, model: str) -> Tuple[float, bool]:
+        """Cost of a call to `model` and whether it is a short, urgent one"""
+        for family, cost in self.costs.items():
+            if family in model:
+                return cost, family == 'flash'
+        return self.costs.get('pro', 4.0), False
+
+    @property
+    def capacity(self) -> int:
+        """Slot count; a callable capacity follows the backends' adaptive limits"""
+        return max(1, self._capacity() if callable(self._capacity) else self._capacity)
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._flows.values())
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        """Hold one of the `capacity` call slots for the duration of a call"""
+        await self.acquire(model)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, model: str):
+        flow, weight = _current_flow.get()
+        cost, urgent = self.cost(model)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), cost, urgent)
+        queue = self._flows.get(flow)
+        if queue is None:
+            queue = self._flows[flow] = deque()
+            self._deficit[flow] = 0.0
+            self._ring.append(flow)
+        self._weights[flow] = weight
+        if urgent:
+            # Ahead of this flow's pending long calls
+            position = next((i for i, w in enumerate(queue) if not w.urgent), len(queue))
+            queue.insert(position, waiter)
+        else:
+            queue.append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just before cancellation: hand the slot on
+                self.release()
+            else:
+                self._discard(flow, waiter)
+            raise
+
+    def release(self):
+        self.in_use -= 1
+        self._dispatch()
+
+    def _discard(self, flow: str, waiter: _Waiter):
+        queue = self._flows.get(flow)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                self._drop(flow)
+
+    def _drop(self, flow: str):
+        del self._flows[flow]
+        del self._deficit[flow]
+        self._ring.remove(flow)
+
+    def _dispatch(self):
+        while self.in_use < self.capacity and self._ring:
+            flow = self._select()
+            queue = self._flows[flow]
+            waiter = queue.popleft()
+            if not queue:
+                self._drop(flow)
+            if waiter.future.done():
+                continue
+            self.in_use += 1
+            waiter.future.set_result(None)
+
+    def _select(self) -> str:
+        # Urgent heads first, round robin among them
+        for _ in range(len(self._ring)):
+            flow = self._ring[0]
+            self._ring.rotate(-1)
+            if self._flows[flow][0].urgent:
+                return flow
+
+        # Deficit round robin over the rest; the flow at the front keeps its turn
+        # while its deficit covers the next call
+        while True:
+            flow = self._ring[0]
+            head = self._flows[flow][0]
+            if self._deficit[flow] >= head.cost:
+                self._deficit[flow] -= head.cost
+                return flow
+            self._deficit[flow] += self.quantum * self._weights.get(flow, 1.0)
+            self._ring.rotate(-1)
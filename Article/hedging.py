@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hedged LLM requests for short, latency-critical calls (titles, outlines)
+A duplicate goes out once a call outlives the observed p90, within a budget of extra requests
+"""
+
+import math
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HedgePolicy:
+    """
+    Decides when to send a duplicate call and whether the budget allows it
+
+    Latencies are tracked per call class (e.g. 'title', 'outline'). Hedging
+    starts after `min_samples` calls of a class; each eligible call earns
+    `budget` hedges, so at most about budget x calls duplicates are sent.
+    """
+
+    def __init__(self, budget: float = 0.1, percentile: float = 90, min_samples: int = 20,
+                 window: int = 200, burst: float = 2.0):
+        self.budget = budget
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.burst = burst
+        self.tokens = 0.0
+        self.hedged = 0
+        self.wins = 0
+        self._latencies: Dict[str, deque] = {}
+
+    @classmethod
+    def from_config(cls, settings) -> Optional['HedgePolicy']:
+        """BLOG_CONFIG "hedging": true for defaults or a dict of settings; off when absent"""
+        if not settings:
+            return None
+        return cls(**settings) if isinstance(settings, dict) else cls()
+
+    def delay(self, label: str) -> Optional[float]:
+        """Seconds to wait before hedging a `label` call, or None while there is too little history"""
+        samples = self._latencies.get(label)
+        self.tokens = min(self.burst, self.tokens + self.budget)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)]
+
+    def take(self) -> bool:
+        """Spend one hedge from the budget"""
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.hedged += 1
+        return True
+
+    def observe(self, label: str, seconds: float):
+        self._latencies.setdefault(label, deque(maxlen=self.window)).append(seconds)
+
+    def stats(self) -> Dict:
+        return {'hedged': self.hedged, 'hedge_wins': self.wins, 'budget_left': round(self.tokens, 2)}
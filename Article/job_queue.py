@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Durable SQLite job queue for article generation
+Triggers enqueue jobs; `python job_queue.py work` drains them with N workers
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import argparse
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = Path(__file__).parent / 'jobs.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, available_at);
+"""
+
+
+class JobQueue:
+    """
+    Leased job queue backed by SQLite
+
+    Jobs move queued -> leased -> done, or to `dead` once `max_attempts`
+    leases have failed or expired. A leased job whose visibility timeout
+    passes without an ack becomes claimable again.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, visibility_timeout: float = 900,
+                 max_attempts: int = 3, retry_delay: float = 60):
+        self.db_path = Path(db_path or os.environ.get('JOB_QUEUE_DB') or DEFAULT_DB_PATH)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, source: str, payload: Optional[Dict] = None, delay: float = 0) -> int:
+        """Add a job and return its id"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO jobs (source, payload, available_at, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (source, json.dumps(payload or {}), now + delay, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Lease the oldest ready job, dead-lettering ones out of attempts"""
+        with self._connect() as conn:
+            while True:
+                now = time.time()
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'leased' AND lease_expires <= ?) ORDER BY id LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                if row['attempts'] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'dead', lease_owner = NULL, updated_at = ?, "
+                        "last_error = COALESCE(last_error, 'lease expired') WHERE id = ?",
+                        (now, row['id'])
+                    )
+                    conn.execute('COMMIT')
+                    logger.warning(f"Job {row['id']} dead-lettered after {row['attempts']} attempts")
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_expires = ?, updated_at = ? WHERE id = ?",
+                    (worker_id, now + self.visibility_timeout, now, row['id'])
+                )
+                conn.execute('COMMIT')
+                job = dict(row)
+                job['payload'] = json.loads(job['payload'])
+                job['attempts'] += 1
+                return job
+
+    def _update_leased(self, job_id: int, worker_id: str, sql: str, params: tuple) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {sql}, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                params + (time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def extend(self, job_id: int, worker_id: str) -> bool:
+        """Renew a lease; False means the lease was lost to another worker"""
+        return self._update_leased(
+            job_id, worker_id, 'lease_expires = ?', (time.time() + self.visibility_timeout,)
+        )
+
+    def ack(self, job_id: int, worker_id: str, result: Optional[Dict] = None) -> bool:
+        """Mark a leased job as done"""
+        return self._update_leased(
+            job_id, worker_id, "status = 'done', lease_owner = NULL, result = ?",
+            (json.dumps(result or {}),)
+        )
+
+    def fail(self, job_id: int, worker_id: str, error: str, attempts: int) -> bool:
+        """Retry a failed job with backoff, or dead-letter it when out of attempts"""
+        if attempts >= self.max_attempts:
+            return self._update_leased(
+                job_id, worker_id, "status = 'dead', lease_owner = NULL, last_error = ?", (error,)
+            )
+        return self._update_leased(
+            job_id, worker_id,
+            "status = 'queued', lease_owner = NULL, last_error = ?, available_at = ?",
+            (error, time.time() + self.retry_delay * attempts)
+        )
+
+    def release(self, job_id: int, worker_id: str, delay: float = 0) -> bool:
+        """Return a job unprocessed without spending an attempt"""
+        return self._update_leased(
+            job_id, worker_id,
+            "status = 'queued', lease_owner = NULL, attempts = attempts - 1, available_at = ?",
+            (time.time() + delay,)
+        )
+
+    def requeue_dead(self) -> int:
+        """Move all dead-lettered jobs back to the queue"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, updated_at = ? "
+                "WHERE status = 'dead'",
+                (time.time(), time.time())
+            )
+            return cursor.rowcount
+
+    def dead_letters(self) -> List[Dict]:
+        """List dead-lettered jobs"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = 'dead' ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts by status"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+def seconds_until_tomorrow() -> float:
+    """Delay used to park jobs once today's article limit is reached"""
+    now = time.time()
+    return 86400 - now % 86400 + 60
+
+
+async def run_worker(queue: JobQueue, generator, worker_id: str, drain: bool = False,
+                     poll_interval: float = 5, deadline=None, results: Optional[List[Dict]] = None) -> int:
+    """
+    Claim and process jobs until the queue is empty (drain) or forever
+
+    A job whose lease is lost is aborted, so it is not published twice, and
+    left to its new owner. With a `deadline` no new job is claimed once it
+    has passed or a job ran out of time. Each job's outcome is appended to
+    `results` when given.
+    """
+    processed = 0
+    while True:
+        if deadline is not None and deadline.expired:
+            return processed
+        job = await asyncio.to_thread(queue.claim, worker_id)
+        if job is None:
+            if drain:
+                return processed
+            await asyncio.sleep(poll_interval)
+            continue
+
+        logger.info(f"[{worker_id}] Processing job {job['id']} from {job['source']} (attempt {job['attempts']})")
+        task = asyncio.ensure_future(generator.run(keyword=job['payload'].get('keyword'), deadline=deadline))
+        heartbeat = asyncio.create_task(_keep_lease(queue, job['id'], worker_id, task))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if not (heartbeat.done() and heartbeat.result()):
+                raise
+            result = {'success': False, 'message': "Lease lost; job aborted"}
+        except Exception as e:
+            result = {'success': False, 'message': f"Execution error: {e}"}
+        finally:
+            heartbeat.cancel()
+
+        if result['message'] == "Lease lost; job aborted":
+            owned = False
+        elif result['success']:
+            owned = await asyncio.to_thread(queue.ack, job['id'], worker_id, result.get('article'))
+        elif result['message'] == "Daily limits reached":
+            owned = await asyncio.to_thread(queue.release, job['id'], worker_id, seconds_until_tomorrow())
+        elif result['message'].startswith("Deadline reached"):
+            # Out of time is not the job's fault, so it keeps its attempts
+            owned = await asyncio.to_thread(queue.release, job['id'], worker_id)
+        else:
+            owned = await asyncio.to_thread(queue.fail, job['id'], worker_id, result['message'], job['attempts'])
+        if not owned:
+            logger.warning(f"[{worker_id}] Job {job['id']} is no longer leased by this worker; "
+                           f"its outcome was not recorded")
+        if results is not None:
+            results.append({'job_id': job['id'], 'source': job['source'], 'recorded': owned,
+                            **{key: result.get(key) for key in ('success', 'message', 'article')}})
+        processed += 1
+        if result['message'].startswith("Deadline reached"):
+            return processed
+
+
+async def _keep_lease(queue: JobQueue, job_id: int, worker_id: str, task: asyncio.Future) -> bool:
+    """Renew the lease until cancelled; on losing it, abort `task` and return True"""
+    while True:
+        await asyncio.sleep(queue.visibility_timeout / 3)
+        if not await asyncio.to_thread(queue.extend, job_id, worker_id):
+            logger.warning(f"[{worker_id}] Lost lease on job {job_id}, aborting it")
+            task.cancel()
+            return True
+
+
+async def enqueue_and_drain(generator, source: str, payload: Optional[Dict] = None, count: int = 1,
+                            workers: int = 1, deadline=None, queue: Optional[JobQueue] = None) -> Dict:
+    """
+    What a triggered run does with a job queue: enqueue this trigger's `count`
+    jobs, then drain the queue, including jobs left by earlier runs, before the deadline
+    """
+    queue = queue or JobQueue()
+    job_ids = [await asyncio.to_thread(queue.enqueue, source, payload) for _ in range(count)]
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    results: List[Dict] = []
+    await asyncio.gather(*[
+        run_worker(queue, generator, f"{prefix}-{i}-{uuid.uuid4().hex[:6]}", drain=True,
+                   deadline=deadline, results=results)
+        for i in range(workers)
+    ])
+    succeeded = sum(1 for result in results if result['success'])
+    return {
+        'success': succeeded > 0,
+        'message': f"Processed {len(results)} jobs, {succeeded} succeeded",
+        'job_ids': job_ids,
+        'jobs': results,
+        'queue': await asyncio.to_thread(queue.stats)
+    }
+
+
+async def work(queue: JobQueue, workers: int, drain: bool) -> Dict:
+    """Run N workers sharing one generator and its throttlers"""
+    from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+    generator = CloudflareOptimizedArticleGenerator()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    try:
+        counts = await asyncio.gather(*[
+            run_worker(queue, generator, f"{prefix}-{i}-{uuid.uuid4().hex[:6]}", drain)
+            for i in range(workers)
+        ])
+    finally:
+        await generator.close()
+    return {'processed': sum(counts), 'queue': queue.stats()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Article generation job queue')
+    parser.add_argument('--db', help='SQLite database path (default: JOB_QUEUE_DB or jobs.db)')
+    parser.add_argument('--visibility-timeout', type=float, default=900)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_cmd = sub.add_parser('enqueue', help='Add a generation job')
+    enqueue_cmd.add_argument('--source', default='manual')
+    enqueue_cmd.add_argument('--keyword')
+    enqueue_cmd.add_argument('--count', type=int, default=1)
+
+    work_cmd = sub.add_parser('work', help='Process jobs')
+    work_cmd.add_argument('--workers', type=int, default=2)
+    work_cmd.add_argument('--drain', action='store_true', help='Exit once the queue is empty')
+
+    sub.add_parser('stats', help='Show job counts')
+    sub.add_parser('dead', help='List dead-lettered jobs')
+    sub.add_parser('retry-dead', help='Requeue dead-lettered jobs')
+
+    args = parser.parse_args(argv)
+    queue = JobQueue(args.db, args.visibility_timeout, args.max_attempts)
+
+    if args.command == 'enqueue':
+        payload = {'keyword': args.keyword} if args.keyword else {}
+        ids = [queue.enqueue(args.source, payload) for _ in range(args.count)]
+        print(json.dumps({'enqueued': ids}))
+    elif args.command == 'work':
+        print(json.dumps(asyncio.run(work(queue, args.workers, args.drain)), indent=2))
+    elif args.command == 'stats':
+        print(json.dumps(queue.stats(), indent=2))
+    elif args.command == 'dead':
+        print(json.dumps(queue.dead_letters(), indent=2))
+    elif args.command == 'retry-dead':
+        print(json.dumps({'requeued': queue.requeue_dead()}))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Priority scheduler for article keywords
+Heap-based queue with aging, persisted between runs as JSON
+"""
+
+import json
+import heapq
+import logging
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY = 1.0
+
+
+def parse_keyword_line(line: str) -> Tuple[str, float]:
+    """Split a `keyword<TAB>priority` line; priority is optional"""
+    keyword, _, priority = line.partition('\t')
+    keyword = keyword.strip()
+    try:
+        return keyword, float(priority.strip()) if priority.strip() else DEFAULT_PRIORITY
+    except ValueError:
+        logger.warning(f"Invalid priority for keyword '{keyword}', using default")
+        return keyword, DEFAULT_PRIORITY
+
+
+class KeywordScheduler:
+    """
+    Serves keywords highest priority first while aging waiting ones
+
+    A keyword's effective priority is `priority + aging_rate * rounds_waited`.
+    Every queued keyword ages at the same rate, so the heap can be ordered by
+    the static key `aging_rate * enqueued_round - priority` and never needs
+    re-heapifying as rounds advance.
+
+    A rejected keyword (one whose article keeps failing the quality gate) is
+    requeued `backoff_rounds * 2 ** (rejections - 1)` rounds in the future,
+    capped at `max_backoff_rounds`, so it stops taking the next run's slot.
+    """
+
+    def __init__(self, state_path: Optional[Path] = None, aging_rate: float = 0.25,
+                 backoff_rounds: int = 4, max_backoff_rounds: int = 64):
+        self.state_path = Path(state_path) if state_path else None
+        self.aging_rate = aging_rate
+        self.backoff_rounds = backoff_rounds
+        self.max_backoff_rounds = max_backoff_rounds
+        self.round = 0
+        self.priorities: Dict[str, float] = {}
+        self.enqueued: Dict[str, int] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.rejections: Dict[str, int] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self.load()
+
+    def _key(self, keyword: str) -> float:
+        return self.aging_rate * self.enqueued[keyword] - self.priorities[keyword]
+
+    def _push(self, keyword: str, enqueued_round: int):
+        self.enqueued[keyword] = enqueued_round
+        self._seq += 1
+        heapq.heappush(self._heap, (self._key(keyword), self._seq, keyword))
+
+    def _rebuild(self):
+        self._heap = []
+        for keyword, enqueued_round in list(self.enqueued.items()):
+            self._push(keyword, enqueued_round)
+
+    def load(self):
+        """Restore queue state from the state file if present"""
+        if not self.state_path or not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.round = state.get('round', 0)
+            self.rejections = state.get('rejections', {})
+            for keyword, priority, enqueued_round in state.get('queue', []):
+                self.priorities[keyword] = priority
+                self.enqueued[keyword] = enqueued_round
+            self._rebuild()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load keyword queue state: {e}")
+
+    def save(self):
+        """Persist queue state; in-flight keywords keep their old position"""
+        if not self.state_path:
+            return
+        queue = dict(self.enqueued)
+        queue.update(self.in_flight)
+        state = {
+            'round': self.round,
+            'queue': [[k, self.priorities[k], r] for k, r in sorted(queue.items(), key=lambda i: i[1])],
+            'rejections': self.rejections
+        }
+        try:
+            tmp_path = self.state_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+            tmp_path.replace(self.state_path)
+        except OSError as e:
+            logger.error(f"Could not save keyword queue state: {e}")
+
+    def sync(self, weighted_keywords: Dict[str, float]):
+        """Align the queue with the current keyword list and priorities"""
+        changed = False
+        for keyword in list(self.priorities):
+            if keyword not in weighted_keywords and keyword not in self.in_flight:
+                del self.priorities[keyword]
+                del self.enqueued[keyword]
+                self.rejections.pop(keyword, None)
+                changed = True
+        for keyword, priority in weighted_keywords.items():
+            if keyword not in self.priorities:
+                self.priorities[keyword] = priority
+                self.enqueued[keyword] = self.round
+                changed = True
+            elif self.priorities[keyword] != priority:
+                self.priorities[keyword] = priority
+                changed = True
+        if changed:
+            self._rebuild()
+
+    def _pop_valid(self) -> Optional[str]:
+        while self._heap:
+            key, _, keyword = heapq.heappop(self._heap)
+            if keyword in self.enqueued and key == self._key(keyword):
+                return keyword
+        return None
+
+    def pop(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        """Take the highest effective-priority keyword, skipping excluded ones"""
+        exclude = set(exclude)
+        skipped = []
+        keyword = None
+        while True:
+            candidate = self._pop_valid()
+            if candidate is None or candidate not in exclude:
+                keyword = candidate
+                break
+            skipped.append(candidate)
+        for candidate in skipped:
+            self._push(candidate, self.enqueued[candidate])
+        if keyword is None:
+            return None
+        self.in_flight[keyword] = self.enqueued.pop(keyword)
+        return keyword
+
+    def next_batch(self, count: int, exclude: Iterable[str] = ()) -> List[str]:
+        """Take up to `count` keywords in priority order"""
+        batch = []
+        for _ in range(count):
+            keyword = self.pop(exclude)
+            if keyword is None:
+                break
+            batch.append(keyword)
+        return batch
+
+    def peek(self, count: int, exclude: Iterable[str] = ()) -> List[str]:
+        """Up to `count` queued keywords in priority order, without taking them"""
+        exclude = set(exclude)
+        candidates = ((self._key(keyword), keyword) for keyword in self.enqueued if keyword not in exclude)
+        return [keyword for _, keyword in heapq.nsmallest(count, candidates)]
+
+    def complete(self, keyword: str, success: bool = True, rejected: bool = False):
+        """Requeue a served keyword; failures keep their original position, rejections back off"""
+        if keyword not in self.in_flight:
+            return
+        enqueued_round = self.in_flight.pop(keyword)
+        if keyword not in self.priorities:
+            self.save()
+            return
+        if success:
+            self.round += 1
+            enqueued_round = self.round
+            self.rejections.pop(keyword, None)
+        elif rejected:
+            self.rejections[keyword] = self.rejections.get(keyword, 0) + 1
+            backoff = min(self.max_backoff_rounds, self.backoff_rounds * 2 ** (self.rejections[keyword] - 1))
+            enqueued_round = self.round + backoff
+            logger.info(f"Keyword '{keyword}' rejected {self.rejections[keyword]} time(s), "
+                        f"backing off {backoff} rounds")
+        self._push(keyword, enqueued_round)
+        self.save()
+
+    def release(self, keyword: str):
+        """Return an unused keyword from a batch without advancing the clock"""
+        self.complete(keyword, success=False)
+
+    def __len__(self) -> int:
+        return len(self.enqueued)
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pluggable LLM backends for title, outline and content generation
+Gemini (google.generativeai) plus any OpenAI-compatible HTTP server
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Callable, Awaitable, Tuple
+
+from asyncio_throttle.throttler import Throttler
+from adaptive_limiter import AdaptiveLimiter, error_status
+from circuit_breaker import CircuitBreaker, is_failure_status
+from context_cache import ContextCache, SharedContext
+
+logger = logging.getLogger(__name__)
+
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"}
+]
+
+
+class LLMBackendError(Exception):
+    """A backend call failed; `status` is the HTTP status when known"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    backend: str
+    model: str
+    key: Optional[str] = None
+    finish_reason: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    wait_seconds: float = 0.0
+    latency_seconds: float = 0.0
+
+
+class LLMBackend:
+    """Base backend: own rate limiter and adaptive concurrency cap"""
+
+    kind = ''
+    counts_daily_quota = False
+    # Backends that can reference a SharedContext instead of receiving it inline
+    caches_context = False
+
+    def __init__(self, name: str, concurrency: int = 4, rate_limit: int = 60, period: float = 60,
+                 throttler: Optional[Throttler] = None, max_concurrency: Optional[int] = None,
+                 limiter: Optional[AdaptiveLimiter] = None):
+        self.name = name
+        self.concurrency = concurrency
+        self.throttler = throttler or Throttler(rate_limit=rate_limit, period=period)
+        # Starts at `concurrency`, grows towards `max_concurrency` while calls succeed
+        self.limiter = limiter or AdaptiveLimiter(
+            name, initial=concurrency, maximum=max_concurrency or concurrency * 4
+        )
+        self.in_flight = 0
+        # Subclasses that talk HTTP set their own request timeout
+        self.timeout = 300
+        self._session = None
+
+    def _session_for_loop(self):
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session._loop is not loop:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / max(1, self.limiter.limit)
+
+    async def generate(self, prompt: str, model: str, max_output_tokens: int = 4000,
+                       temperature: float = 0.7, context: Optional[SharedContext] = None,
+                       on_dispatch: Optional[Callable[['LLMBackend'], None]] = None) -> LLMResponse:
+        """
+        Wait for capacity, then call the backend; `context` goes ahead of the prompt
+
+        `on_dispatch` is called with the backend once the request leaves the
+        limiter and throttler, i.e. when it is actually sent.
+        """
+        extra = {}
+        if context is not None and self.caches_context:
+            extra['context'] = context
+        elif context is not None:
+            prompt = context.inline(prompt)
+        wait_started = time.perf_counter()
+        async with self.limiter.slot(model) as call:
+            async with self.throttler:
+                wait_seconds = time.perf_counter() - wait_started
+                call.restart()
+                if on_dispatch is not None:
+                    on_dispatch(self)
+                self.in_flight += 1
+                call_started = time.perf_counter()
+                try:
+                    response = await self._generate(prompt, model, max_output_tokens, temperature, **extra)
+                finally:
+                    self.in_flight -= 1
+        response.wait_seconds = wait_seconds
+        response.latency_seconds = time.perf_counter() - call_started
+        return response
+
+    async def _generate(self, prompt: str, model: str, max_output_tokens: int,
+                        temperature: float) -> LLMResponse:
+        raise NotImplementedError
+
+    async def release_context(self, context: SharedContext):
+        """Free whatever this backend holds for `context` once its article is done"""
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class GeminiBackend(LLMBackend):
+    """
+    google.generativeai with key rotation; blocking SDK calls run in threads
+
+    Cached contents go through the public REST API (cachedContents and
+    generateContent with `cachedContent`), which takes the key per request,
+    so they need neither the process-global SDK configuration nor its lock.
+    """
+
+    kind = 'gemini'
+    counts_daily_quota = True
+
+    def __init__(self, key_provider: Callable[[], Awaitable[str]], endpoint: Optional[str] = None,
+                 timeout: float = 300, key_breaker: Optional[Callable[[str], CircuitBreaker]] = None,
+                 context_cache: Optional[ContextCache] = None, **kwargs):
+        super().__init__(kwargs.pop('name', 'gemini'), **kwargs)
+        self.key_provider = key_provider
+        # Per-key circuit breakers; the key provider skips keys whose circuit is open
+        self.key_breaker = key_breaker
+        self.endpoint = endpoint
+        self.timeout = timeout
+        # Shared article contexts become cached contents when this is set
+        self.context_cache = context_cache
+        self.caches_context = context_cache is not None
+        self._cache_tasks = set()
+        self._models: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _configure(self, api_key: str):
+        """Point the process-global genai clients at `api_key`; call with the lock held"""
+        import google.generativeai as genai
+
+        if self.endpoint:
+            genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': self.endpoint})
+        else:
+            genai.configure(api_key=api_key)
+
+    def _model_for(self, api_key: str, model_name: str):
+        """One model per (key, model) bound to its own client, reused across calls"""
+        import google.generativeai as genai
+        from google.generativeai import client as genai_client
+
+        cache_key = (api_key, model_name)
+        model = self._models.get(cache_key)
+        if model is None:
+            # genai.configure is process-global, so bind the client while holding the lock
+            with self._lock:
+                self._configure(api_key)
+                model = genai.GenerativeModel(model_name)
+                model._client = genai_client.get_default_generative_client()
+            self._models[cache_key] = model
+        return model
+
+    def _rest_url(self, path: str) -> str:
+        base = (self.endpoint or 'generativelanguage.googleapis.com').rstrip('/')
+        if '://' not in base:
+            base = f"https://{base}"
+        return f"{base}/v1beta/{path}"
+
+    async def _rest(self, method: str, path: str, api_key: str, body: Optional[Dict] = None) -> Dict:
+        """One Gemini REST call; non-2xx statuses raise LLMBackendError"""
+        session = self._session_for_loop()
+        async with session.request(method, self._rest_url(path), json=body,
+                                   headers={'x-goog-api-key': api_key}) as response:
+            if response.status >= 300:
+                raise LLMBackendError(f"Gemini {method} {path} returned {response.status}: "
+                                      f"{(await response.text())[:200]}", status=response.status)
+            return await response.json(content_type=None) or {}
+
+    def _cached_context(self, context: SharedContext, model_name: str) -> Optional[Tuple[str, str]]:
+        """Key and cached content name for a live cached copy of `context`, if its key is still usable"""
+        entry = context.cached.get((self.name, model_name))
+        if entry is None or entry[2] <= time.monotonic():
+            return None
+        if self.key_breaker and not self.key_breaker(entry[0]).allow():
+            return None
+        return entry[0], entry[1]
+
+    async def _generate_cached(self, prompt: str, model: str, api_key: str, cached_name: str,
+                               max_output_tokens: int, temperature: float) -> Dict:
+        """generateContent against cached content; returns the REST response"""
+        return await self._rest('POST', f"models/{model}:generateContent", api_key, {
+            'cachedContent': cached_name,
+            'contents': [{'role': 'user', 'parts': [{'text': prompt}]}],
+            'safetySettings': SAFETY_SETTINGS,
+            'generationConfig': {'temperature': temperature, 'topP': 0.8, 'maxOutputTokens': max_output_tokens}
+        })
+
+    async def _generate(self, prompt: str, model: str, max_output_tokens: int,
+                        temperature: float, context: Optional[SharedContext] = None) -> LLMResponse:
+        import google.generativeai as genai
+
+        cached = self._context_model(context, model) if context is not None else None
+        if cached is not None:
+            # Cached contents belong to the key that created them
+            api_key, cached_name = cached
+            self.context_cache.hits += 1
+        else:
+            api_key = await self.key_provider()
+            if context is not None:
+                prompt = context.inline(prompt)
+                self.context_cache.inline += 1
+        breaker = self.key_breaker(api_key) if self.key_breaker else None
+        try:
+            if cached is not None:
+                data = await self._generate_cached(prompt, model, api_key, cached_name,
+                                                   max_output_tokens, temperature)
+            else:
+                response = await asyncio.to_thread(
+                    self._model_for(api_key, model).generate_content,
+                    prompt,
+                    safety_settings=SAFETY_SETTINGS,
+                    generation_config=genai.GenerationConfig(
+                        temperature=temperature,
+                        top_p=0.8,
+                        max_output_tokens=max_output_tokens,
+                    ),
+                    # Fail fast and let the caller fail over instead of the SDK's long retry loop
+                    request_options={'retry': None, 'timeout': self.timeout}
+                )
+        except Exception as e:
+            if breaker is not None:
+                # Bad requests say nothing about the key's health
+                status = error_status(e)
+                if status is None or is_failure_status(status):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+
+        if cached is not None:
+            candidate = (data.get('candidates') or [{}])[0]
+            usage = data.get('usageMetadata') or {}
+            return LLMResponse(
+                text=''.join(part.get('text', '') for part in candidate.get('content', {}).get('parts', [])).strip(),
+                backend=self.name,
+                model=model,
+                key=api_key,
+                finish_reason=candidate.get('finishReason'),
+                prompt_tokens=usage.get('promptTokenCount'),
+                output_tokens=usage.get('candidatesTokenCount'),
+                total_tokens=usage.get('totalTokenCount'),
+                cached_tokens=usage.get('cachedContentTokenCount')
+            )
+        candidate = response.candidates[0] if response.candidates else None
+        finish_reason = getattr(getattr(candidate, 'finish_reason', None), 'name', None)
+        text = ''.join(part.text for part in candidate.content.parts) if candidate else ''
+        usage = getattr(response, 'usage_metadata', None)
+        return LLMResponse(
+            text=text.strip(),
+            backend=self.name,
+            model=model,
+            key=api_key,
+            finish_reason=finish_reason,
+            prompt_tokens=getattr(usage, 'prompt_token_count', None),
+            output_tokens=getattr(usage, 'candidates_token_count', None),
+            total_tokens=getattr(usage, 'total_token_count', None),
+            cached_tokens=getattr(usage, 'cached_content_token_count', None)
+        )
+
+    def _context_model(self, context: SharedContext, model: str) -> Optional[Tuple[str, str]]:
+        """Cached copy of `context` for `model`; starts creating one once the context is worth caching"""
+        context.uses += 1
+        cached = self._cached_context(context, model)
+        if cached is None and (self.name, model) not in context.attempted and self.context_cache.wants(context, model):
+            # The upload runs alongside this call, which still sends the context inline
+            context.attempted.add((self.name, model))
+            task = asyncio.ensure_future(self._create_context_cache(model, context))
+            self._cache_tasks.add(task)
+            task.add_done_callback(self._cache_tasks.discard)
+        return cached
+
+    async def _create_context_cache(self, model: str, context: SharedContext):
+        ttl = self.context_cache.ttl_seconds
+        try:
+            api_key = await self.key_provider()
+            data = await self._rest('POST', 'cachedContents', api_key, {
+                'model': f"models/{model}",
+                'displayName': f"article-{context.digest}",
+                'contents': [{'role': 'user', 'parts': [{'text': context.text}]}],
+                'ttl': f"{int(ttl)}s"
+            })
+        except Exception as e:
+            if error_status(e) == 400:
+                self.context_cache.unsupported.add(model)
+            logger.warning(f"Context caching failed for {model}, sending the context inline: {e}")
+            return
+        self.context_cache.created += 1
+        if context.released:
+            # The article finished while the upload was running
+            await self._delete_cached(api_key, data['name'])
+            return
+        # Stop using it a little before the server expires it
+        context.cached[(self.name, model)] = (api_key, data['name'], time.monotonic() + ttl * 0.9)
+        logger.info(f"Cached {context.tokens} context tokens for {model}")
+
+    async def _delete_cached(self, api_key: str, name: str):
+        try:
+            await self._rest('DELETE', name, api_key)
+            self.context_cache.deleted += 1
+        except Exception as e:
+            logger.warning(f"Could not delete cached content {name}, it expires with its TTL: {e}")
+
+    async def release_context(self, context: SharedContext):
+        """Delete this backend's cached copies of `context` instead of paying for them until the TTL"""
+        context.released = True
+        for key in [key for key in context.cached if key[0] == self.name]:
+            api_key, name, _ = context.cached.pop(key)
+            await self._delete_cached(api_key, name)
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Chat completions against an OpenAI-compatible server (vLLM, llama.cpp, Ollama, ...)"""
+
+    kind = 'openai'
+
+    def __init__(self, base_url: str, api_key: str = '', model: Optional[str] = None,
+                 models: Optional[Dict[str, str]] = None, timeout: float = 300, **kwargs):
+        super().__init__(kwargs.pop('name', 'openai'), **kwargs)
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.default_model = model
+        self.models = models or {}
+        self.timeout = timeout
+
+    async def _generate(self, prompt: str, model: str, max_output_tokens: int,
+                        temperature: float) -> LLMResponse:
+        target_model = self.models.get(model) or self.default_model or model
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        payload = {
+            'model': target_model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'max_tokens': max_output_tokens,
+            'temperature': temperature,
+            'top_p': 0.8
+        }
+        session = self._session_for_loop()
+        async with session.post(f"{self.base_url}/chat/completions", headers=headers, json=payload) as response:
+            if response.status != 200:
+                raise LLMBackendError(f"{self.name} returned {response.status}: {(await response.text())[:200]}",
+                                      status=response.status)
+            data = await response.json()
+
+        choice = (data.get('choices') or [{}])[0]
+        usage = data.get('usage') or {}
+        finish_reason = choice.get('finish_reason')
+        return LLMResponse(
+            text=(choice.get('message', {}).get('content') or '').strip(),
+            backend=self.name,
+            model=target_model,
+            key=self.api_key or None,
+            finish_reason='MAX_TOKENS' if finish_reason == 'length' else (finish_reason or '').upper() or None,
+            prompt_tokens=usage.get('prompt_tokens'),
+            output_tokens=usage.get('completion_tokens'),
+            total_tokens=usage.get('total_tokens')
+        )
+
+
+BACKEND_TYPES = {
+    GeminiBackend.kind: GeminiBackend,
+    OpenAICompatibleBackend.kind: OpenAICompatibleBackend,
+}
+
+
+def build_backends(specs: List[Dict], key_provider: Callable[[], Awaitable[str]],
+                   gemini_endpoint: Optional[str] = None,
+                   gemini_throttler: Optional[Throttler] = None,
+                   key_breaker: Optional[Callable[[str], CircuitBreaker]] = None,
+                   context_cache: Optional[ContextCache] = None) -> List[LLMBackend]:
+    """Create backends from `LLM_BACKENDS`-style dicts, in preference order"""
+    backends = []
+    for spec in specs:
+        spec = dict(spec)
+        kind = spec.pop('type', 'gemini')
+        if kind not in BACKEND_TYPES:
+            logger.warning(f"Unknown LLM backend type: {kind}")
+            continue
+        if kind == GeminiBackend.kind:
+            spec.setdefault('endpoint', gemini_endpoint)
+            spec.setdefault('key_breaker', key_breaker)
+            spec.setdefault('context_cache', context_cache)
+            if gemini_throttler is not None and 'rate_limit' not in spec:
+                spec['throttler'] = gemini_throttler
+            backends.append(GeminiBackend(key_provider, **spec))
+        else:
+            if spec.get('api_key_env'):
+                spec['api_key'] = os.environ.get(spec.pop('api_key_env'), '')
+            backends.append(BACKEND_TYPES[kind](**spec))
+    return backends
+
+
+def backend_specs_from_environment() -> List[Dict]:
+    """Read LLM_BACKENDS (JSON list); defaults to a single Gemini backend"""
+    raw = os.environ.get('LLM_BACKENDS', '')
+    if raw:
+        try:
+            specs = json.loads(raw)
+            if isinstance(specs, list) and specs:
+                return specs
+        except json.JSONDecodeError:
+            logger.warning("Invalid LLM_BACKENDS format")
+    return [{'type': 'gemini'}]
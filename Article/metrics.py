@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dependency-free Prometheus metrics for the article generator
+Served on a local /metrics endpoint or written for the node_exporter textfile collector
+"""
+
+import os
+import time
+import bisect
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value) -> List[str]:
+        return [f'{self.name}{_format_labels(self.label_names, key)} {value}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_sample(self, key, value) -> List[str]:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            labels = _format_labels(self.label_names, key, 'le="' + le + '"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.label_names, key)
+        lines.append(f'{self.name}_sum{labels} {total}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class GeneratorMetrics:
+    """Metric set shared by every generator in the process"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.llm_latency = Histogram(
+            'article_llm_request_seconds', 'LLM call latency by model and key', ('model', 'key'))
+        self.llm_tokens = Counter(
+            'article_llm_tokens_total', 'LLM tokens by model and direction', ('model', 'direction'))
+        self.throttle_wait = Histogram(
+            'article_throttle_wait_seconds', 'Time spent waiting for a rate limiter', ('throttler',))
+        self.http_responses = Counter(
+            'article_http_responses_total', 'HTTP responses by host and status', ('host', 'status'))
+        self.stage_latency = Histogram(
+            'article_stage_seconds', 'Pipeline stage wall time', ('stage', 'ok'))
+        self.articles = Counter(
+            'article_articles_total', 'Articles generated and saved')
+        self.articles_per_minute = Gauge(
+            'article_articles_per_minute', 'Articles per minute since process start')
+        self.bytes_uploaded = Counter(
+            'article_bytes_uploaded_total', 'Bytes sent to GitHub', ('kind',))
+        self.adaptive_limit = Gauge(
+            'article_adaptive_limit', 'Current AIMD concurrency limit per upstream', ('limiter',))
+
+    def observe_span(self, span: Dict):
+        """Span listener feeding the stage histogram"""
+        self.stage_latency.observe(span['wall_ms'] / 1000, stage=span['stage'], ok=str(span.get('ok', True)).lower())
+
+    def article_saved(self):
+        self.articles.inc()
+        minutes = max((time.monotonic() - self.started) / 60, 1e-9)
+        self.articles_per_minute.set(round(self.articles.value() / minutes, 4))
+
+    def render(self) -> str:
+        lines = []
+        for metric in vars(self).values():
+            if isinstance(metric, _Metric):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Atomically write metrics for the node_exporter textfile collector"""
+        target = Path(path)
+        tmp_path = target.with_suffix(target.suffix + '.tmp')
+        try:
+            tmp_path.write_text(self.render(), encoding='utf-8')
+            tmp_path.replace(target)
+        except OSError as e:
+            logger.warning(f"Could not write metrics textfile: {e}")
+
+
+METRICS = GeneratorMetrics()
+_server = None
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1'):
+    """Serve /metrics from a daemon thread; safe to call more than once"""
+    global _server
+    if _server is not None:
+        return _server
+    # Imported here so processes without METRICS_PORT never load http.server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = METRICS.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Could not start metrics server on {host}:{port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Metrics available at http://{host}:{_server.server_address[1]}/metrics")
+    return _server
+
+
+def configure_from_environment():
+    """Start the endpoint when METRICS_PORT is set"""
+    port = os.environ.get('METRICS_PORT')
+    if port:
+        start_metrics_server(int(port), os.environ.get('METRICS_HOST', '127.0.0.1'))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-stage LLM model routing from CONFIG.txt and BLOG_CONFIG
+Optionally drafts with a fast model and leaves refinement to the stage model
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = Path(__file__).parent / 'CONFIG.txt'
+
+# Used when neither CONFIG.txt nor BLOG_CONFIG names a model for a stage
+DEFAULT_MODELS = {
+    'title': 'gemini-1.5-flash',
+    'outline': 'gemini-1.5-pro',
+    'article': 'gemini-1.5-pro',
+    'conclusion': 'gemini-1.5-flash'
+}
+
+DEFAULT_CASCADE = {
+    'draft': 'gemini-1.5-flash',
+    'min_section_words': 120,
+    'max_refined': 3
+}
+
+
+def read_config_file(path: Path) -> Dict[str, str]:
+    """KEY=VALUE lines of CONFIG.txt; comments and blank lines are skipped"""
+    settings = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#') or '=' not in line:
+                    continue
+                key, _, value = line.partition('=')
+                settings[key.strip()] = value.strip()
+    except OSError as e:
+        logger.debug(f"No config file at {path}: {e}")
+    return settings
+
+
+class ModelRouter:
+    """
+    Model per pipeline stage: title, outline, article and conclusion
+
+    CONFIG.txt `MODEL_<STAGE>` lines set the defaults and BLOG_CONFIG
+    "models" overrides them. With a cascade, outlines and articles are
+    drafted with the `draft` model and only parts that fail the local
+    quality checks go to the stage model.
+    """
+
+    def __init__(self, models: Optional[Dict[str, str]] = None, cascade: Optional[Dict] = None):
+        self.models = dict(DEFAULT_MODELS, **(models or {}))
+        self.cascade = dict(DEFAULT_CASCADE, **cascade) if cascade is not None else None
+
+    @classmethod
+    def from_config(cls, config: Dict, path: Path = CONFIG_FILE) -> 'ModelRouter':
+        """CONFIG.txt models, BLOG_CONFIG "models" and "model_cascade" (true or a dict)"""
+        file_settings = read_config_file(path)
+        models = {stage: file_settings[f"MODEL_{stage.upper()}"]
+                  for stage in DEFAULT_MODELS if file_settings.get(f"MODEL_{stage.upper()}")}
+        models.update(config.get('models') or {})
+        cascade = config.get('model_cascade')
+        return cls(models, (cascade if isinstance(cascade, dict) else {}) if cascade else None)
+
+    def model(self, stage: str) -> str:
+        return self.models.get(stage, DEFAULT_MODELS['article'])
+
+    def draft_model(self, stage: str) -> str:
+        """Model for the first attempt at a stage: the cascade's draft model when it is on"""
+        return self.cascade['draft'] if self.cascade else self.model(stage)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Titles (and optionally outlines) for many keywords from one packed LLM call
+Results are cached per keyword, persisted as JSON, and consumed by later article runs
+"""
+
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def parse_packed(response: str, keywords: Iterable[str]) -> Dict[str, Dict]:
+    """Per-keyword entries from a packed JSON reply; unknown keywords and empty titles are dropped"""
+    text = response.strip()
+    if text.startswith('```'):
+        # Models often fence long JSON replies despite being asked not to
+        text = text.split('\n', 1)[-1].rsplit('```', 1)[0]
+    try:
+        items = json.loads(text).get('articles', [])
+    except (ValueError, AttributeError):
+        logger.warning("Could not parse packed prompt reply")
+        return {}
+    wanted = {keyword.lower(): keyword for keyword in keywords}
+    entries = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        keyword = wanted.get(str(item.get('keyword', '')).strip().lower())
+        title = str(item.get('title') or '').strip()
+        if keyword and title:
+            entry = {'title': title}
+            if isinstance(item.get('outline'), dict):
+                entry['outline'] = item['outline']
+            entries[keyword] = entry
+    return entries
+
+
+class PackedCache:
+    """
+    Per-keyword results of packed calls, kept until a run consumes them
+
+    Entries older than `max_age_days` are ignored so stale titles do not
+    linger for keywords that stopped coming up.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_age_days: float = 7.0):
+        self.path = Path(path) if path else None
+        self.max_age = max_age_days * 86400
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.load()
+
+    def load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load packed prompt cache: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2)
+            tmp_path.replace(self.path)
+        except OSError as e:
+            logger.error(f"Could not save packed prompt cache: {e}")
+
+    def _fresh(self, entry: Dict) -> bool:
+        return time.time() - entry.get('created', 0) < self.max_age
+
+    def missing(self, keywords: Iterable[str], outlines: bool = False) -> List[str]:
+        """Keywords without a fresh entry (with an outline when `outlines`)"""
+        result = []
+        for keyword in keywords:
+            entry = self.entries.get(keyword)
+            if not entry or not self._fresh(entry) or (outlines and 'outline' not in entry):
+                result.append(keyword)
+        return result
+
+    def put(self, entries: Dict[str, Dict]):
+        now = time.time()
+        for keyword, entry in entries.items():
+            self.entries[keyword] = dict(entry, created=now)
+        if entries:
+            self.save()
+
+    def take(self, keyword: str) -> Optional[Dict]:
+        """Remove and return the fresh entry for `keyword`"""
+        entry = self.entries.pop(keyword, None)
+        if entry is None:
+            return None
+        self.save()
+        if not self._fresh(entry):
+            return None
+        self.hits += 1
+        return entry
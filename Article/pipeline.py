@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stage-decoupled article pipeline with bounded queues
+LLM generation, image acquisition, image processing and publishing run as separate worker pools
+"""
+
+import time
+import asyncio
+import logging
+import contextlib
+from typing import List, Dict, Optional, Callable, Awaitable
+
+from slugify import slugify
+from telemetry import StageRecorder
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Workers per stage and queue capacity between stages (BLOG_CONFIG "pipeline")
+DEFAULT_PIPELINE = {
+    'llm': 4,
+    'images': 2,
+    'processing': 1,
+    'publish': 2,
+    'queue_size': 4
+}
+
+
+class ArticlePipeline:
+    """
+    Runs a batch through four worker pools joined by bounded asyncio queues
+
+    A full queue blocks the stage feeding it, so a slow stage (typically
+    GitHub) throttles the ones upstream instead of piling up finished drafts
+    in memory; at most `queue_size` items wait between any two stages.
+    """
+
+    STAGES = ('llm', 'images', 'processing', 'publish')
+
+    def __init__(self, generator, settings: Optional[Dict] = None):
+        self.generator = generator
+        self.settings = {**DEFAULT_PIPELINE, **(settings or {})}
+        self.queue_peaks: Dict[str, int] = {}
+        self.results: List[Dict] = []
+        self._in_flight = 0
+
+    def _workers(self, stage: str) -> int:
+        return max(1, int(self.settings[stage]))
+
+    def _admit(self) -> bool:
+        """Daily limits, counting articles already in the pipeline"""
+        generator = self.generator
+        if not generator.check_daily_limits():
+            return False
+        max_daily = int(generator.config.get('max_daily_articles', 2))
+        if generator.count_articles_today() + self._in_flight >= max_daily:
+            return False
+        # Only admit articles that can still be written and saved before the run deadline
+        return generator.fits('title', 'outline', 'content', 'save')
+
+    async def _put(self, name: str, queue: asyncio.Queue, item):
+        await queue.put(item)
+        self.queue_peaks[name] = max(self.queue_peaks.get(name, 0), queue.qsize())
+
+    def _finish(self, item: Dict, success: bool, message: str, article: Optional[Dict] = None):
+        self._in_flight -= 1
+        rejected = item['keyword'] in self.generator.quality_rejected
+        self.generator.quality_rejected.discard(item['keyword'])
+        self.generator.keyword_scheduler.complete(item['keyword'], success=success, rejected=rejected)
+        spans = item['spans']
+        self.results.append({
+            'success': success,
+            'message': message,
+            'keyword': item['keyword'],
+            'article': article,
+            'seconds': round(time.perf_counter() - item['started'], 3),
+            'stats': {'stages': spans, 'stage_summary': StageRecorder.summarize(spans), 'rejected': rejected}
+        })
+
+    async def _stage(self, name: str, handler: Callable[[Dict], Awaitable[bool]],
+                     inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], next_name: Optional[str]):
+        """Run one stage's worker pool until its inbox is closed, then close the outbox"""
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is None:
+                    return
+                self.generator.telemetry.begin_run(item['spans'])
+                try:
+                    passed = await handler(item)
+                except Exception as e:
+                    logger.error(f"Pipeline {name} failed for {item['keyword']}: {e}")
+                    self._finish(item, False, f"Execution error: {e}")
+                    continue
+                if passed and outbox is not None:
+                    await self._put(next_name, outbox, item)
+
+        await asyncio.gather(*[worker() for _ in range(self._workers(name))])
+        if outbox is not None:
+            for _ in range(self._workers(next_name)):
+                await outbox.put(None)
+
+    async def _generate(self, item: Dict) -> bool:
+        generator = self.generator
+        # A checkpoint left by an earlier run goes straight to publishing
+        article = generator.load_checkpoint(item['keyword'])
+        if article is not None:
+            item['article'] = article
+            return True
+        deadline = Deadline.current()
+        generator.set_llm_flow(item['keyword'])
+        try:
+            async with deadline.scope() if deadline else contextlib.nullcontext():
+                text = await generator.generate_article_text(item['keyword'])
+        except TimeoutError:
+            self._finish(item, False, "Deadline reached before the article was generated")
+            return False
+        if not text:
+            rejected = item['keyword'] in generator.quality_rejected
+            self._finish(item, False, "Article failed the quality gate" if rejected else "Failed to generate article")
+            return False
+        item.update(text)
+        return True
+
+    async def _acquire_image(self, item: Dict) -> bool:
+        generator = self.generator
+        if 'article' in item or not generator.fits('image_search', 'download', 'image_process', 'upload', 'save'):
+            return True
+        query = generator.featured_image_query(item['keyword'], item['outline'])
+        if query:
+            image_urls = await generator.search_images_optimized(query, 1)
+            if image_urls:
+                item['image_data'] = await generator.download_image(image_urls[0])
+        return True
+
+    async def _process_image(self, item: Dict) -> bool:
+        image_data = item.pop('image_data', None)
+        if image_data:
+            # Resizing and recompressing run in a thread, off the event loop
+            item['encoded_image'] = await self.generator.process_image(image_data)
+        return True
+
+    async def _publish(self, item: Dict) -> bool:
+        generator = self.generator
+        article = item.get('article')
+        if article is None:
+            featured_image = ""
+            encoded_image = item.pop('encoded_image', None)
+            if encoded_image and generator.fits('upload', 'save'):
+                filename = f"{slugify(item['keyword'])}-featured.jpg"
+                featured_image = await generator.upload_image_content(encoded_image, filename) or ""
+            article = generator.build_article(
+                item['keyword'], item['title'], item['outline'], item['content'], featured_image
+            )
+        saved = await generator.publish_before_deadline(article)
+        if saved is None:
+            self._finish(item, False, "Deadline reached; article checkpointed for the next run")
+            return False
+        if not saved:
+            self._finish(item, False, "Failed to save article to GitHub")
+            return False
+        record = generator.record_article(article)
+        generator.metrics.article_saved()
+        self._finish(item, True, f"Successfully created: {article['title']}", record.to_dict())
+        return True
+
+    async def run(self, keywords: List[str]) -> List[Dict]:
+        """Push keywords through every stage; returns one result per admitted keyword"""
+        size = max(1, int(self.settings['queue_size']))
+        queues = {stage: asyncio.Queue(maxsize=size) for stage in self.STAGES}
+        handlers = {
+            'llm': self._generate,
+            'images': self._acquire_image,
+            'processing': self._process_image,
+            'publish': self._publish
+        }
+        stages = []
+        for index, stage in enumerate(self.STAGES):
+            next_stage = self.STAGES[index + 1] if index + 1 < len(self.STAGES) else None
+            stages.append(asyncio.create_task(self._stage(
+                stage, handlers[stage], queues[stage],
+                queues[next_stage] if next_stage else None, next_stage
+            )))
+
+        # The feeder blocks on the first queue, so admission follows LLM capacity
+        for index, keyword in enumerate(keywords):
+            if not self._admit():
+                logger.info("Daily limits reached, stopping pipeline intake")
+                for unused in keywords[index:]:
+                    self.generator.keyword_scheduler.release(unused)
+                break
+            self._in_flight += 1
+            await self._put('llm', queues['llm'], {
+                'keyword': keyword, 'spans': [], 'started': time.perf_counter()
+            })
+        for _ in range(self._workers('llm')):
+            await queues['llm'].put(None)
+
+        await asyncio.gather(*stages)
+        return self.results
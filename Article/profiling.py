@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Opt-in cProfile and tracemalloc profiling per run and per pipeline stage
+Enabled with PROFILE_DIR (or main --profile / lambda event "profile"); nothing is hooked when off
+"""
+
+import os
+import time
+import pstats
+import cProfile
+import logging
+import tracemalloc
+import contextvars
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_OWN_FILES = {tracemalloc.__file__, cProfile.__file__, pstats.__file__, __file__}
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar('profiled_run', default=None)
+
+
+class RunProfile:
+    """Profiles and allocation snapshots collected for one run"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.started = time.strftime('%Y%m%d-%H%M%S')
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.stages: List[Tuple[str, cProfile.Profile, List[tracemalloc.StatisticDiff]]] = []
+
+
+class Profiler:
+    """
+    Writes `<run>.pstats`, `<run>.<stage>.pstats` and `<run>.alloc.txt` per run
+
+    cProfile can only trace one profile at a time, so the innermost active
+    stage collects samples and the enclosing run resumes when it ends. With
+    several runs in flight the stage that started last gets the samples; use
+    a single run at a time for clean per-stage attribution.
+    """
+
+    def __init__(self, output_dir: str, top: int = 25, frames: int = 10):
+        self.output_dir = Path(output_dir)
+        self.top = top
+        self.frames = frames
+        self._stack: List[cProfile.Profile] = []
+        self._runs = 0
+        self._started_tracing = False
+
+    @classmethod
+    def from_environment(cls) -> Optional['Profiler']:
+        """PROFILE_DIR enables profiling; PROFILE_TOP sets the report length"""
+        output_dir = os.environ.get('PROFILE_DIR')
+        if not output_dir:
+            return None
+        return cls(output_dir, int(os.environ.get('PROFILE_TOP', '25')))
+
+    def _pause(self):
+        if self._stack:
+            self._stack[-1].disable()
+
+    def _resume(self):
+        if self._stack:
+            self._stack[-1].enable()
+
+    def _push(self, profile: cProfile.Profile):
+        profile.enable()
+        self._stack.append(profile)
+
+    def _pop(self, profile: cProfile.Profile):
+        if self._stack and self._stack[-1] is profile:
+            profile.disable()
+            self._stack.pop()
+        elif profile in self._stack:
+            # Already paused by a later stage of a concurrent run
+            self._stack.remove(profile)
+
+    def _top(self, stats: List[tracemalloc.StatisticDiff]) -> List[tracemalloc.StatisticDiff]:
+        """Largest changes, leaving out the profiler's own bookkeeping"""
+        return [stat for stat in stats if stat.traceback[0].filename not in _OWN_FILES][:self.top]
+
+    def begin_run(self) -> RunProfile:
+        """Start profiling the run in the current context"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._runs += 1
+        run = RunProfile()
+        self._pause()
+        run.snapshot = tracemalloc.take_snapshot()
+        _current_run.set(run)
+        self._push(run.profile)
+        return run
+
+    def stage_started(self, span: Dict) -> Optional[Tuple]:
+        """Called by StageRecorder when a stage opens inside a profiled run"""
+        run = _current_run.get()
+        if run is None:
+            return None
+        profile = cProfile.Profile()
+        self._pause()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        self._push(profile)
+        return run, profile, snapshot, current
+
+    def stage_finished(self, span: Dict, state: Tuple):
+        run, profile, snapshot, started_bytes = state
+        self._pop(profile)
+        current, peak = tracemalloc.get_traced_memory()
+        span['mem_delta_kb'] = round((current - started_bytes) / 1024, 1)
+        span['mem_peak_kb'] = round((peak - started_bytes) / 1024, 1)
+        diff = tracemalloc.take_snapshot().compare_to(snapshot, 'lineno')
+        run.stages.append((span['stage'], profile, self._top(diff)))
+        self._resume()
+
+    def end_run(self, run: RunProfile, name: str) -> Dict[str, str]:
+        """Stop profiling the run and write its reports; returns the written paths"""
+        self._pop(run.profile)
+        _current_run.set(None)
+        self._runs -= 1
+        prefix = f"{run.started}-{os.getpid()}-{name}"
+        written: Dict[str, str] = {}
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            profiles = [run.profile] + [profile for _, profile, _ in run.stages]
+            if self._dump(profiles, self.output_dir / f"{prefix}.pstats"):
+                written['run'] = str(self.output_dir / f"{prefix}.pstats")
+            for stage in dict.fromkeys(stage for stage, _, _ in run.stages):
+                path = self.output_dir / f"{prefix}.{stage}.pstats"
+                if self._dump([profile for s, profile, _ in run.stages if s == stage], path):
+                    written[stage] = str(path)
+            path = self.output_dir / f"{prefix}.alloc.txt"
+            path.write_text(self._allocation_report(run), encoding='utf-8')
+            written['allocations'] = str(path)
+        except OSError as e:
+            logger.warning(f"Could not write profile reports: {e}")
+        finally:
+            if self._started_tracing and self._runs == 0:
+                tracemalloc.stop()
+                self._started_tracing = False
+            self._resume()
+        logger.info(f"Profile reports written to {self.output_dir}/{prefix}.*")
+        return written
+
+    @staticmethod
+    def _dump(profiles: List[cProfile.Profile], path: Path) -> bool:
+        stats = None
+        for profile in profiles:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                # A profile that never saw a call has no data
+                continue
+        if stats is None:
+            return False
+        stats.dump_stats(str(path))
+        return True
+
+    def _allocation_report(self, run: RunProfile) -> str:
+        lines = [f"Top {self.top} allocation changes for the run"]
+        diff = tracemalloc.take_snapshot().compare_to(run.snapshot, 'lineno') if tracemalloc.is_tracing() else []
+        lines.extend(f"  {stat}" for stat in self._top(diff))
+        for stage, _, stats in run.stages:
+            lines.append('')
+            lines.append(f"[{stage}]")
+            lines.extend(f"  {stat}" for stat in stats)
+        return '\n'.join(lines) + '\n'
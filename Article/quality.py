@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local quality checks for generated outlines, article sections and whole articles
+Cheap checks that decide which drafts need another LLM call and what may be published
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_PATTERN = re.compile(r'\[(insert|add|your)\b|lorem ipsum|\bTODO\b|as an ai\b', re.IGNORECASE)
+SENTENCE_END = ('.', '!', '?', ':', '"', "'", ')', '*', '|')
+FENCE_LINE = re.compile(r'^\s*```[\w-]*\s*$', re.MULTILINE)
+
+# Publishing gate defaults (BLOG_CONFIG "quality_gate")
+DEFAULT_GATE = {
+    'min_words': 800,
+    'min_h2': 3,
+    'min_section_words': 80,
+    'min_keyword_mentions': 2,
+    'max_keyword_density': 3.0,
+    'language': 'en',
+    'max_rounds': 1,
+    'block': False
+}
+# Failures only a rewrite of the whole article can fix
+ARTICLE_CHECKS = ('words', 'headings', 'language')
+
+
+def split_sections(content: str) -> List[Tuple[str, str]]:
+    """(heading, markdown) per H2 section; the text before the first H2 has heading ''"""
+    sections = []
+    heading, lines = '', []
+    for line in content.strip().split('\n'):
+        if line.startswith('## '):
+            if heading or any(part.strip() for part in lines):
+                sections.append((heading, '\n'.join(lines).strip()))
+            heading, lines = line[3:].strip(), []
+        lines.append(line)
+    sections.append((heading, '\n'.join(lines).strip()))
+    return sections
+
+
+def section_problems(section: str, min_words: int = 0) -> List[str]:
+    """What is wrong with one markdown section; empty when it looks finished"""
+    problems = []
+    body = [line for line in section.split('\n') if line.strip() and not line.startswith('#')]
+    words = sum(len(line.split()) for line in body)
+    if words < min_words:
+        problems.append(f"only {words} words")
+    last = body[-1].strip() if body else ''
+    if last and not last.startswith(('-', '*', '|', '>')) and not re.match(r'\d+\.', last) \
+            and not last.endswith(SENTENCE_END):
+        problems.append("ends mid-sentence")
+    if '```' in section:
+        problems.append("contains a code fence")
+    if PLACEHOLDER_PATTERN.search(section):
+        problems.append("contains placeholder text")
+    return problems
+
+
+def outline_problems(outline: Dict, min_sections: int = 3) -> List[str]:
+    """What is wrong with a parsed outline; empty when it can drive the article"""
+    sections = outline.get('structure', {}).get('sections', [])
+    problems = []
+    if len(sections) < min_sections:
+        problems.append(f"only {len(sections)} sections")
+    if any(not section.get('heading') for section in sections):
+        problems.append("sections without a heading")
+    if not outline.get('seo', {}).get('meta_description'):
+        problems.append("no meta description")
+    return problems
+
+
+def gate_settings(settings, force_english: bool = True) -> Optional[Dict]:
+    """Gate settings from BLOG_CONFIG "quality_gate" (false disables); FORCE_ENGLISH_OUTPUT sets the language"""
+    if settings is False:
+        return None
+    settings = settings if isinstance(settings, dict) else {}
+    gate = dict(DEFAULT_GATE, **settings)
+    if 'language' not in settings and not force_english:
+        gate['language'] = None
+    return gate
+
+
+def strip_fences(content: str) -> str:
+    """Drop code fence lines, e.g. a ```markdown wrapper around the whole article"""
+    return FENCE_LINE.sub('', content).strip()
+
+
+def keyword_mentions(text: str, keyword: str) -> int:
+    return len(re.findall(r'(?<!\w)' + re.escape(keyword) + r'(?!\w)', text, re.IGNORECASE))
+
+
+def keyword_density(text: str, keyword: str) -> float:
+    """Percentage of the words that belong to keyword mentions"""
+    return round(keyword_mentions(text, keyword) * len(keyword.split()) / max(1, len(text.split())) * 100, 2)
+
+
+def detect_language(text: str) -> Optional[str]:
+    """ISO code of the text's language, or None when it cannot be told"""
+    from langdetect import DetectorFactory, detect
+    from langdetect.lang_detect_exception import LangDetectException
+
+    DetectorFactory.seed = 0
+    try:
+        # A few thousand characters decide reliably and keep detection in milliseconds
+        return detect(text[:3000])
+    except LangDetectException:
+        return None
+
+
+def assess_article(content: str, keyword: str, gate: Dict) -> Dict:
+    """
+    Score an article against the gate: word count, H2 structure, keyword density,
+    language and section problems, measured on the rendered text
+
+    `sections` maps H2 section indexes (as in split_sections) to what a rewrite
+    of that section should fix.
+    """
+    import markdown
+    import lxml.html
+
+    root = lxml.html.fromstring(f"<div>{markdown.markdown(content)}</div>")
+    text = root.text_content()
+    words = len(text.split())
+    headings = [heading.text_content().strip() for heading in root.iter('h2')]
+    mentions = keyword_mentions(text, keyword)
+    density = keyword_density(text, keyword)
+    language = detect_language(text) if gate.get('language') else None
+
+    sections = split_sections(content)
+    failing = {}
+    for index, (heading, section) in enumerate(sections):
+        problems = section_problems(section, gate['min_section_words']) if heading else []
+        if problems:
+            failing[index] = problems
+    headed = [index for index, (heading, _) in enumerate(sections) if heading]
+    if headed and mentions < gate['min_keyword_mentions']:
+        failing.setdefault(headed[0], []).append(f'mention "{keyword}" naturally')
+    if headed and density > gate['max_keyword_density']:
+        # Every section whose body is over the limit on its own, or else the one with the most mentions
+        stuffed = [index for index in headed
+                   if keyword_density(sections[index][1].partition('\n')[2], keyword) > gate['max_keyword_density']]
+        for index in stuffed or [max(headed, key=lambda index: keyword_mentions(sections[index][1], keyword))]:
+            failing.setdefault(index, []).append(f'use "{keyword}" less often')
+
+    checks = {
+        'words': words >= gate['min_words'],
+        'headings': len(headings) >= gate['min_h2'] and all(headings),
+        'keyword': gate['min_keyword_mentions'] <= mentions and density <= gate['max_keyword_density'],
+        'language': language is None or language == gate['language'],
+        'fences': '```' not in content,
+        'sections': not failing
+    }
+    return {
+        'passed': all(checks.values()),
+        'score': round(sum(checks.values()) / len(checks), 2),
+        'failed': [name for name, ok in checks.items() if not ok],
+        'words': words,
+        'h2': len(headings),
+        'keyword_density': density,
+        'language': language,
+        'sections': failing
+    }
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Virtual-clock capacity simulator for CloudflareOptimizedArticleGenerator
+Runs the real key rotation, throttlers, daily limits and batch scheduling against modeled quotas
+
+Example:
+    python simulator.py --days 1 --keys 3 --key-rpm 15 --key-rpd 1500 \\
+        --trigger-every 60 --articles-per-run 2 --max-daily-articles 24 --gemini-rate 8/60
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import random
+import asyncio
+import datetime
+import argparse
+import logging
+import selectors
+from collections import deque
+from typing import List, Dict, Optional
+
+from benchmark import MockConfig, percentile, mock_photo, _mock_reply
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+
+
+class VirtualClock:
+    """Simulated seconds since the epoch; only moves when every task is waiting"""
+
+    def __init__(self, start: float):
+        self.now = start
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            self.now += seconds
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    """Polls real I/O without blocking and jumps the clock to the next timer instead of sleeping"""
+
+    def __init__(self, clock: VirtualClock, selector: selectors.BaseSelector):
+        self.clock = clock
+        self._selector = selector
+        # Executor jobs still running; their results arrive through the loop's self-pipe
+        self.threads = 0
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if not ready and self.threads and timeout != 0:
+            # Work handed to threads (image processing) takes no simulated time
+            ready = self._selector.select()
+        if not ready:
+            if timeout is None:
+                raise RuntimeError("Simulation deadlocked: no timers and no ready tasks")
+            self.clock.advance(timeout)
+        return ready
+
+    def close(self):
+        self._selector.close()
+
+    def get_map(self):
+        return self._selector.get_map()
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop whose time(), sleeps and call_later run on a VirtualClock"""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        super().__init__(_VirtualSelector(clock, selectors.DefaultSelector()))
+        # Epoch-sized floats cannot resolve the default 1ns, so due timers would never fire
+        self._clock_resolution = 1e-3
+
+    def time(self) -> float:
+        return self.clock.now
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self._selector.threads += 1
+
+        def finished(_):
+            self._selector.threads -= 1
+
+        future.add_done_callback(finished)
+        return future
+
+
+class _VirtualTime:
+    """Stand-in for the `time` module inside patched modules"""
+
+    def __init__(self, clock: VirtualClock):
+        self._clock = clock
+
+    def time(self) -> float:
+        return self._clock.now
+
+    monotonic = perf_counter = time
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+def _virtual_datetime(clock: VirtualClock):
+    """Stand-in for the `datetime` module whose today()/now() follow the clock"""
+
+    class VirtualDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return datetime.datetime.utcfromtimestamp(clock.now).date()
+
+    class VirtualDateTime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.datetime.utcfromtimestamp(clock.now)
+
+    return types.SimpleNamespace(date=VirtualDate, datetime=VirtualDateTime,
+                                 timedelta=datetime.timedelta, timezone=datetime.timezone)
+
+
+class QuotaModel:
+    """Per-key requests-per-minute and requests-per-day quotas of the LLM service"""
+
+    def __init__(self, clock: VirtualClock, rpm: int, rpd: int):
+        self.clock = clock
+        self.rpm = rpm
+        self.rpd = rpd
+        self._minute: Dict[str, deque] = {}
+        self._day: Dict[str, List] = {}
+        self.rejected = 0
+
+    def admit(self, key: str) -> bool:
+        now = self.clock.now
+        window = self._minute.setdefault(key, deque())
+        while window and window[0] <= now - 60:
+            window.popleft()
+        day, used = self._day.get(key, (int(now // DAY), 0))
+        if day != int(now // DAY):
+            day, used = int(now // DAY), 0
+        if (self.rpm and len(window) >= self.rpm) or (self.rpd and used >= self.rpd):
+            self.rejected += 1
+            return False
+        window.append(now)
+        self._day[key] = (day, used + 1)
+        return True
+
+
+def _modeled_delay(config: MockConfig, rng: random.Random) -> float:
+    delay = config.latency * (1 + rng.uniform(-config.jitter, config.jitter))
+    if rng.random() < config.tail:
+        delay *= 10
+    return max(0.0, delay)
+
+
+def _simulated_gemini(generator, quota: QuotaModel, config: MockConfig, rng: random.Random, throttler):
+    """A Gemini backend with the real limiter, throttler, key rotation and key breakers but modeled calls"""
+    from llm_backends import LLMBackend, LLMBackendError, LLMResponse
+
+    class SimulatedGeminiBackend(LLMBackend):
+        kind = 'gemini'
+        counts_daily_quota = True
+
+        async def _generate(self, prompt: str, model: str, max_output_tokens: int,
+                            temperature: float) -> LLMResponse:
+            api_key = await generator.rotate_api_key()
+            breaker = generator.key_breaker(api_key)
+            if not quota.admit(api_key):
+                await asyncio.sleep(0.05)
+                breaker.record_failure()
+                raise LLMBackendError("429 Resource has been exhausted", status=429)
+            await asyncio.sleep(_modeled_delay(config, rng))
+            if rng.random() < config.error_rate:
+                breaker.record_failure()
+                raise LLMBackendError("503 The model is overloaded", status=503)
+            breaker.record_success()
+            text = _mock_reply(prompt)
+            return LLMResponse(text=text, backend=self.name, model=model, key=api_key, finish_reason='STOP',
+                               prompt_tokens=len(prompt) // 4, output_tokens=len(text) // 4)
+
+    return SimulatedGeminiBackend('gemini', throttler=throttler)
+
+
+def _simulated_http(configs: Dict[str, MockConfig], rng: random.Random, counts: Dict[str, int]):
+    """Replacement for generator.http_request answering from modeled services"""
+    photo = mock_photo(configs.get('image', MockConfig()).image_kb)
+
+    async def http_request(service: str, method: str, url: str, **kwargs) -> Dict:
+        config = configs.get(service, MockConfig())
+        counts[service] = counts.get(service, 0) + 1
+        await asyncio.sleep(_modeled_delay(config, rng))
+        if rng.random() < config.error_rate:
+            return {'status': 503, 'body': b'unavailable'}
+        if service == 'unsplash':
+            body = json.dumps({'results': [{'urls': {'regular': 'http://images.sim/photo.jpg'}}]})
+            return {'status': 200, 'body': body.encode('utf-8')}
+        if service == 'image':
+            return {'status': 200, 'body': photo}
+        return {'status': 201, 'body': b'{}'}
+
+    return http_request
+
+
+def _parse_rate(spec: str):
+    count, _, period = spec.partition('/')
+    return int(count), float(period or 60)
+
+
+async def simulate(args) -> Dict:
+    """Run `args.days` of triggers on the virtual clock and report capacity"""
+    from asyncio_throttle.throttler import Throttler
+    from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+    loop = asyncio.get_running_loop()
+    clock = loop.clock
+    rng = random.Random(args.seed)
+    generator = CloudflareOptimizedArticleGenerator({
+        'max_daily_articles': args.max_daily_articles,
+        'articles_per_run': args.articles_per_run,
+        'max_retries': args.max_retries
+    })
+    generator.api_keys = [f"sim-key-{i:02d}" for i in range(args.keys)]
+    generator.max_daily_requests = args.max_daily_requests
+    generator.gemini_throttler = Throttler(*_parse_rate(args.gemini_rate))
+    quota = QuotaModel(clock, args.key_rpm, args.key_rpd)
+    generator.llm_backends = [_simulated_gemini(
+        generator, quota, MockConfig.parse(args.gemini), rng, generator.gemini_throttler
+    )]
+    http_counts: Dict[str, int] = {}
+    generator.http_request = _simulated_http({
+        'unsplash': MockConfig.parse(args.unsplash),
+        'image': MockConfig.parse(args.unsplash),
+        'github': MockConfig.parse(args.github)
+    }, rng, http_counts)
+
+    llm_waits: List[float] = []
+    generator.telemetry.listeners.append(
+        lambda span: llm_waits.append(span['throttle_wait']) if 'throttle_wait' in span else None
+    )
+
+    started = clock.now
+    end = started + args.days * DAY
+    triggers = []
+    runs: List[Dict] = []
+    days: Dict[str, Dict] = {}
+
+    async def trigger(at: float):
+        # The deployment's per-day request counter resets at midnight
+        day = datetime.datetime.utcfromtimestamp(at).date().isoformat()
+        stats = days.setdefault(day, {'articles': 0, 'llm_requests': 0, 'triggers': 0, 'limit_reached': None})
+        if stats['triggers'] == 0:
+            generator.daily_requests = 0
+        stats['triggers'] += 1
+        result = await generator.run_batch()
+        stats['articles'] += len(result['articles'])
+        stats['llm_requests'] = generator.daily_requests
+        if stats['limit_reached'] is None and not generator.check_daily_limits():
+            limit = 'requests' if generator.daily_requests >= generator.max_daily_requests else 'articles'
+            stats['limit_reached'] = f"{limit} at {datetime.datetime.utcfromtimestamp(clock.now):%H:%M}"
+        runs.append({'at': at, 'seconds': clock.now - at, 'articles': len(result['articles']),
+                     'message': result['message']})
+
+    at = started + args.first_trigger * 60
+    while at < end:
+        delay = at - clock.now
+        if delay > 0:
+            await asyncio.sleep(delay)
+        triggers.append(asyncio.create_task(trigger(at)))
+        at += args.trigger_every * 60
+    await asyncio.gather(*triggers)
+    limits = generator.adaptive_limits()
+    breakers = generator.breaker_states()
+    await generator.close()
+
+    run_seconds = [run['seconds'] for run in runs if run['articles']]
+    total = sum(stats['articles'] for stats in days.values())
+    outcomes = {'with_articles': sum(1 for run in runs if run['articles']),
+                'empty': sum(1 for run in runs if not run['articles'])}
+
+    return {
+        'days': args.days,
+        'keys': args.keys,
+        'gemini_rate': args.gemini_rate,
+        'key_quota': {'rpm': args.key_rpm, 'rpd': args.key_rpd},
+        'max_daily_articles': args.max_daily_articles,
+        'max_daily_requests': args.max_daily_requests,
+        'triggers': len(runs),
+        'articles': total,
+        'articles_per_day': round(total / args.days, 2),
+        'per_day': days,
+        'llm_requests_rejected': quota.rejected,
+        'http_requests': http_counts,
+        'queueing_delay_seconds': {
+            'llm_wait_p50': round(percentile(llm_waits, 50), 2),
+            'llm_wait_p95': round(percentile(llm_waits, 95), 2),
+            'llm_wait_max': round(max(llm_waits, default=0.0), 2),
+            'run_p50': round(percentile(run_seconds, 50), 2),
+            'run_p95': round(percentile(run_seconds, 95), 2)
+        },
+        'runs': outcomes,
+        'limits': limits,
+        'breakers': breakers,
+        'simulated_seconds': round(clock.now - started, 1)
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Simulate days of article generation on a virtual clock')
+    parser.add_argument('--days', type=float, default=1)
+    parser.add_argument('--keys', type=int, default=3, help='Gemini API keys to rotate')
+    parser.add_argument('--key-rpm', type=int, default=15, help='Per-key requests per minute (0 = unlimited)')
+    parser.add_argument('--key-rpd', type=int, default=1500, help='Per-key requests per day (0 = unlimited)')
+    parser.add_argument('--gemini-rate', default='8/60', help='Client Throttler as requests/seconds')
+    parser.add_argument('--max-daily-articles', type=int, default=2)
+    parser.add_argument('--max-daily-requests', type=int, default=50)
+    parser.add_argument('--max-retries', type=int, default=2)
+    parser.add_argument('--articles-per-run', type=int, default=1)
+    parser.add_argument('--trigger-every', type=float, default=1440, help='Minutes between triggers')
+    parser.add_argument('--first-trigger', type=float, default=360, help='Minutes after midnight')
+    parser.add_argument('--gemini', default='latency=8,jitter=0.5,tail=0.02',
+                        help='Modeled Gemini latency/errors, e.g. latency=8,error_rate=0.01')
+    parser.add_argument('--unsplash', default='latency=0.4')
+    parser.add_argument('--github', default='latency=0.6')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='Show generator logs')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    os.environ.update({'KEYWORD_QUEUE_FILE': '', 'ARTICLES_DATA': '{}', 'UNSPLASH_ACCESS_KEY': 'sim',
+                       'GITHUB_TOKEN': 'sim', 'GITHUB_REPO': 'simulator/blog'})
+    os.environ.pop('CASSETTE_MODE', None)
+    import UpdateArticle
+    import telemetry
+    import llm_backends
+    import adaptive_limiter
+    import circuit_breaker
+    from asyncio_throttle import throttler
+
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+
+    start_day = datetime.datetime.combine(datetime.date.today(), datetime.time(), datetime.timezone.utc)
+    clock = VirtualClock(start_day.timestamp())
+    virtual_time = _VirtualTime(clock)
+    patched = [(throttler, 'time'), (llm_backends, 'time'), (telemetry, 'time'),
+               (adaptive_limiter, 'time'), (circuit_breaker, 'time'), (UpdateArticle, 'time'), (UpdateArticle, 'datetime')]
+    originals = [(module, name, getattr(module, name)) for module, name in patched]
+    for module, name in patched:
+        setattr(module, name, _virtual_datetime(clock) if name == 'datetime' else virtual_time)
+
+    wall_started = time.perf_counter()
+    loop = VirtualTimeLoop(clock)
+    try:
+        report = loop.run_until_complete(simulate(args))
+    finally:
+        loop.close()
+        for module, name, original in originals:
+            setattr(module, name, original)
+    report['real_seconds'] = round(time.perf_counter() - wall_started, 2)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
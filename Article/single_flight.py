@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single-flight coalescing of identical in-flight calls
+Concurrent callers with the same key share one underlying call and its result
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One shared call and the callers still waiting for it"""
+
+    def __init__(self, call: asyncio.Future, on_orphaned: Optional[Callable[[Any], None]]):
+        self.call = call
+        self.on_orphaned = on_orphaned
+        self.waiters = 0
+        self.delivered = False
+
+
+class SingleFlight:
+    """
+    At most one call per key is in flight; later callers await the same result
+
+    The underlying call runs as its own task. A cancelled caller leaves it
+    running for the others, but when the last caller is cancelled the call is
+    cancelled too and its key forgotten. A call that still completes after
+    every caller has gone hands its result to `on_orphaned`, so usage it
+    spent can be accounted for. Nothing is cached: the key is forgotten once
+    the call ends.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Flight] = {}
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                 on_orphaned: Optional[Callable[[Any], None]] = None) -> Tuple[Any, bool]:
+        """Result of `factory()` for `key`, and whether it came from another caller's call"""
+        flight = self._calls.get(key)
+        shared = flight is not None and flight.call.get_loop() is asyncio.get_running_loop()
+        if shared:
+            self.shared += 1
+        else:
+            flight = _Flight(asyncio.ensure_future(factory()), on_orphaned)
+            self._calls[key] = flight
+            flight.call.add_done_callback(lambda done: self._finished(key, flight))
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.call)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.delivered:
+                self._abandon(key, flight)
+            raise
+        except BaseException:
+            flight.waiters -= 1
+            raise
+        flight.waiters -= 1
+        flight.delivered = True
+        return result, shared
+
+    def _abandon(self, key: Hashable, flight: _Flight):
+        """The last caller was cancelled: stop the call and forget its key"""
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+        if flight.call.done():
+            # Finished just before the cancellation landed; nobody received the result
+            self._orphaned(flight)
+        else:
+            flight.call.cancel()
+
+    def _finished(self, key: Hashable, flight: _Flight):
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+        call = flight.call
+        if not call.cancelled() and call.exception() is not None:
+            # Retrieved here so an orphaned failure is not reported as unhandled
+            logger.debug(f"Single-flight call failed: {call.exception()}")
+        elif flight.waiters == 0 and not flight.delivered:
+            # Completed despite being cancelled after its callers left
+            self._orphaned(flight)
+
+    @staticmethod
+    def _orphaned(flight: _Flight):
+        call = flight.call
+        if flight.on_orphaned is None or call.cancelled() or call.exception() is not None:
+            return
+        flight.delivered = True
+        try:
+            flight.on_orphaned(call.result())
+        except Exception as e:
+            logger.warning(f"Could not account for an orphaned call: {e}")
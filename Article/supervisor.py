@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-process supervisor for article generation
+Shards API keys and keywords across worker processes and merges their reports
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional
+
+from telemetry import StageRecorder
+
+logger = logging.getLogger(__name__)
+
+
+def partition(items: List, shards: int) -> List[List]:
+    """Round-robin split so every shard gets a fair share"""
+    return [items[i::shards] for i in range(shards)]
+
+
+def _run_shard(shard: int, api_keys: List[str], keywords: List[str],
+               max_daily_articles: int, max_daily_requests: int,
+               packed_entries: Optional[Dict[str, Dict]] = None) -> Dict:
+    """
+    Worker process entry point: generate articles for one shard
+
+    The keyword queue and packed prompt cache stay in memory here; the
+    parent persists both from the shard's report, so shards never race on
+    the state files.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - shard {shard} - %(levelname)s - %(message)s'
+    )
+    os.environ['KEYWORD_QUEUE_FILE'] = ''
+    os.environ['PACKED_CACHE_FILE'] = ''
+    from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+    started = time.monotonic()
+    generator = CloudflareOptimizedArticleGenerator()
+    generator.packed_cache.entries = dict(packed_entries or {})
+    generator.api_keys = api_keys
+    generator.config['max_daily_articles'] = max_daily_articles
+    generator.max_daily_requests = max_daily_requests
+
+    async def run_shard_batch() -> Dict:
+        try:
+            return await generator.run_batch(keywords=keywords)
+        finally:
+            await generator.close()
+
+    result = asyncio.run(run_shard_batch())
+    done = {article['keyword'] for article in result['articles']}
+    return {
+        'shard': shard,
+        'api_keys': len(api_keys),
+        'keywords': {keyword: keyword in done for keyword in keywords},
+        'articles': result['articles'],
+        'api_calls': generator.daily_requests,
+        'elapsed': round(time.monotonic() - started, 3),
+        'rejected': result['stats'].get('rejected', []),
+        'stages': result['stats'].get('stages', []),
+        'stage_summary': result['stats'].get('stage_summary', {}),
+        'packed': generator.packed_cache.entries,
+        'packed_hits': generator.packed_cache.hits,
+        'message': result['message']
+    }
+
+
+def merge_shards(generator, shard_results: List[Dict], seeded: List[Dict[str, Dict]]) -> Dict:
+    """Fold shard reports into one run-level report and persist the state shards kept in memory"""
+    report = {'articles': [], 'api_calls': 0, 'packed_hits': 0, 'shards': []}
+    spans = []
+    for shard in shard_results:
+        rejected = set(shard.get('rejected', []))
+        for keyword, success in shard['keywords'].items():
+            if success:
+                generator.used_keywords.add(keyword)
+            generator.keyword_scheduler.complete(keyword, success=success, rejected=keyword in rejected)
+        # Entries a shard consumed are gone from its copy; a crashed shard leaves them untouched
+        if shard.get('packed') is not None:
+            for keyword in seeded[shard['shard']]:
+                generator.packed_cache.entries.pop(keyword, None)
+            generator.packed_cache.entries.update(shard['packed'])
+        report['articles'].extend(shard['articles'])
+        report['api_calls'] += shard['api_calls'] - generator.daily_requests
+        report['packed_hits'] += shard.get('packed_hits', 0)
+        spans.extend(shard.get('stages', []))
+        report['shards'].append({k: v for k, v in shard.items() if k not in ('articles', 'stages', 'packed')})
+    generator.packed_cache.save()
+    report['stage_summary'] = StageRecorder.summarize(spans)
+    return report
+
+
+def run_supervisor(processes: int, count: Optional[int] = None) -> Dict:
+    """Run up to `count` articles across `processes` workers, one key shard each"""
+    from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+    generator = CloudflareOptimizedArticleGenerator()
+    result = {
+        'success': False,
+        'message': '',
+        'articles': [],
+        'stats': {
+            'api_calls': generator.daily_requests,
+            'articles_today': 0,
+            'processes': 0,
+            'shards': []
+        }
+    }
+
+    if not generator.api_keys:
+        result['message'] = "No API keys available"
+        return result
+
+    # Keep the combined run inside the daily budgets a single process would use
+    today_articles = generator.count_articles_today()
+    remaining_articles = int(generator.config.get('max_daily_articles', 2)) - today_articles
+    remaining_requests = generator.max_daily_requests - generator.daily_requests
+    count = min(count or int(generator.config.get('articles_per_run', 1)), remaining_articles)
+    if count <= 0 or remaining_requests <= 0:
+        result['message'] = "Daily limits reached"
+        return result
+
+    keywords = generator.get_next_keywords(count)
+    if not keywords:
+        result['message'] = "No keywords available"
+        return result
+
+    # Keys are never shared, so shards cannot contend on the same quota
+    shards = max(1, min(processes, len(generator.api_keys), len(keywords)))
+    key_shards = partition(generator.api_keys, shards)
+    keyword_shards = partition(keywords, shards)
+    requests_per_shard = remaining_requests // shards
+    # Each shard gets the cached packed results for its own keywords
+    seeded = [
+        {keyword: generator.packed_cache.entries[keyword]
+         for keyword in keyword_shards[i] if keyword in generator.packed_cache.entries}
+        for i in range(shards)
+    ]
+
+    logger.info(f"Supervisor starting {shards} processes for {len(keywords)} keywords")
+    context = multiprocessing.get_context('spawn')
+    shard_results = []
+    with ProcessPoolExecutor(max_workers=shards, mp_context=context) as pool:
+        futures = [
+            pool.submit(
+                _run_shard, i, key_shards[i], keyword_shards[i],
+                today_articles + len(keyword_shards[i]),
+                generator.daily_requests + requests_per_shard,
+                seeded[i]
+            )
+            for i in range(shards)
+        ]
+        for i, future in enumerate(futures):
+            try:
+                shard_results.append(future.result())
+            except Exception as e:
+                logger.error(f"Shard {i} crashed: {e}")
+                shard_results.append({
+                    'shard': i, 'api_keys': len(key_shards[i]),
+                    'keywords': {keyword: False for keyword in keyword_shards[i]},
+                    'articles': [], 'api_calls': generator.daily_requests,
+                    'elapsed': 0, 'message': f"Process error: {e}"
+                })
+
+    report = merge_shards(generator, shard_results, seeded)
+    result['articles'] = report['articles']
+    result['stats']['api_calls'] += report['api_calls']
+    result['stats']['shards'] = report['shards']
+    result['stats']['stage_summary'] = report['stage_summary']
+    if generator.packed_settings is not None:
+        result['stats']['packed_hits'] = report['packed_hits']
+    result['stats']['processes'] = shards
+    result['stats']['articles_today'] = today_articles + len(result['articles'])
+    result['success'] = bool(result['articles'])
+    result['message'] = f"Created {len(result['articles'])}/{len(keywords)} articles in {shards} processes"
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Run article generation across worker processes')
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--count', type=int, help='Articles to generate (default: articles_per_run)')
+    args = parser.parse_args(argv)
+
+    result = run_supervisor(args.processes, args.count)
+    print(json.dumps(result, indent=2))
+    return 0 if result['success'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-stage timing and token instrumentation for the article pipeline
+Spans are collected per run and optionally streamed as JSON lines
+"""
+
+import json
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional, Callable
+
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+_run_spans: contextvars.ContextVar = contextvars.ContextVar('run_spans', default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+def mask_key(api_key: Optional[str]) -> Optional[str]:
+    """Identify a key in telemetry without leaking it"""
+    return f"...{api_key[-4:]}" if api_key else None
+
+
+class StageRecorder:
+    """Records pipeline stage spans for the run active in the current task"""
+
+    def __init__(self, jsonl_path: Optional[str] = None):
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.listeners: List[Callable[[Dict], None]] = []
+        # Optional profiling.Profiler; None keeps stages free of profiling overhead
+        self.profiler = None
+
+    def begin_run(self, spans: Optional[List[Dict]] = None) -> List[Dict]:
+        """Start collecting spans for the run in the current context, or continue `spans`"""
+        spans = [] if spans is None else spans
+        _run_spans.set(spans)
+        return spans
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        """Time a stage; callees can annotate it through `annotate()`"""
+        span = {
+            'stage': name,
+            'started_at': time.time(),
+            'wall_ms': 0.0,
+            'bytes': 0,
+            'retries': 0,
+            'ok': True,
+            **fields
+        }
+        deadline = Deadline.current()
+        if deadline is not None:
+            span['deadline_left'] = round(deadline.remaining(), 2)
+        token = _current_span.set(span)
+        profiling = self.profiler.stage_started(span) if self.profiler is not None else None
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span['ok'] = False
+            span['error'] = type(e).__name__
+            raise
+        finally:
+            span['wall_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            if profiling is not None:
+                self.profiler.stage_finished(span, profiling)
+            _current_span.reset(token)
+            self._finish(span)
+
+    def annotate(self, **fields):
+        """Add fields to the innermost open span, if any"""
+        span = _current_span.get()
+        if span is not None:
+            span.update(fields)
+
+    def add(self, field: str, amount: float = 1):
+        """Increment a numeric field (bytes, retries) on the innermost open span"""
+        span = _current_span.get()
+        if span is not None:
+            span[field] = span.get(field, 0) + amount
+
+    def _finish(self, span: Dict):
+        spans = _run_spans.get()
+        if spans is not None:
+            spans.append(span)
+        for listener in self.listeners:
+            try:
+                listener(span)
+            except Exception as e:
+                logger.debug(f"Span listener failed: {e}")
+        if self.jsonl_path:
+            try:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(span, default=str) + '\n')
+            except OSError as e:
+                logger.warning(f"Could not write stage log: {e}")
+
+    @staticmethod
+    def summarize(spans: List[Dict]) -> Dict[str, Dict]:
+        """Aggregate spans by stage, slowest stage first"""
+        summary: Dict[str, Dict] = {}
+        for span in spans:
+            entry = summary.setdefault(span['stage'], {
+                'count': 0, 'wall_ms': 0.0, 'max_ms': 0.0, 'bytes': 0,
+                'retries': 0, 'failures': 0, 'prompt_tokens': 0, 'output_tokens': 0
+            })
+            entry['count'] += 1
+            entry['wall_ms'] = round(entry['wall_ms'] + span['wall_ms'], 2)
+            entry['max_ms'] = max(entry['max_ms'], span['wall_ms'])
+            entry['bytes'] += span.get('bytes', 0)
+            entry['retries'] += span.get('retries', 0)
+            entry['failures'] += 0 if span.get('ok', True) else 1
+            entry['prompt_tokens'] += span.get('prompt_tokens') or 0
+            entry['output_tokens'] += span.get('output_tokens') or 0
+        return dict(sorted(summary.items(), key=lambda item: -item[1]['wall_ms']))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the AIMD concurrency limiter
+"""
+
+import asyncio
+
+from adaptive_limiter import AdaptiveLimiter, error_status
+from llm_backends import LLMBackendError
+
+
+async def finish(limiter, status=None, error=None, label='', slower_by=0.0):
+    try:
+        async with limiter.slot(label) as call:
+            call.started -= slower_by
+            call.status = status
+            await asyncio.sleep(0)
+            if error:
+                raise error
+    except Exception:
+        pass
+
+
+def test_success_grows_the_limit_by_one_per_window():
+    limiter = AdaptiveLimiter('test', initial=2, maximum=3)
+
+    async def scenario():
+        for _ in range(2):
+            await finish(limiter, 200)
+
+    asyncio.run(scenario())
+    assert limiter.limit == 2
+    asyncio.run(scenario())
+    assert limiter.limit == 3
+    for _ in range(5):
+        asyncio.run(scenario())
+    assert limiter.limit == 3
+
+
+def test_overload_and_timeouts_cut_the_limit():
+    limiter = AdaptiveLimiter('test', initial=8, minimum=2)
+    asyncio.run(finish(limiter, 429))
+    assert limiter.limit == 4
+    asyncio.run(finish(limiter, error=TimeoutError()))
+    assert limiter.limit == 2
+    asyncio.run(finish(limiter, error=LLMBackendError('busy', status=503)))
+    assert limiter.limit == 2
+    assert limiter.stats() == {'limit': 2, 'in_flight': 0, 'decreases': 3}
+
+
+def test_plain_errors_leave_the_limit_alone():
+    limiter = AdaptiveLimiter('test', initial=4)
+    asyncio.run(finish(limiter, 500))
+    asyncio.run(finish(limiter, error=ValueError('bad reply')))
+    assert limiter.limit == 4 and limiter.decreases == 0
+
+
+def test_calls_in_flight_at_a_cut_do_not_cut_again():
+    limiter = AdaptiveLimiter('test', initial=8)
+
+    async def scenario():
+        await asyncio.gather(*[finish(limiter, 503) for _ in range(4)])
+
+    asyncio.run(scenario())
+    assert limiter.limit == 4 and limiter.decreases == 1
+
+
+def test_latency_spike_cuts_after_a_baseline():
+    limiter = AdaptiveLimiter('test', initial=8, latency_factor=3.0)
+
+    async def scenario():
+        for _ in range(6):
+            await finish(limiter, 200, label='title', slower_by=0.1)
+        await finish(limiter, 200, label='title', slower_by=1.0)
+
+    asyncio.run(scenario())
+    assert limiter.decreases == 1
+
+
+def test_limit_bounds_concurrency():
+    limiter = AdaptiveLimiter('test', initial=1, maximum=1)
+    peak = {'now': 0, 'max': 0}
+
+    async def call():
+        async with limiter.slot():
+            peak['now'] += 1
+            peak['max'] = max(peak['max'], peak['now'])
+            await asyncio.sleep(0.01)
+            peak['now'] -= 1
+
+    async def scenario():
+        await asyncio.gather(*[call() for _ in range(3)])
+
+    asyncio.run(scenario())
+    assert peak['max'] == 1 and limiter.in_flight == 0
+
+
+def test_error_status():
+    assert error_status(LLMBackendError('x', status=429)) == 429
+    assert error_status(ValueError('x')) is None
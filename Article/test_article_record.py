@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests for compact article history records
+"""
+
+from article_record import ArticleRecord
+
+
+def test_from_article_keeps_no_content():
+    record = ArticleRecord.from_article({
+        'slug': 'small-kitchen', 'keyword': 'small kitchen', 'title': 'Small Kitchen Ideas',
+        'content': '## Intro\n\nText', 'word_count': 2, 'frontmatter': {'featured_image': '/a.jpg'}
+    })
+    assert record.slug == 'small-kitchen'
+    assert record.image_path == '/a.jpg'
+    assert len(record.content_sha256) == 64
+    assert 'content' not in record.to_dict()
+
+
+def test_legacy_entry_without_slug_uses_title():
+    record = ArticleRecord.from_dict({'title': 'Small Kitchen Ideas', 'content': 'Text'})
+    assert record.slug == 'small-kitchen-ideas'
+
+
+def test_legacy_entry_without_slug_or_title_uses_keyword():
+    record = ArticleRecord.from_dict({'keyword': 'cozy living room', 'outline': {}})
+    assert record.slug == 'cozy-living-room'
+
+
+def test_worker_entry_slug_from_filename():
+    record = ArticleRecord.from_dict({'filename': '2024-01-02-cozy-bedroom.md', 'title': 'Cozy Bedroom'})
+    assert record.slug == 'cozy-bedroom'
+    assert record.post_path == '_posts/2024-01-02-cozy-bedroom.md'
+
+
+def test_round_trip():
+    record = ArticleRecord(slug='a', keyword='b', word_count=3)
+    assert ArticleRecord.from_dict(record.to_dict()) == record
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Tests for the offline benchmark's mock settings and helpers
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from benchmark import MockConfig, mock_photo, percentile
+
+
+def test_mock_config_parses_key_value_specs():
+    config = MockConfig.parse('latency=2, error_rate=0.1,rate_limit=30,')
+    assert (config.latency, config.error_rate, config.rate_limit) == (2.0, 0.1, 30)
+    assert isinstance(config.rate_limit, int)
+    assert MockConfig.parse('') == MockConfig()
+    with pytest.raises(ValueError):
+        MockConfig.parse('speed=3')
+
+
+def test_percentile_is_nearest_rank():
+    values = [5.0, 1.0, 3.0, 2.0, 4.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == 5.0
+    assert percentile(values, 0) == 1.0
+    assert percentile([], 95) == 0.0
+
+
+def test_mock_photo_is_a_jpeg_of_roughly_the_requested_size():
+    photo = mock_photo(150)
+    assert Image.open(io.BytesIO(photo)).size == (1600, 1067)
+    assert 75 * 1024 < len(photo) < 300 * 1024
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for recording and replaying upstream exchanges
+"""
+
+import io
+import asyncio
+
+import pytest
+from PIL import Image
+
+from cassette import Cassette, CassetteMiss, ReplayedError, decode_body, encode_body
+
+
+def test_bodies_round_trip():
+    assert decode_body(encode_body(b'{"ok": true}')) == b'{"ok": true}'
+    assert decode_body(encode_body(b'\xff\x00' * 10)) == b'\xff\x00' * 10
+    blob = bytes(range(256)) * 40
+    stored = encode_body(blob)
+    assert set(stored) == {'size', 'sha256'}
+    assert len(decode_body(stored)) == len(blob)
+
+
+def test_large_images_replay_as_decodable_jpegs():
+    output = io.BytesIO()
+    Image.effect_noise((400, 300), 30).convert('RGB').save(output, 'PNG')
+    stored = encode_body(output.getvalue())
+    assert stored['image'] == [400, 300]
+    replayed = decode_body(stored)
+    assert len(replayed) == stored['size']
+    assert Image.open(io.BytesIO(replayed)).size == (400, 300)
+    assert decode_body(stored) == replayed
+
+
+def test_record_then_replay(tmp_path):
+    path = tmp_path / 'run.cassette.json.gz'
+    recorder = Cassette(str(path), 'record')
+
+    async def live():
+        return {'status': 200, 'body': {'text': 'hello'}}
+
+    async def broken():
+        raise ConnectionError('reset')
+
+    async def record():
+        await recorder.exchange('github', {'path': '/a'}, live)
+        with pytest.raises(ConnectionError):
+            await recorder.exchange('github', {'path': '/b'}, broken)
+
+    asyncio.run(record())
+    recorder.save()
+
+    async def replay():
+        player = Cassette(str(path), 'replay', speed=0)
+        # The second request matches by kind once its exact fingerprint is used up
+        responses = [await player.exchange('github', {'path': '/a'}, live)]
+        with pytest.raises(ReplayedError):
+            await player.exchange('github', {'path': '/a'}, live)
+        with pytest.raises(CassetteMiss):
+            await player.exchange('github', {'path': '/a'}, live)
+        return responses
+
+    assert asyncio.run(replay()) == [{'status': 200, 'body': {'text': 'hello'}}]
+
+
+def test_from_environment(monkeypatch, tmp_path):
+    monkeypatch.delenv('CASSETTE_MODE', raising=False)
+    assert Cassette.from_environment() is None
+    monkeypatch.setenv('CASSETTE_MODE', 'RECORD')
+    monkeypatch.setenv('CASSETTE_PATH', str(tmp_path / 'c.json.gz'))
+    assert Cassette.from_environment().mode == 'record'
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path / 'c.json.gz'), 'rewind')
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for the closed/open/half-open circuit breaker
+"""
+
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, is_failure_status
+
+
+def tripped(reset_timeout=0.05):
+    breaker = CircuitBreaker('gemini', failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = tripped()
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.stats() == {'state': OPEN, 'failures': 2, 'trips': 1}
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker('gemini', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_admits_one_probe_that_closes_it():
+    breaker = tripped()
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow() is True
+
+
+def test_failed_probe_reopens():
+    breaker = tripped()
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.trips == 2
+    assert breaker.allow() is False
+
+
+def test_lost_probe_stops_blocking_after_the_timeout():
+    breaker = tripped()
+    time.sleep(0.06)
+    assert breaker.allow() is True
+    time.sleep(0.06)
+    assert breaker.allow() is True
+
+
+def test_failure_statuses():
+    assert is_failure_status(429) and is_failure_status(503)
+    assert not is_failure_status(404) and not is_failure_status(None)
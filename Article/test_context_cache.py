@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for shared article contexts and Gemini context caching
+"""
+
+import asyncio
+import time
+
+from context_cache import ContextCache, SharedContext
+from llm_backends import GeminiBackend, LLMBackendError
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+
+class RecordingGemini(GeminiBackend):
+    """Gemini backend whose REST calls are answered locally"""
+
+    def __init__(self, cache, fail_status=None):
+        async def key_provider():
+            return 'key-a'
+        super().__init__(key_provider, context_cache=cache)
+        self.calls = []
+        self.fail_status = fail_status
+
+    async def _rest(self, method, path, api_key, body=None):
+        self.calls.append((method, path))
+        if self.fail_status:
+            raise LLMBackendError('rejected', status=self.fail_status)
+        return {'name': 'cachedContents/abc'} if method == 'POST' else {}
+
+
+def test_minimum_follows_the_model_family():
+    cache = ContextCache()
+    assert cache.minimum('gemini-1.5-pro-002') == 32768
+    assert cache.minimum('gemini-2.5-flash') == 1024
+    assert cache.minimum('some-new-model') == 32768
+    assert ContextCache(min_tokens=0).minimum('gemini-1.5-pro') == 0
+
+
+def test_small_contexts_are_not_cached():
+    cache = ContextCache()
+    context = SharedContext('short brief')
+    context.uses = 1
+    assert cache.wants(context, 'gemini-1.5-pro') is False
+    assert cache.stats()['too_small'] == 1
+    assert ContextCache(min_tokens=0).wants(context, 'gemini-1.5-pro') is True
+
+
+def test_from_config():
+    assert ContextCache.from_config(None) is None
+    assert ContextCache.from_config(True).ttl_seconds == 300
+    assert ContextCache.from_config({'ttl_seconds': 60}).ttl_seconds == 60
+
+
+def test_cached_for_ignores_expired_entries():
+    context = SharedContext('brief')
+    context.cached[('gemini', 'm1')] = ('key', 'cachedContents/a', time.monotonic() + 60)
+    context.cached[('gemini', 'm2')] = ('key', 'cachedContents/b', time.monotonic() - 1)
+    assert context.cached_for('m1') and not context.cached_for('m2') and not context.cached_for('m3')
+
+
+def test_follow_ups_carry_the_brief_only_when_cached():
+    generator = CloudflareOptimizedArticleGenerator({'context_cache': True})
+    brief = SharedContext('brief')
+    assert generator.follow_up_brief(brief, 'gemini-1.5-pro') is None
+    brief.cached[('gemini', 'gemini-1.5-pro')] = ('key', 'cachedContents/a', time.monotonic() + 60)
+    assert generator.follow_up_brief(brief, 'gemini-1.5-pro') is brief
+    assert generator.follow_up_brief(brief, 'gemini-1.5-flash') is None
+
+
+def test_cache_is_created_and_deleted_on_release():
+    cache = ContextCache(min_tokens=0)
+    backend = RecordingGemini(cache)
+    context = SharedContext('brief')
+
+    async def scenario():
+        await backend._create_context_cache('gemini-1.5-pro-002', context)
+        assert backend._cached_context(context, 'gemini-1.5-pro-002') == ('key-a', 'cachedContents/abc')
+        await backend.release_context(context)
+
+    asyncio.run(scenario())
+    assert backend.calls == [('POST', 'cachedContents'), ('DELETE', 'cachedContents/abc')]
+    assert context.cached == {}
+    assert cache.stats()['created'] == 1 and cache.stats()['deleted'] == 1
+
+
+def test_cache_finished_after_release_is_deleted_at_once():
+    cache = ContextCache(min_tokens=0)
+    backend = RecordingGemini(cache)
+    context = SharedContext('brief')
+    context.released = True
+    asyncio.run(backend._create_context_cache('gemini-1.5-pro-002', context))
+    assert backend.calls == [('POST', 'cachedContents'), ('DELETE', 'cachedContents/abc')]
+    assert context.cached == {}
+
+
+def test_rejected_model_is_marked_unsupported():
+    cache = ContextCache(min_tokens=0)
+    backend = RecordingGemini(cache, fail_status=400)
+    asyncio.run(backend._create_context_cache('gemini-1.5-pro', SharedContext('brief')))
+    assert 'gemini-1.5-pro' in cache.unsupported
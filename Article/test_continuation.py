@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for continuing article content cut off at the output token limit
+"""
+
+import asyncio
+
+from llm_backends import LLMResponse
+from context_cache import SharedContext
+from quality import split_sections, section_problems
+from UpdateArticle import CloudflareOptimizedArticleGenerator, continuation_base, missing_sections
+
+OUTLINE = {'structure': {'sections': [{'heading': heading} for heading in ('Layout', 'Storage', 'Lighting')]}}
+BODY = ' '.join(['Plan the space carefully before buying anything.'] * 12)
+
+
+def test_continuation_base_drops_cut_paragraph():
+    content = f"## Layout\n\n{BODY}\n\n{BODY}\n\nHalf a senten"
+    assert continuation_base(content) == f"## Layout\n\n{BODY}\n\n{BODY}"
+
+
+def test_continuation_base_drops_heading_whose_body_was_cut():
+    content = f"## Layout\n\n{BODY}\n\n## Storage\n\nShelves and hid"
+    base = continuation_base(content)
+    assert base == f"## Layout\n\n{BODY}"
+    assert missing_sections(OUTLINE, base) == ['Storage', 'Lighting']
+
+
+def test_continuation_base_keeps_a_single_long_paragraph():
+    content = f"## Layout\n\n{BODY} And then"
+    assert continuation_base(content) == content
+
+
+def test_truncated_draft_is_continued_without_empty_sections():
+    generator = CloudflareOptimizedArticleGenerator({'quality_gate': False})
+    replies = [
+        LLMResponse(f"## Layout\n\n{BODY}\n\n## Storage\n\nShelves and hid", 'gemini', 'm', finish_reason='MAX_TOKENS'),
+        LLMResponse(f"## Storage\n\n{BODY}\n\n## Lighting\n\n{BODY}", 'gemini', 'm', finish_reason='STOP')
+    ]
+    prompts = []
+
+    async def generate_response(prompt, model, context=None, **kwargs):
+        prompts.append(prompt)
+        return replies.pop(0)
+
+    generator.generate_response = generate_response
+    span = {}
+    content = asyncio.run(generator.write_content(
+        'Write it', 'gemini-1.5-pro', OUTLINE, 'small kitchen', 'Small Kitchen', span, SharedContext('brief')
+    ))
+    assert 'Sections still to write: Storage, Lighting' in prompts[1]
+    assert span == {'continuations': 1, 'truncated': False}
+    headed = [(heading, text) for heading, text in split_sections(content) if heading]
+    assert [heading for heading, _ in headed] == ['Layout', 'Storage', 'Lighting']
+    assert not any(section_problems(text, 80) for _, text in headed)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for run deadlines, stage time estimates and checkpointed articles
+"""
+
+import asyncio
+
+import pytest
+
+from deadline import DEFAULT_STAGE_SECONDS, Deadline, StageEstimates
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+
+class LambdaContext:
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+
+def test_budget_sources_in_order_less_the_margin():
+    assert Deadline.from_invocation() is None
+    assert Deadline.from_invocation({'deadline_seconds': 20}, LambdaContext()).seconds == 15
+    assert Deadline.from_invocation({}, LambdaContext()).seconds == 25
+    config = {'run_timeout_seconds': 60, 'deadline_margin_seconds': 10}
+    assert Deadline.from_invocation(config=config).seconds == 50
+    assert Deadline.from_invocation({'deadline_seconds': 2}).seconds == 0
+
+
+def test_remaining_and_allows():
+    deadline = Deadline(10)
+    assert not deadline.expired
+    assert deadline.allows(5) and not deadline.allows(11)
+    assert Deadline(0).expired
+
+
+def test_current_follows_the_task():
+    async def scenario():
+        assert Deadline.current() is None
+        deadline = Deadline(10)
+        deadline.activate()
+
+        async def child():
+            return Deadline.current()
+
+        return deadline, await asyncio.create_task(child())
+
+    deadline, seen = asyncio.run(scenario())
+    assert seen is deadline
+
+
+def test_scope_cancels_work_past_the_deadline():
+    async def scenario():
+        async with Deadline(0.01).scope():
+            await asyncio.sleep(1)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(scenario())
+
+
+def test_first_observation_replaces_the_default_then_smooths():
+    estimates = StageEstimates()
+    assert estimates.needed('title', 'save') == DEFAULT_STAGE_SECONDS['title'] + DEFAULT_STAGE_SECONDS['save']
+    estimates.observe_span({'stage': 'title', 'wall_ms': 2000.0})
+    assert estimates.seconds['title'] == 2.0
+    estimates.observe_span({'stage': 'title', 'wall_ms': 4000.0})
+    assert estimates.seconds['title'] == pytest.approx(2.6)
+    estimates.observe_span({'stage': 'title', 'wall_ms': 90000.0, 'ok': False})
+    assert estimates.seconds['title'] == pytest.approx(2.6)
+    assert estimates.needed('unknown') == 0.0
+
+
+def checkpointing_generator(tmp_path, calls):
+    generator = CloudflareOptimizedArticleGenerator({
+        'stage_seconds': {'title': 0.01, 'outline': 0.01, 'content': 0.01, 'save': 0.3}
+    })
+    generator.api_keys = ['key-a']
+    generator.checkpoint_dir = tmp_path / 'checkpoints'
+
+    async def generate_complete_article(keyword):
+        calls.append('generate')
+        await asyncio.sleep(0.15)
+        return generator.build_article(keyword, 'Small Kitchen Ideas', {}, '## Layout\n\nPlan it.')
+
+    async def save_article_to_github(article):
+        calls.append('save')
+        return True
+
+    generator.generate_complete_article = generate_complete_article
+    generator.save_article_to_github = save_article_to_github
+    return generator
+
+
+def test_article_finished_near_the_deadline_is_checkpointed_then_resumed(tmp_path):
+    calls = []
+    generator = checkpointing_generator(tmp_path, calls)
+    # Generation fits the 0.4s budget, but once it has taken 0.15s the 0.3s save no longer does
+    first = asyncio.run(generator.run('small kitchen', deadline=Deadline(0.4)))
+    assert first['message'] == "Deadline reached; article checkpointed for the next run"
+    assert calls == ['generate']
+    assert (tmp_path / 'checkpoints' / 'small-kitchen.json').exists()
+
+    # The next run publishes the checkpoint instead of regenerating it
+    calls.clear()
+    resumed = checkpointing_generator(tmp_path, calls)
+    second = asyncio.run(resumed.run('small kitchen', deadline=Deadline(10)))
+    assert second['success'] and second['article']['title'] == 'Small Kitchen Ideas'
+    assert calls == ['save']
+    assert not (tmp_path / 'checkpoints' / 'small-kitchen.json').exists()
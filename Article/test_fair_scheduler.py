@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for deficit-round-robin ordering of LLM calls across articles
+"""
+
+import asyncio
+
+from fair_scheduler import FairScheduler
+
+PRO = 'gemini-1.5-pro'
+FLASH = 'gemini-1.5-flash'
+
+
+def grant_order(scheduler, calls):
+    """Queue `calls` of (flow, model[, weight]) behind a held slot and return the flows in grant order"""
+    order = []
+
+    async def call(flow, model, weight=1.0):
+        FairScheduler.set_flow(flow, weight)
+        async with scheduler.slot(model):
+            order.append(flow)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        await scheduler.acquire(PRO)
+        tasks = [asyncio.create_task(call(*spec)) for spec in calls]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    return order
+
+
+def test_flash_calls_go_first_and_long_calls_interleave():
+    scheduler = FairScheduler(capacity=1)
+    calls = [('a', PRO)] * 3 + [('b', PRO)] * 2 + [('c', FLASH)]
+    assert grant_order(scheduler, calls) == ['c', 'a', 'b', 'a', 'b', 'a']
+    assert scheduler.in_use == 0 and scheduler.waiting == 0
+
+
+def test_weight_scales_a_flows_share():
+    scheduler = FairScheduler(capacity=1)
+    calls = [('a', PRO, 2.0)] * 4 + [('b', PRO)] * 2
+    assert grant_order(scheduler, calls) == ['a', 'a', 'b', 'a', 'a', 'b']
+
+
+def test_cost_and_capacity():
+    limit = {'value': 3}
+    scheduler = FairScheduler(capacity=lambda: limit['value'], costs={'pro': 8.0})
+    assert scheduler.cost(FLASH) == (1.0, True)
+    assert scheduler.cost(PRO) == (8.0, False)
+    assert scheduler.cost('gpt-4o') == (8.0, False)
+    assert scheduler.capacity == 3
+    limit['value'] = 0
+    assert scheduler.capacity == 1
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    scheduler = FairScheduler(capacity=1)
+
+    async def scenario():
+        await scheduler.acquire(PRO)
+        FairScheduler.set_flow('a')
+        waiter = asyncio.create_task(scheduler.acquire(PRO))
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release()
+
+    asyncio.run(scenario())
+    assert scheduler.waiting == 0 and scheduler.in_use == 0
@@ -6,8 +6,12 @@ Test script untuk memverifikasi generator artikel berfungsi dengan benar
 import os
 import sys
 import json
+import subprocess
 from pathlib import Path
 
+# Dependencies that must only load on first use, not when UpdateArticle is imported
+LAZY_MODULES = ['google.generativeai', 'aiohttp', 'frontmatter', 'langdetect', 'markdown', 'requests']
+
 def test_environment():
     """Test environment dan dependencies"""
     print("🔍 Testing environment...")
@@ -133,6 +137,36 @@ def test_output_directory():
     
     return True
 
+def test_import_time():
+    """Test cold-start import time with python -X importtime"""
+    print("\n🔍 Testing import time...")
+    
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import UpdateArticle; print(UpdateArticle.COLD_START_BUDGET_MS)'],
+        cwd=Path(__file__).parent, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, f"Import failed: {result.stderr.strip().splitlines()[-1:]}"
+    
+    # Lines look like "import time:  self [us] | cumulative | module"
+    cumulative_ms = {}
+    for line in result.stderr.splitlines():
+        parts = line.partition('import time:')[2].split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            cumulative_ms[parts[2].strip()] = int(parts[1]) / 1000
+    
+    budget = int(result.stdout.strip().splitlines()[-1])
+    total = cumulative_ms.get('UpdateArticle', 0.0)
+    print(f"⏱️  UpdateArticle imported in {total:.0f} ms (budget {budget} ms)")
+    
+    eager = [module for module in LAZY_MODULES if module in cumulative_ms]
+    assert not eager, f"Imported at startup: {', '.join(eager)}"
+    
+    slowest = sorted(cumulative_ms.items(), key=lambda item: -item[1])[1:4]
+    print(f"📝 Slowest imports: {', '.join(f'{name} {ms:.0f} ms' for name, ms in slowest)}")
+    
+    assert total < budget, f"Cold start over budget by {total - budget:.0f} ms"
+    print("✅ Cold start within budget")
+
 def main():
     """Run all tests"""
     print("🚀 Starting Article Generator Test\n")
@@ -142,14 +176,16 @@ def main():
         ("Files", test_files), 
         ("Keywords", test_keywords),
         ("API Keys", test_api_keys),
-        ("Output Directories", test_output_directory)
+        ("Output Directories", test_output_directory),
+        ("Import Time", test_import_time)
     ]
     
     results = []
     for test_name, test_func in tests:
         try:
+            # Tests either return a bool or assert and return None
             result = test_func()
-            results.append((test_name, result))
+            results.append((test_name, result is not False))
         except Exception as e:
             print(f"❌ {test_name} test failed: {e}")
             results.append((test_name, False))
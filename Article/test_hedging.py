@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for hedged title/outline calls and their daily quota accounting
+"""
+
+import asyncio
+
+from asyncio_throttle.throttler import Throttler
+
+from hedging import HedgePolicy
+from llm_backends import LLMBackend, LLMResponse
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+
+class SleepyBackend(LLMBackend):
+    """Answers after the next delay in `delays`"""
+
+    counts_daily_quota = True
+
+    def __init__(self, delays, **kwargs):
+        super().__init__('sleepy', **kwargs)
+        self.delays = list(delays)
+        self.sent = 0
+
+    async def _generate(self, prompt, model, max_output_tokens, temperature):
+        self.sent += 1
+        await asyncio.sleep(self.delays.pop(0))
+        return LLMResponse('Title', self.name, model)
+
+
+def test_policy_waits_for_history_and_respects_budget():
+    policy = HedgePolicy(budget=0.5, min_samples=2)
+    assert policy.delay('title') is None
+    policy.observe('title', 1.0)
+    policy.observe('title', 2.0)
+    # Each call earns half a hedge
+    assert policy.take() is False
+    assert policy.delay('title') == 2.0
+    assert policy.take() is True
+    assert policy.stats()['hedged'] == 1
+
+
+def hedged_call(backend):
+    generator = CloudflareOptimizedArticleGenerator({'hedging': {'min_samples': 1, 'budget': 1.0},
+                                                     'llm_scheduler': False})
+    generator.api_keys = ['key-a', 'key-b']
+    generator.llm_backends = [backend]
+    generator.hedging.observe('title', 0.05)
+    return asyncio.run(generator._generate_live('Title for "x"', 'gemini-1.5-flash', 'title'))
+
+
+def test_hedge_cancelled_in_the_throttler_uses_no_quota():
+    # The duplicate waits for the throttler and is cancelled before it is sent
+    backend = SleepyBackend([0.3, 0.0], throttler=Throttler(rate_limit=1, period=60))
+    response, counted = hedged_call(backend)
+    assert response.text == 'Title'
+    assert backend.sent == 1
+    assert counted == 1
+
+
+def test_sent_losing_call_still_uses_quota():
+    backend = SleepyBackend([0.5, 0.01])
+    response, counted = hedged_call(backend)
+    assert response.text == 'Title'
+    assert backend.sent == 2
+    assert counted == 2
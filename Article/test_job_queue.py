@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite job queue: leases, reclaim, dead letters and draining
+"""
+
+import asyncio
+import time
+
+from deadline import Deadline
+from job_queue import JobQueue, enqueue_and_drain, run_worker
+
+
+class FakeGenerator:
+    """Answers `run` with the next result in `results`, after `delay` seconds"""
+
+    def __init__(self, results, delay=0.0):
+        self.results = list(results)
+        self.delay = delay
+        self.keywords = []
+        self.finished = 0
+
+    async def run(self, keyword=None, deadline=None):
+        self.keywords.append(keyword)
+        await asyncio.sleep(self.delay)
+        self.finished += 1
+        return self.results.pop(0)
+
+
+def status(queue, job_id):
+    with queue._connect() as conn:
+        return dict(conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+
+def test_claim_and_ack(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    job_id = queue.enqueue('cron', {'keyword': 'desk lamps'})
+    job = queue.claim('w1')
+    assert job['id'] == job_id and job['payload'] == {'keyword': 'desk lamps'} and job['attempts'] == 1
+    assert queue.claim('w2') is None
+    assert queue.ack(job_id, 'w2') is False
+    assert queue.ack(job_id, 'w1', {'title': 'Desk Lamps'}) is True
+    assert queue.stats() == {'done': 1}
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db', visibility_timeout=0.05)
+    job_id = queue.enqueue('cron')
+    queue.claim('w1')
+    time.sleep(0.06)
+    job = queue.claim('w2')
+    assert job['id'] == job_id and job['attempts'] == 2
+    assert queue.extend(job_id, 'w1') is False
+    assert queue.ack(job_id, 'w1') is False
+    assert queue.ack(job_id, 'w2') is True
+
+
+def test_failures_back_off_then_dead_letter(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db', max_attempts=2, retry_delay=0)
+    job_id = queue.enqueue('cron')
+    job = queue.claim('w1')
+    assert queue.fail(job_id, 'w1', 'boom', job['attempts'])
+    assert status(queue, job_id)['status'] == 'queued'
+    job = queue.claim('w1')
+    assert queue.fail(job_id, 'w1', 'boom again', job['attempts'])
+    assert queue.claim('w1') is None
+    assert [(dead['id'], dead['last_error']) for dead in queue.dead_letters()] == [(job_id, 'boom again')]
+    assert queue.requeue_dead() == 1 and queue.claim('w1')['id'] == job_id
+
+
+def test_expired_leases_are_dead_lettered(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db', visibility_timeout=0, max_attempts=1)
+    job_id = queue.enqueue('cron')
+    queue.claim('w1')
+    assert queue.claim('w2') is None
+    assert status(queue, job_id)['last_error'] == 'lease expired'
+
+
+def test_release_keeps_attempts(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    job_id = queue.enqueue('cron')
+    queue.claim('w1')
+    assert queue.release(job_id, 'w1', delay=60)
+    assert queue.claim('w1') is None
+    assert status(queue, job_id)['attempts'] == 0
+
+
+def test_worker_records_outcomes(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db', retry_delay=60)
+    done, failed, parked = (queue.enqueue('cron', {'keyword': k}) for k in ('a', 'b', 'c'))
+    generator = FakeGenerator([
+        {'success': True, 'message': 'ok', 'article': {'title': 'A'}},
+        {'success': False, 'message': 'Execution error: boom'},
+        {'success': False, 'message': 'Deadline reached before the article was generated'}
+    ])
+    results = []
+    # The worker stops once a job runs out of time
+    assert asyncio.run(run_worker(queue, generator, 'w1', drain=True, results=results)) == 3
+    assert generator.keywords == ['a', 'b', 'c']
+    assert [result['recorded'] for result in results] == [True, True, True]
+    assert status(queue, done)['status'] == 'done'
+    assert status(queue, failed)['last_error'] == 'Execution error: boom'
+    assert status(queue, parked)['status'] == 'queued' and status(queue, parked)['attempts'] == 0
+
+
+def test_lost_lease_aborts_the_job(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db', visibility_timeout=0.15)
+    job_id = queue.enqueue('cron')
+    generator = FakeGenerator([{'success': True, 'message': 'ok'}], delay=1.0)
+
+    async def steal():
+        await asyncio.sleep(0.02)
+        with queue._connect() as conn:
+            conn.execute("UPDATE jobs SET lease_owner = 'w2' WHERE id = ?", (job_id,))
+
+    async def scenario():
+        results = []
+        await asyncio.gather(run_worker(queue, generator, 'w1', drain=True, results=results), steal())
+        return results
+
+    results = asyncio.run(scenario())
+    assert generator.finished == 0
+    assert results[0]['message'] == "Lease lost; job aborted" and results[0]['recorded'] is False
+    assert status(queue, job_id)['status'] == 'leased'
+
+
+def test_worker_stops_claiming_after_the_deadline(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    queue.enqueue('cron')
+    generator = FakeGenerator([])
+    assert asyncio.run(run_worker(queue, generator, 'w1', drain=True, deadline=Deadline(0))) == 0
+    assert queue.stats() == {'queued': 1}
+
+
+def test_enqueue_and_drain_retries_leftover_jobs(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    leftover = queue.enqueue('cron', {'keyword': 'old'})
+    generator = FakeGenerator([{'success': True, 'message': 'ok'}, {'success': False, 'message': 'no'}])
+    result = asyncio.run(enqueue_and_drain(generator, 'webhook', {'keyword': 'new'}, queue=queue))
+    assert generator.keywords == ['old', 'new']
+    assert result['success'] is True
+    assert result['message'] == "Processed 2 jobs, 1 succeeded"
+    assert [job['source'] for job in result['jobs']] == ['cron', 'webhook']
+    assert result['job_ids'] == [leftover + 1]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the priority keyword scheduler
+"""
+
+import asyncio
+
+from keyword_scheduler import KeywordScheduler, parse_keyword_line
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+
+def test_parse_keyword_line():
+    assert parse_keyword_line('desk lamps\t2.5') == ('desk lamps', 2.5)
+    assert parse_keyword_line('desk lamps') == ('desk lamps', 1.0)
+    assert parse_keyword_line('desk lamps\tsoon') == ('desk lamps', 1.0)
+
+
+def test_waiting_keywords_age_past_higher_priorities():
+    scheduler = KeywordScheduler(aging_rate=1.0)
+    scheduler.sync({'high': 3.0, 'low': 1.0})
+    served = []
+    for _ in range(4):
+        keyword = scheduler.pop()
+        served.append(keyword)
+        scheduler.complete(keyword)
+    # Two rounds use up "high"'s lead; the tie goes to the keyword that waited longer
+    assert served == ['high', 'high', 'low', 'high']
+
+
+def test_peek_and_exclude_do_not_take_keywords():
+    scheduler = KeywordScheduler()
+    scheduler.sync({'a': 3.0, 'b': 2.0, 'c': 1.0})
+    assert scheduler.peek(2) == ['a', 'b']
+    assert scheduler.next_batch(2, exclude={'a'}) == ['b', 'c']
+    assert len(scheduler) == 1
+    scheduler.release('c')
+    assert scheduler.pop() == 'a'
+
+
+def test_sync_drops_removed_keywords_and_updates_priorities():
+    scheduler = KeywordScheduler()
+    scheduler.sync({'a': 1.0, 'b': 2.0})
+    scheduler.sync({'a': 5.0, 'c': 1.0})
+    assert set(scheduler.priorities) == {'a', 'c'}
+    assert scheduler.pop() == 'a'
+
+
+def test_in_flight_keywords_keep_their_place_when_saved(tmp_path):
+    path = tmp_path / 'queue.json'
+    scheduler = KeywordScheduler(path)
+    scheduler.sync({'a': 2.0, 'b': 1.0})
+    scheduler.complete(scheduler.pop())
+    scheduler.pop()
+    scheduler.save()
+    restored = KeywordScheduler(path)
+    assert restored.round == 1
+    assert restored.enqueued == {'a': 1, 'b': 0}
+
+
+def test_rejected_keyword_backs_off():
+    scheduler = KeywordScheduler(backoff_rounds=4)
+    scheduler.sync({'bad': 2.0, 'good': 1.0})
+    assert scheduler.pop() == 'bad'
+    scheduler.complete('bad', success=False, rejected=True)
+    assert scheduler.enqueued['bad'] == 4
+    assert scheduler.pop() == 'good'
+
+
+def test_plain_failure_keeps_position():
+    scheduler = KeywordScheduler()
+    scheduler.sync({'flaky': 2.0, 'other': 1.0})
+    scheduler.pop()
+    scheduler.complete('flaky', success=False)
+    assert scheduler.pop() == 'flaky'
+    assert 'flaky' not in scheduler.rejections
+
+
+def test_backoff_doubles_is_capped_and_resets_on_success():
+    scheduler = KeywordScheduler(backoff_rounds=4, max_backoff_rounds=10)
+    scheduler.sync({'bad': 1.0})
+    rounds = []
+    for _ in range(3):
+        scheduler.pop()
+        scheduler.complete('bad', success=False, rejected=True)
+        rounds.append(scheduler.enqueued['bad'])
+    assert rounds == [4, 8, 10]
+    scheduler.pop()
+    scheduler.complete('bad', success=True)
+    assert scheduler.rejections == {}
+
+
+def test_rejections_persist(tmp_path):
+    path = tmp_path / 'queue.json'
+    scheduler = KeywordScheduler(path)
+    scheduler.sync({'bad': 1.0})
+    scheduler.pop()
+    scheduler.complete('bad', success=False, rejected=True)
+    restored = KeywordScheduler(path)
+    assert restored.rejections == {'bad': 1}
+    assert restored.enqueued == {'bad': 4}
+
+
+def test_single_runs_and_batches_report_the_same_stats(tmp_path, monkeypatch):
+    textfile = tmp_path / 'article.prom'
+    monkeypatch.setenv('METRICS_TEXTFILE', str(textfile))
+    monkeypatch.setenv('KEYWORD_QUEUE_FILE', '')
+    monkeypatch.setenv('PACKED_CACHE_FILE', '')
+    generator = CloudflareOptimizedArticleGenerator({'packed_prompts': True})
+    generator.api_keys = ['key-a']
+    generator.checkpoint_dir = tmp_path / 'checkpoints'
+
+    async def no_reply(prompt, model, hedge=None, context=None):
+        return None
+
+    generator.generate_response = no_reply
+    single = asyncio.run(generator.run('desk lamps'))
+    batch = asyncio.run(generator.run_batch(keywords=['desk lamps', 'small kitchen']))
+    collected = {'api_calls', 'stages', 'stage_summary', 'limits', 'coalesced', 'breakers', 'packed_hits'}
+    assert collected <= set(single['stats']) and collected <= set(batch['stats'])
+    assert batch['message'] == 'Created 0/2 articles'
+    assert textfile.exists()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for LLM backend construction and the OpenAI-compatible backend
+"""
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from llm_backends import (GeminiBackend, LLMBackendError, OpenAICompatibleBackend, backend_specs_from_environment,
+                          build_backends)
+
+
+async def key_provider():
+    return 'key-a'
+
+
+def test_specs_default_to_gemini(monkeypatch):
+    monkeypatch.delenv('LLM_BACKENDS', raising=False)
+    assert backend_specs_from_environment() == [{'type': 'gemini'}]
+    monkeypatch.setenv('LLM_BACKENDS', 'not json')
+    assert backend_specs_from_environment() == [{'type': 'gemini'}]
+    monkeypatch.setenv('LLM_BACKENDS', '[{"type": "openai", "base_url": "http://localhost:8000/v1"}]')
+    assert backend_specs_from_environment()[0]['type'] == 'openai'
+
+
+def test_build_backends_in_order(monkeypatch):
+    monkeypatch.setenv('LOCAL_LLM_KEY', 'secret')
+    backends = build_backends([
+        {'type': 'openai', 'base_url': 'http://localhost:8000/v1/', 'api_key_env': 'LOCAL_LLM_KEY',
+         'models': {'gemini-1.5-pro': 'llama-3-70b'}},
+        {'type': 'mystery'},
+        {'type': 'gemini'}
+    ], key_provider)
+    assert [type(backend) for backend in backends] == [OpenAICompatibleBackend, GeminiBackend]
+    assert backends[0].base_url == 'http://localhost:8000/v1'
+    assert backends[0].api_key == 'secret'
+
+
+def chat_server(requests, status=200):
+    async def completions(request):
+        requests.append((request.headers.get('Authorization'), await request.json()))
+        if status != 200:
+            return web.Response(status=status, text='overloaded')
+        return web.json_response({
+            'choices': [{'message': {'content': ' Generated title '}, 'finish_reason': 'length'}],
+            'usage': {'prompt_tokens': 7, 'completion_tokens': 3, 'total_tokens': 10}
+        })
+
+    app = web.Application()
+    app.router.add_post('/v1/chat/completions', completions)
+    return app
+
+
+async def call_backend(app, prompt, requested_model, **kwargs):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    backend = OpenAICompatibleBackend(f"http://127.0.0.1:{port}/v1", **kwargs)
+    try:
+        return await backend.generate(prompt, requested_model, max_output_tokens=50)
+    finally:
+        await backend.close()
+        await runner.cleanup()
+
+
+def test_openai_backend_maps_models_and_finish_reasons():
+    requests = []
+    response = asyncio.run(call_backend(
+        chat_server(requests), 'Title please', 'gemini-1.5-flash',
+        api_key='token', models={'gemini-1.5-flash': 'llama-3-8b'}
+    ))
+    assert response.text == 'Generated title'
+    assert response.model == 'llama-3-8b'
+    assert response.finish_reason == 'MAX_TOKENS'
+    assert (response.prompt_tokens, response.output_tokens, response.total_tokens) == (7, 3, 10)
+    authorization, payload = requests[0]
+    assert authorization == 'Bearer token'
+    assert payload['model'] == 'llama-3-8b' and payload['max_tokens'] == 50
+
+
+def test_openai_backend_errors_carry_the_status():
+    with pytest.raises(LLMBackendError) as error:
+        asyncio.run(call_backend(chat_server([], status=503), 'Title please', 'gemini-1.5-flash',
+                                 model='local'))
+    assert error.value.status == 503
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus text exposition of generator metrics
+"""
+
+import urllib.request
+
+from metrics import Counter, GeneratorMetrics, Histogram, start_metrics_server
+
+
+def test_counter_labels_are_escaped():
+    counter = Counter('article_http_responses_total', 'HTTP responses', ('host', 'status'))
+    counter.inc(host='api.github.com', status=201)
+    counter.inc(2, host='a"b', status=500)
+    assert counter.value(host='api.github.com', status=201) == 1
+    assert counter.render() == [
+        '# HELP article_http_responses_total HTTP responses',
+        '# TYPE article_http_responses_total counter',
+        'article_http_responses_total{host="a\\"b",status="500"} 2',
+        'article_http_responses_total{host="api.github.com",status="201"} 1'
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('article_stage_seconds', 'Stage time', ('stage',), buckets=(0.5, 1))
+    for value in (0.2, 0.7, 3):
+        histogram.observe(value, stage='title')
+    assert histogram.render()[2:] == [
+        'article_stage_seconds_bucket{stage="title",le="0.5"} 1',
+        'article_stage_seconds_bucket{stage="title",le="1.0"} 2',
+        'article_stage_seconds_bucket{stage="title",le="+Inf"} 3',
+        'article_stage_seconds_sum{stage="title"} 3.9',
+        'article_stage_seconds_count{stage="title"} 3'
+    ]
+
+
+def test_spans_and_saved_articles_feed_the_metric_set(tmp_path):
+    metrics = GeneratorMetrics()
+    metrics.observe_span({'stage': 'save', 'wall_ms': 120.0, 'ok': False})
+    metrics.article_saved()
+    path = tmp_path / 'article.prom'
+    metrics.write_textfile(str(path))
+    text = path.read_text()
+    assert 'article_stage_seconds_count{stage="save",ok="false"} 1' in text
+    assert 'article_articles_total 1' in text
+    assert not (tmp_path / 'article.prom.tmp').exists()
+
+
+def test_metrics_endpoint():
+    server = start_metrics_server(0)
+    assert start_metrics_server(0) is server
+    port = server.server_address[1]
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        assert response.status == 200
+        assert '# TYPE article_articles_total counter' in response.read().decode()
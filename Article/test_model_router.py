@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for per-stage model routing and the draft cascade
+"""
+
+import asyncio
+
+from context_cache import SharedContext
+from llm_backends import LLMResponse
+from model_router import DEFAULT_MODELS, ModelRouter, read_config_file
+from quality import split_sections
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+
+def test_read_config_file(tmp_path):
+    path = tmp_path / 'CONFIG.txt'
+    path.write_text("# models\nMODEL_TITLE = gemini-2.0-flash\n\nnot a setting\nEMPTY=\n", encoding='utf-8')
+    assert read_config_file(path) == {'MODEL_TITLE': 'gemini-2.0-flash', 'EMPTY': ''}
+    assert read_config_file(tmp_path / 'missing.txt') == {}
+
+
+def test_blog_config_overrides_config_file(tmp_path):
+    path = tmp_path / 'CONFIG.txt'
+    path.write_text("MODEL_TITLE=file-title\nMODEL_OUTLINE=file-outline\nMODEL_ARTICLE=\n", encoding='utf-8')
+    router = ModelRouter.from_config({'models': {'outline': 'blog-outline'}}, path)
+    assert router.model('title') == 'file-title'
+    assert router.model('outline') == 'blog-outline'
+    assert router.model('article') == DEFAULT_MODELS['article']
+    assert router.model('unknown') == DEFAULT_MODELS['article']
+
+
+def test_draft_model_only_with_a_cascade(tmp_path):
+    missing = tmp_path / 'CONFIG.txt'
+    plain = ModelRouter.from_config({}, missing)
+    assert plain.cascade is None
+    assert plain.draft_model('outline') == plain.model('outline')
+
+    cascade = ModelRouter.from_config({'model_cascade': True}, missing)
+    assert cascade.draft_model('outline') == 'gemini-1.5-flash'
+    assert cascade.cascade['max_refined'] == 3
+
+    custom = ModelRouter.from_config({'model_cascade': {'draft': 'gemini-2.0-flash', 'max_refined': 1}}, missing)
+    assert custom.draft_model('article') == 'gemini-2.0-flash'
+    assert custom.cascade == {'draft': 'gemini-2.0-flash', 'min_section_words': 120, 'max_refined': 1}
+
+
+HEADINGS = ('Layout', 'Storage', 'Lighting', 'Summary')
+OUTLINE = {'structure': {'sections': [{'heading': heading} for heading in HEADINGS]}}
+BODY = ' '.join(['Measure the room before buying furniture.'] * 4)
+
+
+def section(heading, body=BODY):
+    return f"## {heading}\n\n{body}"
+
+
+def cascade_generator(**cascade):
+    generator = CloudflareOptimizedArticleGenerator({'model_cascade': dict({'min_section_words': 10}, **cascade)})
+    calls = []
+
+    async def generate_response(prompt, model, hedge=None, context=None):
+        calls.append((prompt, model))
+        if 'Rewrite one section' in prompt:
+            heading = prompt.split('starting with the line "## ')[1].split('"')[0]
+            return LLMResponse(section(heading, f"Rewritten {BODY}"), 'gemini', model)
+        return LLMResponse('\n\n'.join(section(h, f"Strong {BODY}") for h in HEADINGS), 'gemini', model,
+                           finish_reason='STOP')
+
+    generator.generate_response = generate_response
+    return generator, calls
+
+
+def refine(generator, draft, span):
+    return asyncio.run(generator.refine_content('Write it', draft, OUTLINE, 'small kitchen', 'Small Kitchen', span,
+                                                SharedContext('brief')))
+
+
+def test_passing_draft_is_kept():
+    generator, calls = cascade_generator()
+    draft = '\n\n'.join(section(h) for h in HEADINGS)
+    span = {}
+    assert refine(generator, draft, span) == draft
+    assert calls == [] and span['refined'] == 0
+
+
+def test_only_failing_sections_go_to_the_stage_model():
+    generator, calls = cascade_generator()
+    draft = '\n\n'.join([section('Layout'), section('Storage', 'Shelves and hid'), section('Lighting'),
+                         section('Summary')])
+    span = {}
+    content = refine(generator, draft, span)
+    assert [model for _, model in calls] == ['gemini-1.5-pro']
+    assert '## Storage' in calls[0][0] and 'ends mid-sentence' in calls[0][0]
+    assert content == '\n\n'.join([section('Layout'), section('Storage', f"Rewritten {BODY}"), section('Lighting'),
+                                   section('Summary')])
+    assert span['refined'] == 1 and 'escalated' not in span
+
+
+def test_too_many_failures_escalate_to_a_full_rewrite():
+    generator, calls = cascade_generator(max_refined=1)
+    draft = '\n\n'.join([section('Layout', 'Too short.'), section('Storage', 'Shelves and hid'),
+                         section('Lighting'), section('Summary')])
+    span = {}
+    content = refine(generator, draft, span)
+    assert calls == [('Write it', 'gemini-1.5-pro')]
+    assert span['escalated'] is True
+    assert content.startswith(section('Layout', f"Strong {BODY}"))
+
+
+def test_missing_sections_are_written_in_outline_order():
+    generator, calls = cascade_generator()
+    draft = '\n\n'.join(['Intro paragraph.', section('Layout'), section('Lighting'), section('Summary')])
+    span = {}
+    content = refine(generator, draft, span)
+    assert len(calls) == 1 and 'missing from the draft' in calls[0][0]
+    assert [heading for heading, _ in split_sections(content)] == ['', 'Layout', 'Storage', 'Lighting', 'Summary']
+    assert section('Storage', f"Rewritten {BODY}") in content
+    assert span['filled'] == 1 and 'missing' not in span
+
+
+def test_unwritten_missing_sections_are_reported():
+    generator, calls = cascade_generator()
+
+    async def no_reply(prompt, model, hedge=None, context=None):
+        return None
+
+    generator.generate_response = no_reply
+    draft = '\n\n'.join([section('Layout'), section('Storage'), section('Lighting')])
+    span = {}
+    assert refine(generator, draft, span) == draft
+    assert span['missing'] == ['Summary'] and span['filled'] == 0
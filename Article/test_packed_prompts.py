@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for packed title/outline replies and their per-keyword cache
+"""
+
+import json
+import asyncio
+
+from llm_backends import LLMResponse
+from packed_prompts import PackedCache, parse_packed
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+KEYWORDS = ['Small Kitchen', 'desk lamps']
+
+
+def test_parse_matches_keywords_case_insensitively():
+    reply = json.dumps({'articles': [
+        {'keyword': 'small kitchen ', 'title': 'Small Kitchen Ideas', 'outline': {'sections': []}},
+        {'keyword': 'Desk Lamps', 'title': 'Desk Lamps', 'outline': 'not a dict'},
+        {'keyword': 'garden sheds', 'title': 'Not asked for'},
+        {'keyword': 'desk lamps', 'title': ''},
+        'noise'
+    ]})
+    assert parse_packed(reply, KEYWORDS) == {
+        'Small Kitchen': {'title': 'Small Kitchen Ideas', 'outline': {'sections': []}},
+        'desk lamps': {'title': 'Desk Lamps'}
+    }
+
+
+def test_parse_strips_fences_and_survives_bad_replies():
+    reply = '```json\n{"articles": [{"keyword": "desk lamps", "title": "Desk Lamps"}]}\n```'
+    assert parse_packed(reply, KEYWORDS) == {'desk lamps': {'title': 'Desk Lamps'}}
+    assert parse_packed('Sorry, I cannot help with that.', KEYWORDS) == {}
+    assert parse_packed('[1, 2]', KEYWORDS) == {}
+    assert parse_packed('{"articles": "none"}', KEYWORDS) == {}
+
+
+def test_cache_entries_are_taken_once_and_persisted(tmp_path):
+    path = tmp_path / 'packed_prompts.json'
+    cache = PackedCache(path)
+    cache.put({'desk lamps': {'title': 'Desk Lamps', 'outline': {}}, 'Small Kitchen': {'title': 'Ideas'}})
+    assert cache.missing(KEYWORDS + ['sheds']) == ['sheds']
+    assert cache.missing(KEYWORDS, outlines=True) == ['Small Kitchen']
+
+    restored = PackedCache(path)
+    assert restored.take('desk lamps')['title'] == 'Desk Lamps'
+    assert restored.take('desk lamps') is None
+    assert restored.hits == 1
+    assert list(json.loads(path.read_text())) == ['Small Kitchen']
+
+
+def test_stale_entries_are_missing_and_not_served(tmp_path):
+    cache = PackedCache(tmp_path / 'packed_prompts.json', max_age_days=1)
+    cache.entries['desk lamps'] = {'title': 'Old', 'created': 0}
+    assert cache.missing(['desk lamps']) == ['desk lamps']
+    assert cache.take('desk lamps') is None
+    assert cache.hits == 0 and cache.entries == {}
+
+
+def test_unreadable_cache_file_starts_empty(tmp_path):
+    path = tmp_path / 'packed_prompts.json'
+    path.write_text('{not json', encoding='utf-8')
+    assert PackedCache(path).entries == {}
+    assert PackedCache(None).missing(['desk lamps']) == ['desk lamps']
+
+
+OUTLINE = {'structure': {'sections': [{'heading': heading} for heading in ('Layout', 'Storage', 'Lighting')]},
+           'seo': {'meta_description': 'Ideas that work.'}}
+
+
+def packing_generator(monkeypatch, packed_reply):
+    """Generator whose LLM calls are counted; content is stubbed so only titles and outlines ask the LLM"""
+    monkeypatch.setenv('PACKED_CACHE_FILE', '')
+    monkeypatch.setenv('KEYWORD_QUEUE_FILE', '')
+    generator = CloudflareOptimizedArticleGenerator({'packed_prompts': {'size': 3, 'outlines': True}})
+    calls = []
+
+    async def generate_response(prompt, model, hedge=None, context=None):
+        if 'Plan SEO articles' in prompt:
+            calls.append('packed')
+            return LLMResponse(packed_reply(json.loads(prompt.split('these keywords: ')[1].split('\n')[0])),
+                               'gemini', model)
+        if 'article outline' in prompt:
+            calls.append('outline')
+            return LLMResponse(json.dumps(OUTLINE), 'gemini', model)
+        calls.append('title')
+        return LLMResponse('Single Title', 'gemini', model)
+
+    async def generate_article_content(outline, keyword, title):
+        return f"## Layout\n\nAbout {keyword}."
+
+    generator.generate_response = generate_response
+    generator.generate_article_content = generate_article_content
+    return generator, calls
+
+
+def article_texts(generator, keywords):
+    async def scenario():
+        await generator.prefetch_packed(keywords)
+        return [await generator.generate_article_text(keyword) for keyword in keywords]
+    return asyncio.run(scenario())
+
+
+def test_prefetched_titles_and_outlines_need_no_further_calls(monkeypatch):
+    def reply(keywords):
+        return json.dumps({'articles': [{'keyword': k, 'title': f"{k.title()} Guide", 'outline': OUTLINE}
+                                        for k in keywords]})
+
+    generator, calls = packing_generator(monkeypatch, reply)
+    texts = article_texts(generator, ['desk lamps', 'small kitchen', 'garden sheds'])
+    assert calls == ['packed']
+    assert [text['title'] for text in texts] == ['Desk Lamps Guide', 'Small Kitchen Guide', 'Garden Sheds Guide']
+    assert all(text['outline'] == OUTLINE for text in texts)
+    assert generator.packed_cache.hits == 3
+
+
+def test_short_or_malformed_packed_replies_fall_back_per_article(monkeypatch):
+    def reply(keywords):
+        if keywords == ['desk lamps', 'small kitchen']:
+            # Covers one keyword, with an outline too thin to use
+            return json.dumps({'articles': [{'keyword': 'desk lamps', 'title': 'Desk Lamps Guide',
+                                             'outline': {'structure': {'sections': []}}}]})
+        return 'Sorry, I cannot plan these.'
+
+    generator, calls = packing_generator(monkeypatch, reply)
+    texts = article_texts(generator, ['desk lamps', 'small kitchen'])
+    assert [text['title'] for text in texts] == ['Desk Lamps Guide', 'Single Title']
+    assert all(text['outline'] == OUTLINE for text in texts)
+    # The miss tries one more packed refill before asking for its own title
+    assert calls == ['packed', 'outline', 'packed', 'title', 'outline']
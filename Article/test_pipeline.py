@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for featured image processing and the staged pipeline's instrumentation
+"""
+
+import io
+import base64
+import asyncio
+
+from PIL import Image
+
+import pipeline
+from pipeline import ArticlePipeline
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+
+def encoded(image, fmt, **options):
+    output = io.BytesIO()
+    image.save(output, fmt, **options)
+    return output.getvalue()
+
+
+def decode(encoded_image):
+    return Image.open(io.BytesIO(base64.b64decode(encoded_image)))
+
+
+def test_wide_images_are_resized_to_jpeg():
+    generator = CloudflareOptimizedArticleGenerator({'image_max_width': 400})
+    result = decode(generator.prepare_image(encoded(Image.new('RGB', (1600, 800), 'teal'), 'PNG')))
+    assert result.format == 'JPEG'
+    assert result.size == (400, 200)
+
+
+def test_small_jpeg_is_kept_when_recompressing_does_not_help():
+    generator = CloudflareOptimizedArticleGenerator({'image_quality': 95})
+    original = encoded(Image.effect_noise((300, 200), 20).convert('RGB'), 'JPEG', quality=20)
+    assert base64.b64decode(generator.prepare_image(original)) == original
+
+
+def test_data_that_is_not_an_image_is_skipped():
+    generator = CloudflareOptimizedArticleGenerator({})
+    assert generator.prepare_image(b'<html>Rate limit exceeded</html>') is None
+    assert asyncio.run(generator.process_image(b'not an image')) is None
+
+
+def test_pipelined_batch_is_profiled_and_writes_metrics(tmp_path, monkeypatch):
+    async def no_articles(self, keywords):
+        return []
+
+    textfile = tmp_path / 'article.prom'
+    monkeypatch.setenv('METRICS_TEXTFILE', str(textfile))
+    monkeypatch.setattr(pipeline.ArticlePipeline, 'run', no_articles)
+    generator = CloudflareOptimizedArticleGenerator({'pipeline': True})
+    generator.api_keys = ['key-a']
+    generator.enable_profiling(tmp_path / 'profiles')
+    result = asyncio.run(generator.run_batch(keywords=['small kitchen']))
+    assert textfile.exists()
+    assert 'allocations' in result['stats']['profile']
+
+
+OUTLINE = {'structure': {'sections': [{'heading': 'Layout', 'needs_image': True}]}}
+
+
+def staged_generator(tmp_path, failing=(), slow_publish=0.02):
+    """A generator whose LLM, image and GitHub calls are stubs; processing and bookkeeping are real"""
+    generator = CloudflareOptimizedArticleGenerator({'max_daily_articles': 20})
+    generator.checkpoint_dir = tmp_path / 'checkpoints'
+    photo = encoded(Image.new('RGB', (64, 48), 'teal'), 'PNG')
+    calls = {'llm': 0, 'published': []}
+
+    async def generate_article_text(keyword):
+        calls['llm'] += 1
+        await asyncio.sleep(0)
+        if keyword in failing:
+            raise RuntimeError('backend exploded')
+        return {'title': keyword.title(), 'outline': OUTLINE, 'content': f"## Layout\n\nAll about {keyword}."}
+
+    async def search_images_optimized(query, count=2):
+        return ['https://images.example/photo.jpg']
+
+    async def download_image(url):
+        return photo
+
+    async def upload_image_content(encoded_image, filename):
+        assert decode(encoded_image).format == 'JPEG'
+        return f"/assets/images/{filename}"
+
+    async def save_article_to_github(article):
+        await asyncio.sleep(slow_publish)
+        calls['published'].append(article['keyword'])
+        return True
+
+    generator.generate_article_text = generate_article_text
+    generator.search_images_optimized = search_images_optimized
+    generator.download_image = download_image
+    generator.upload_image_content = upload_image_content
+    generator.save_article_to_github = save_article_to_github
+    return generator, calls
+
+
+def test_every_keyword_flows_through_bounded_stages(tmp_path):
+    keywords = [f"room {index}" for index in range(8)]
+    generator, calls = staged_generator(tmp_path)
+    staged = ArticlePipeline(generator, {'publish': 1, 'queue_size': 2})
+    results = asyncio.run(staged.run(keywords))
+
+    assert sorted(result['keyword'] for result in results) == keywords
+    assert all(result['success'] for result in results)
+    assert calls['published'] == [result['keyword'] for result in results]
+    article = results[0]['article']
+    assert article['image_path'] == f"/assets/images/{results[0]['keyword'].replace(' ', '-')}-featured.jpg"
+    assert {'stages', 'stage_summary', 'rejected'} <= set(results[0]['stats'])
+    assert 'image_process' in results[0]['stats']['stage_summary']
+    # The slow publisher backs the queues up to, and never past, their capacity
+    assert set(staged.queue_peaks) == {'llm', 'images', 'processing', 'publish'}
+    assert all(peak <= 2 for peak in staged.queue_peaks.values())
+    assert staged.queue_peaks['publish'] == 2
+    assert len(generator.articles_data) == 8
+
+
+def test_a_failing_stage_does_not_stop_the_others(tmp_path):
+    generator, calls = staged_generator(tmp_path, failing={'room 1'})
+    original_process = generator.process_image
+    processed = []
+
+    async def process_image(image_data):
+        processed.append(image_data)
+        if len(processed) == 1:
+            raise OSError('disk full')
+        return await original_process(image_data)
+
+    generator.process_image = process_image
+    results = asyncio.run(ArticlePipeline(generator, {'queue_size': 1}).run(['room 0', 'room 1', 'room 2', 'room 3']))
+
+    outcomes = {result['keyword']: (result['success'], result['message']) for result in results}
+    assert len(outcomes) == 4
+    assert outcomes['room 1'] == (False, 'Execution error: backend exploded')
+    failed = [keyword for keyword, (success, _) in outcomes.items() if not success]
+    assert len(failed) == 2 and 'Execution error: disk full' in [message for _, message in outcomes.values()]
+    assert sorted(calls['published']) == sorted(set(outcomes) - set(failed))
+
+
+def test_intake_stops_at_the_daily_limit(tmp_path):
+    generator, calls = staged_generator(tmp_path, slow_publish=0)
+    generator.config['max_daily_articles'] = 2
+    results = asyncio.run(ArticlePipeline(generator).run(['room 0', 'room 1', 'room 2']))
+    assert [result['success'] for result in results] == [True, True]
+    assert calls['llm'] == 2
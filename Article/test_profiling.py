@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Tests for opt-in per-run and per-stage profiling
+"""
+
+import pstats
+import tracemalloc
+
+from profiling import Profiler
+from telemetry import StageRecorder
+
+
+def busy(n):
+    return [str(i) * 4 for i in range(n)]
+
+
+def test_disabled_without_profile_dir(monkeypatch):
+    monkeypatch.delenv('PROFILE_DIR', raising=False)
+    assert Profiler.from_environment() is None
+    monkeypatch.setenv('PROFILE_DIR', '/tmp/profiles')
+    monkeypatch.setenv('PROFILE_TOP', '5')
+    assert Profiler.from_environment().top == 5
+
+
+def test_run_and_stage_reports_are_written(tmp_path):
+    profiler = Profiler(str(tmp_path), top=5)
+    recorder = StageRecorder()
+    recorder.profiler = profiler
+    spans = recorder.begin_run()
+    run = profiler.begin_run()
+    busy(1000)
+    with recorder.stage('content'):
+        kept = busy(5000)
+    written = profiler.end_run(run, 'test')
+
+    assert set(written) == {'run', 'content', 'allocations'}
+    assert 'busy' in str(pstats.Stats(written['content']).stats)
+    assert spans[0]['mem_peak_kb'] > 0
+    report = open(written['allocations'], encoding='utf-8').read()
+    assert report.startswith('Top 5 allocation changes') and '[content]' in report
+    assert not tracemalloc.is_tracing()
+    assert kept
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the local outline, section and publishing quality checks
+"""
+
+import asyncio
+
+from context_cache import SharedContext
+from quality import (assess_article, gate_settings, outline_problems, section_problems, split_sections,
+                     strip_fences)
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+KEYWORD = 'small kitchen'
+PARAGRAPH = ('Good storage and careful lighting make a compact room feel larger. '
+             'Choose pale colours, open shelving and furniture that folds away when it is not needed. ') * 6
+
+
+def article(sections=4, body=PARAGRAPH):
+    parts = [f"Ideas for a {KEYWORD} that works every day."]
+    parts += [f"## Section {i}\n\n{body}" for i in range(sections)]
+    parts.append(f"## Conclusion\n\nA {KEYWORD} rewards planning. {PARAGRAPH}")
+    return '\n\n'.join(parts)
+
+
+def test_split_sections_keeps_opening():
+    sections = split_sections("Intro\n\n## One\n\nText\n\n## Two\n\nMore")
+    assert [heading for heading, _ in sections] == ['', 'One', 'Two']
+
+
+def test_section_problems():
+    assert section_problems("## A\n\nShort and cut", 10) == ['only 3 words', 'ends mid-sentence']
+    assert section_problems("## A\n\n```\ncode\n```\n\nDone.") == ['contains a code fence']
+    assert section_problems("## A\n\n[Insert statistic here].") == ['contains placeholder text']
+
+
+def test_outline_problems():
+    outline = {'structure': {'sections': [{'heading': 'A'}, {'heading': ''}]}, 'seo': {}}
+    assert outline_problems(outline) == ['only 2 sections', 'sections without a heading', 'no meta description']
+
+
+def test_gate_settings():
+    assert gate_settings(False) is None
+    assert gate_settings(None)['block'] is False
+    assert gate_settings({'block': True})['block'] is True
+    assert gate_settings(None, force_english=False)['language'] is None
+    assert gate_settings({'language': 'de'}, force_english=False)['language'] == 'de'
+
+
+def test_strip_fences():
+    assert strip_fences("```markdown\n## A\n\nText\n```") == "## A\n\nText"
+
+
+def test_good_article_passes():
+    report = assess_article(article(), KEYWORD, gate_settings(None))
+    assert report['passed'], report
+    assert report['score'] == 1.0
+    assert report['h2'] == 5
+    assert report['language'] == 'en'
+
+
+def test_short_article_fails_whole_article_checks():
+    report = assess_article(article(sections=1, body='Too short.'), KEYWORD, gate_settings(None))
+    assert {'words', 'headings'} <= set(report['failed'])
+
+
+def test_stuffed_section_is_targeted():
+    content = article()
+    sections = split_sections(content)
+    stuffed = sections[2][1] + ' ' + ' '.join([f"Best {KEYWORD}."] * 30)
+    content = content.replace(sections[2][1], stuffed)
+    report = assess_article(content, KEYWORD, gate_settings(None))
+    assert 'keyword' in report['failed']
+    assert report['sections'] == {2: [f'use "{KEYWORD}" less often']}
+
+
+def test_non_english_article_fails_language():
+    body = ('La cocina pequeña necesita buena iluminación y almacenamiento cuidadoso. '
+            'Elija colores claros y muebles que se pliegan cuando no se usan. ') * 8
+    report = assess_article(article(body=body), KEYWORD, gate_settings(None))
+    assert report['language'] == 'es'
+    assert 'language' in report['failed']
+    assert 'language' not in assess_article(article(body=body), KEYWORD, gate_settings(None, False))['failed']
+
+
+def enforce(settings, content):
+    generator = CloudflareOptimizedArticleGenerator({'quality_gate': settings})
+    result = asyncio.run(generator.enforce_quality(
+        'Write it', content, {}, KEYWORD, 'Small Kitchen', SharedContext('brief')
+    ))
+    return generator, result
+
+
+def test_failing_article_is_published_with_a_warning_by_default():
+    content = article(sections=1, body='Too short.')
+    generator, result = enforce({'max_rounds': 0}, content)
+    assert result == content.strip()
+    assert not generator.quality_rejected
+
+
+def test_blocking_gate_rejects_the_keyword():
+    generator, result = enforce({'max_rounds': 0, 'block': True}, article(sections=1, body='Too short.'))
+    assert result == ""
+    assert generator.quality_rejected == {KEYWORD}
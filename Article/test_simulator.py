@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Smoke test for the virtual-clock capacity simulator
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_two_simulated_days_finish_quickly(tmp_path):
+    # The simulator patches module clocks and the environment, so keep it out of this process
+    report_path = tmp_path / 'report.json'
+    subprocess.run([sys.executable, os.path.join(HERE, 'simulator.py'), '--days', '2', '--seed', '1',
+                    '--output', str(report_path)],
+                   cwd=HERE, check=True, capture_output=True, timeout=120)
+    report = json.loads(report_path.read_text())
+    assert report['triggers'] == 2
+    assert report['articles'] >= 1
+    assert report['http_requests']['image'] == report['http_requests']['unsplash']
+    assert report['simulated_seconds'] >= 86400
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for single-flight coalescing of identical in-flight calls
+"""
+
+import asyncio
+
+from llm_backends import LLMResponse
+from single_flight import SingleFlight
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'body'
+
+    async def scenario():
+        return await asyncio.gather(*[flight.do(('GET', '/photo'), fetch) for _ in range(3)])
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [('body', False), ('body', True), ('body', True)]
+    assert flight.shared == 2 and len(flight) == 0
+
+
+def test_finished_calls_are_not_cached():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        return [await flight.do('key', fetch) for _ in range(2)]
+
+    assert asyncio.run(scenario()) == [(1, False), (2, False)]
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('upstream down')
+
+    async def scenario():
+        return await asyncio.gather(flight.do('key', fail), flight.do('key', fail), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flight) == 0
+
+
+def test_cancelled_caller_does_not_abort_the_shared_call():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 'body'
+
+    async def scenario():
+        first = asyncio.create_task(flight.do('key', fetch))
+        second = asyncio.create_task(flight.do('key', fetch))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == ('body', True)
+
+
+def test_sole_cancelled_caller_cancels_the_call():
+    flight = SingleFlight()
+    events = []
+
+    async def fetch():
+        events.append('sent')
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            events.append('cancelled')
+            raise
+        events.append('finished after deadline')
+        return 'body'
+
+    async def scenario():
+        try:
+            await asyncio.wait_for(flight.do('key', fetch), timeout=0.01)
+        except asyncio.TimeoutError:
+            events.append('timeout raised')
+        await asyncio.sleep(0.06)
+
+    asyncio.run(scenario())
+    assert events == ['sent', 'cancelled', 'timeout raised']
+    assert len(flight) == 0
+
+
+def test_call_completing_after_its_callers_left_is_still_charged():
+    flight = SingleFlight()
+    charged = []
+
+    async def stubborn():
+        # Finishes its request even when cancelled, as a sent upstream call would have
+        try:
+            await asyncio.sleep(0.02)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.01)
+        return 'spent'
+
+    async def scenario():
+        caller = asyncio.create_task(flight.do('key', stubborn, on_orphaned=charged.append))
+        await asyncio.sleep(0.005)
+        caller.cancel()
+        await asyncio.sleep(0.05)
+        return caller.cancelled()
+
+    assert asyncio.run(scenario())
+    assert charged == ['spent']
+
+
+def test_delivered_results_are_not_charged_as_orphaned():
+    flight = SingleFlight()
+    charged = []
+
+    async def fetch():
+        return 'body'
+
+    async def scenario():
+        return await flight.do('key', fetch, on_orphaned=charged.append)
+
+    assert asyncio.run(scenario()) == ('body', False)
+    assert charged == []
+
+
+def test_generator_counts_quota_of_a_call_finished_after_its_deadline():
+    generator = CloudflareOptimizedArticleGenerator({})
+
+    async def generate_live(prompt, model_name, hedge=None, context=None):
+        try:
+            await asyncio.sleep(0.02)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.01)
+        return LLMResponse('Title', 'gemini', model_name, prompt_tokens=5, output_tokens=2), 1
+
+    generator._generate_live = generate_live
+
+    async def scenario():
+        try:
+            await asyncio.wait_for(generator.generate_response('Title please'), timeout=0.005)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert generator.daily_requests == 1
+    assert generator.metrics.llm_tokens.value(model='gemini-1.5-flash', direction='input') == 5
+    assert len(generator.single_flight) == 0
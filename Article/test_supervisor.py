@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for splitting work across shards and merging their reports
+"""
+
+import json
+
+from supervisor import merge_shards, partition
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+
+def span(stage, wall_ms):
+    return {'stage': stage, 'wall_ms': wall_ms, 'ok': True}
+
+
+def test_partition_is_round_robin():
+    assert partition(['a', 'b', 'c', 'd', 'e'], 2) == [['a', 'c', 'e'], ['b', 'd']]
+
+
+def test_merge_persists_shard_state_once(tmp_path, monkeypatch):
+    queue_file, packed_file = tmp_path / 'keyword_queue.json', tmp_path / 'packed_prompts.json'
+    monkeypatch.setenv('KEYWORD_QUEUE_FILE', str(queue_file))
+    monkeypatch.setenv('PACKED_CACHE_FILE', str(packed_file))
+    generator = CloudflareOptimizedArticleGenerator({'packed_prompts': True})
+    generator.keyword_scheduler.sync({'a': 3.0, 'b': 2.0, 'c': 1.0})
+    assert generator.keyword_scheduler.next_batch(3) == ['a', 'b', 'c']
+    generator.packed_cache.entries = {k: {'title': k.upper(), 'created': 1e12} for k in 'abc'}
+    seeded = [{k: generator.packed_cache.entries[k] for k in 'ac'}, {'b': generator.packed_cache.entries['b']}]
+
+    shard_results = [
+        {'shard': 0, 'keywords': {'a': True, 'c': False}, 'rejected': ['c'], 'articles': [{'keyword': 'a'}],
+         'api_calls': generator.daily_requests + 5, 'packed': {'next': {'title': 'Next', 'created': 1e12}},
+         'packed_hits': 1, 'stages': [span('title', 10.0), span('content', 40.0)],
+         'stage_summary': {}, 'message': 'Created 1/2 articles'},
+        # A crashed shard reports no stages and leaves its packed entries alone
+        {'shard': 1, 'keywords': {'b': False}, 'articles': [], 'api_calls': generator.daily_requests,
+         'elapsed': 0, 'message': 'Process error: boom'}
+    ]
+    report = merge_shards(generator, shard_results, seeded)
+
+    assert report['articles'] == [{'keyword': 'a'}]
+    assert report['api_calls'] == 5 and report['packed_hits'] == 1
+    assert list(report['stage_summary']) == ['content', 'title']
+    assert report['stage_summary']['title']['count'] == 1
+    assert all('stages' not in shard and 'packed' not in shard for shard in report['shards'])
+    assert generator.used_keywords >= {'a'}
+    assert generator.keyword_scheduler.rejections == {'c': 1}
+    assert json.loads(packed_file.read_text()).keys() == {'b', 'next'}
+    assert json.loads(queue_file.read_text())['rejections'] == {'c': 1}
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for per-stage spans and their summaries
+"""
+
+import json
+
+import pytest
+
+from llm_backends import LLMResponse
+from telemetry import StageRecorder, mask_key
+from UpdateArticle import CloudflareOptimizedArticleGenerator
+
+
+def test_mask_key():
+    assert mask_key('AIzaSyExample1234') == '...1234'
+    assert mask_key(None) is None
+
+
+def test_stages_are_recorded_with_annotations(tmp_path):
+    path = tmp_path / 'stages.jsonl'
+    recorder = StageRecorder(str(path))
+    seen = []
+    recorder.listeners.append(seen.append)
+    spans = recorder.begin_run()
+    with recorder.stage('title', model='gemini-1.5-flash'):
+        recorder.annotate(prompt_tokens=12)
+        recorder.add('retries')
+        recorder.add('bytes', 300)
+    assert spans[0]['stage'] == 'title' and spans[0]['ok']
+    assert (spans[0]['prompt_tokens'], spans[0]['retries'], spans[0]['bytes']) == (12, 1, 300)
+    assert seen == spans
+    assert json.loads(path.read_text().splitlines()[0])['model'] == 'gemini-1.5-flash'
+
+
+def test_failed_stage_is_marked_and_reraised():
+    recorder = StageRecorder()
+    spans = recorder.begin_run()
+    with pytest.raises(ValueError):
+        with recorder.stage('upload'):
+            raise ValueError('boom')
+    assert spans[0]['ok'] is False and spans[0]['error'] == 'ValueError'
+
+
+def test_annotations_outside_a_stage_are_ignored():
+    recorder = StageRecorder()
+    recorder.annotate(model='x')
+    recorder.add('retries')
+    assert recorder.begin_run() == []
+
+
+def test_summary_is_ordered_by_total_wall_time():
+    spans = [
+        {'stage': 'title', 'wall_ms': 100.0, 'prompt_tokens': 10, 'output_tokens': None},
+        {'stage': 'content', 'wall_ms': 900.0, 'bytes': 5, 'ok': False},
+        {'stage': 'title', 'wall_ms': 300.0, 'retries': 2}
+    ]
+    summary = StageRecorder.summarize(spans)
+    assert list(summary) == ['content', 'title']
+    assert summary['title'] == {'count': 2, 'wall_ms': 400.0, 'max_ms': 300.0, 'bytes': 0, 'retries': 2,
+                                'failures': 0, 'prompt_tokens': 10, 'output_tokens': 0}
+    assert summary['content']['failures'] == 1
+
+
+def test_tokens_of_every_call_in_a_stage_are_summed():
+    generator = CloudflareOptimizedArticleGenerator({})
+    spans = generator.telemetry.begin_run()
+    with generator.telemetry.stage('content'):
+        generator.record_llm_response(LLMResponse('draft', 'gemini', 'm', finish_reason='MAX_TOKENS',
+                                                  prompt_tokens=1000, output_tokens=900, total_tokens=1900))
+        generator.record_llm_response(LLMResponse('rest', 'gemini', 'm', finish_reason='STOP', prompt_tokens=1200,
+                                                  output_tokens=100, total_tokens=1300, cached_tokens=800))
+    span = spans[0]
+    assert (span['prompt_tokens'], span['output_tokens'], span['total_tokens'], span['cached_tokens']) == \
+        (2200, 1000, 3200, 800)
+    assert span['bytes'] == 9 and span['finish_reason'] == 'STOP'
+    assert StageRecorder.summarize(spans)['content']['output_tokens'] == 1000
+    assert generator.metrics.llm_tokens.value(model='m', direction='input') == 2200
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for reusing one generator across warm serverless invocations
+"""
+
+import asyncio
+import datetime
+
+import pytest
+
+import UpdateArticle
+
+
+@pytest.fixture
+def warm(monkeypatch, tmp_path):
+    monkeypatch.setattr(UpdateArticle, '_warm', {'generator': None, 'config': None, 'state': None,
+                                                 'day': None, 'loop': None})
+    monkeypatch.setenv('GEMINI_API_KEYS', 'key-a,key-b')
+    monkeypatch.setenv('KEYWORD_QUEUE_FILE', '')
+    monkeypatch.setenv('PACKED_CACHE_FILE', '')
+    monkeypatch.setenv('ARTICLES_DATA', '{}')
+    for name in ('JOB_QUEUE_DB', 'CASSETTE_MODE', 'PROFILE_DIR', 'LLM_BACKENDS'):
+        monkeypatch.delenv(name, raising=False)
+    return UpdateArticle._warm
+
+
+def warm_generator():
+    async def get():
+        generator = await UpdateArticle.get_warm_generator()
+        await generator.close_connections()
+        return generator
+    return asyncio.run(get())
+
+
+def test_generator_is_reused_until_its_config_changes(warm, monkeypatch):
+    first = warm_generator()
+    assert warm_generator() is first
+    monkeypatch.setenv('GEMINI_API_KEYS', 'key-c')
+    rebuilt = warm_generator()
+    assert rebuilt is not first
+    assert warm['generator'] is rebuilt
+
+
+def test_reuse_picks_up_new_state_and_a_new_day(warm, monkeypatch):
+    generator = warm_generator()
+    loaded = []
+    monkeypatch.setattr(generator, 'load_from_environment', lambda: loaded.append(True))
+    monkeypatch.setenv('ARTICLES_DATA', '{"articles": []}')
+    assert warm_generator() is generator
+    assert loaded == [True]
+
+    generator.daily_requests = 7
+    warm['day'] = datetime.date.today() - datetime.timedelta(days=1)
+    warm_generator()
+    assert generator.daily_requests == 0 and loaded == [True]
@@ -23,7 +23,7 @@ export default {
   async scheduled(event, env, ctx) {
     // Daily scheduled execution
     console.log('Running scheduled article generation');
-    return await executeArticleGeneration(env);
+    return await executeArticleGeneration(env, 'cron');
   }
 };
 
@@ -35,7 +35,7 @@ async function handleGenerate(request, env) {
       return new Response('Unauthorized', { status: 401 });
     }
 
-    const result = await executeArticleGeneration(env);
+    const result = await executeArticleGeneration(env, 'generate');
     return new Response(JSON.stringify(result), {
       headers: { 'Content-Type': 'application/json' }
     });
@@ -65,7 +65,7 @@ async function handleWebhook(request, env) {
     
     // Trigger generation on specific events
     if (data.action === 'generate_article' || data.ref === 'refs/heads/main') {
-      const result = await executeArticleGeneration(env);
+      const result = await executeArticleGeneration(env, 'webhook');
       return new Response(JSON.stringify(result), {
         headers: { 'Content-Type': 'application/json' }
       });
@@ -78,7 +78,7 @@ async function handleWebhook(request, env) {
   }
 }
 
-async function executeArticleGeneration(env) {
+async function executeArticleGeneration(env, source = 'manual') {
   try {
     console.log('Starting article generation process');
     
@@ -99,6 +99,8 @@ async function executeArticleGeneration(env) {
       GITHUB_TOKEN: env.GITHUB_TOKEN,
       GITHUB_REPO: env.GITHUB_REPO,
       GITHUB_BRANCH: env.GITHUB_BRANCH || 'main',
+      // Recorded on the queued job when JOB_QUEUE_DB is set on the Python side
+      TRIGGER_SOURCE: source,
       BLOG_CONFIG: JSON.stringify({
         category: 'Interior Design',
         author: 'Admin',